@@ -13,10 +13,15 @@ from tgbot.database.repositories import (
     UserRepository,
     ScheduleRepository,
     OccupancyRepository,
-    AnalyticsRepository
+    AnalyticsRepository,
+    BroadcastRepository
 )
-from tgbot.services.services import ScheduleService, OccupancyService
+from tgbot.services.services import ScheduleService, OccupancyService, BotSettingsStore, MaintenanceMiddleware
 from tgbot.services.utils import check_connection
+from tgbot.services.analytics_writer import AnalyticsWriter
+from tgbot.services.broadcaster import Broadcaster
+from tgbot.services.schedule_changes import ChangeNotifier
+from tgbot.services.daily_digest import DailyDigestService
 from tgbot.handlers.meetings import meeting_router
 from tgbot.handlers.user import user_router
 from tgbot.handlers.schedule import schedule_router
@@ -54,6 +59,11 @@ async def main():
     Path(config.LOG_DIR).mkdir(parents=True, exist_ok=True)
     logging.info(f"✓ Data directories created: {config.DATA_DIR}, {config.DB_DIR}, {config.LOG_DIR}")
 
+    # Свежий деплой: поднимаемся с тёплыми данными из снимка, не дожидаясь парсинга сайта
+    if config.SNAPSHOT_RESTORE_ON_EMPTY:
+        from tgbot.database.snapshot import bootstrap_from_snapshot
+        bootstrap_from_snapshot(config.DB_NAME, config.SNAPSHOT_PATH)
+
     from tgbot.database.repositories import DatabaseManager
     db_manager = DatabaseManager(config.DB_NAME)
     analytics_db_manager = DatabaseManager(config.ANALYTICS_DB_NAME)
@@ -69,22 +79,44 @@ async def main():
     await user_repo.create_tables()
     await analytics_repo.create_tables()
     logging.info("✓ Database tables initialized")
+
+    # Аналитика пишется пачками в фоне, а не коммитом на каждый клик
+    analytics_writer = AnalyticsWriter(analytics_repo)
+    analytics_writer.start()
+    analytics_repo.attach_writer(analytics_writer)
     
     # === STARTUP PROTECTION: ENSURE GROUPS LIST IS POPULATED ===
     tracked_count = await schedule_repo.get_tracked_groups_count()
     if tracked_count == 0:
         logging.info("🚀 First run detected. Syncing university groups list...")
         from tgbot.services.parser.site_to_pdf import sync_groups_list
-        sync_ok = await sync_groups_list(db_manager.engine)
+        sync_ok = await sync_groups_list(db_manager)
         if not sync_ok:
             logging.warning(
                 "⚠️ VyatSU website is currently unreachable. "
                 "Bot will start with cached data. Group search will be limited."
             )
 
+    # Рассылки: общий лимит скорости, повторы после RetryAfter, продолжение после рестарта
+    broadcaster = Broadcaster(
+        bot,
+        BroadcastRepository(db_manager),
+        rate=config.BROADCAST_RATE,
+        concurrency=config.BROADCAST_CONCURRENCY,
+        chat_interval=config.BROADCAST_CHAT_INTERVAL,
+    )
+    await broadcaster.resume_unfinished()
+
     schedule_service = ScheduleService()
     occupancy_service = OccupancyService(occupancy_repo)
 
+    # Настройки бота держим в памяти; middleware подписывается на maintenance_mode
+    settings_store = BotSettingsStore(user_repo)
+    maintenance = MaintenanceMiddleware(settings_store)
+    await settings_store.load()
+    dp.message.outer_middleware(maintenance)
+    dp.callback_query.outer_middleware(maintenance)
+
     dp.include_routers(
         user_router,
         schedule_router,
@@ -100,7 +132,9 @@ async def main():
     parser_scheduler = ParserSchedulerService(
         db_manager=db_manager,
         schedule_repo=schedule_repo,
-        analytics_repo=analytics_repo
+        analytics_repo=analytics_repo,
+        change_notifier=ChangeNotifier(user_repo, broadcaster, horizon_days=config.CHANGE_NOTIFY_DAYS),
+        daily_digest=DailyDigestService(user_repo, schedule_repo, schedule_service, broadcaster)
     )
     parser_scheduler.start()
     
@@ -129,7 +163,9 @@ async def main():
             analytics_repo=analytics_repo,
             service=schedule_service,
             parser_scheduler=parser_scheduler,
-            occupancy_service=occupancy_service
+            occupancy_service=occupancy_service,
+            settings_store=settings_store,
+            broadcaster=broadcaster
         )
     except Exception as e:
         logging.error(f"❌ Bot error: {e}", exc_info=True)
@@ -139,7 +175,11 @@ async def main():
         if parser_scheduler:
             parser_scheduler.stop()
         await api_runner.cleanup()
+        await broadcaster.stop()
         await bot.session.close()
+        await analytics_writer.stop()
+        db_manager.close()
+        analytics_db_manager.close()
         logging.info("Bot stopped successfully.")
 
 
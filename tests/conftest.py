@@ -0,0 +1,13 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Настройки читаются при импорте tgbot.config: задаём их до первого импорта пакета
+_tmp = tempfile.mkdtemp(prefix="tgbot-tests-")
+os.environ.setdefault("BOT_TOKEN", "123:test")
+os.environ.setdefault("ADMIN_IDS", "1")
+for name in ("DATA_DIR", "DB_DIR", "LOG_DIR"):
+    os.environ.setdefault(name, _tmp)
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,75 @@
+import asyncio
+import time
+
+from tgbot.services.cache import LRUCache, RefreshingCache
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2, ttl=60, name="test")
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is LRUCache.MISSING
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_lru_expires_and_caches_none():
+    cache = LRUCache(maxsize=10, ttl=60, name="test")
+    cache.set("missing-user", None)
+    assert cache.get("missing-user") is None
+
+    cache.set("old", 1)
+    cache._data["old"] = (time.monotonic() - 61, 1)
+    assert cache.get("old", "default") == "default"
+    assert cache.stats["expired"] == 1
+
+
+def test_lru_add_keeps_fresher_value():
+    cache = LRUCache(maxsize=10, ttl=60, name="test")
+    cache.set("k", "fresh")
+    cache.add("k", "stale")
+    assert cache.get("k") == "fresh"
+
+
+def test_refreshing_cache_serves_stale_and_refreshes_in_background(tmp_path):
+    values = iter([["v1"], ["v2"]])
+
+    async def loader():
+        return next(values)
+
+    cache = RefreshingCache(loader, ttl=60, persist_path=tmp_path / "nav.json", name="test")
+
+    async def main():
+        first = await cache.get()
+        cache._loaded_at -= 61
+        stale = await cache.get()
+        await cache._refresh_task
+        return first, stale, await cache.get()
+
+    assert asyncio.run(main()) == (["v1"], ["v1"], ["v2"])
+    assert cache.stats["stale_hits"] == 1
+
+    # Значение поднимается с диска после рестарта без обращения к загрузчику
+    restored = RefreshingCache(loader, ttl=60, persist_path=tmp_path / "nav.json", name="test")
+    assert asyncio.run(restored.get()) == ["v2"]
+    assert restored.stats["hits"] == 1
+
+
+def test_refreshing_cache_backs_off_after_failure():
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        raise RuntimeError("site is down")
+
+    cache = RefreshingCache(loader, ttl=60, negative_ttl=30, name="test")
+
+    async def main():
+        return await cache.get(), await cache.get()
+
+    assert asyncio.run(main()) == ([], [])
+    assert len(calls) == 1
+    assert cache.stats["negative_hits"] == 1
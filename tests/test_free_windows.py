@@ -0,0 +1,73 @@
+import asyncio
+from datetime import date
+
+import numpy as np
+
+from tgbot.services import free_windows
+from tgbot.services.services import ScheduleService
+
+MONDAY = date(2026, 10, 19)
+PERIOD = free_windows.date_range(MONDAY, 7)
+
+
+def test_build_busy_matrix_ignores_unknown_rows():
+    busy = free_windows.build_busy_matrix(
+        ["A", "B"], PERIOD[:2],
+        [("A", "2026-10-19", 1, "1"), ("B", "2026-10-20", 7, None),
+         ("C", "2026-10-19", 2, None), ("A", "2026-10-30", 1, None), ("A", "2026-10-19", None, None)],
+    )
+    assert busy.shape == (2, 2, free_windows.PAIRS_PER_DAY)
+    assert busy.sum() == 2
+    assert busy[0, 0, 0] and busy[1, 1, 6]
+
+
+def test_common_free_requires_every_group_and_known_day():
+    busy = np.zeros((2, 2, free_windows.PAIRS_PER_DAY), dtype=bool)
+    busy[0, 0, 0] = True
+    busy[1, 0, 1] = True
+    free = free_windows.common_free(busy, np.array([True, False]))
+
+    assert free[0].tolist() == [False, False, True, True, True, True, True]
+    assert not free[1].any()
+
+
+def test_find_windows_returns_continuous_blocks():
+    days = PERIOD[:1]
+    busy = np.zeros((1, 1, free_windows.PAIRS_PER_DAY), dtype=bool)
+    busy[0, 0, [0, 3]] = True   # заняты 1 и 4 пары
+
+    windows = free_windows.find_windows(busy, days, np.array([True]))
+    assert windows == [(MONDAY, 2, 2), (MONDAY, 5, 3)]
+    assert free_windows.find_windows(busy, days, np.array([True]), min_pairs=3) == [(MONDAY, 5, 3)]
+    assert free_windows.best_windows(windows, limit=1) == [(MONDAY, 5, 3)]
+
+
+def test_known_days_mask_skips_unpublished_days_and_sunday():
+    mask = free_windows.known_days_mask(["A", "B"], PERIOD, {"A": "2026-10-25", "B": "2026-10-21"})
+    assert mask.tolist() == [True, True, True, False, False, False, False]
+
+
+class FakeScheduleRepo:
+    def __init__(self, rows, last_dates):
+        self.rows, self.last_dates = rows, last_dates
+
+    async def get_busy_pairs(self, group_names, start_date, end_date):
+        return self.rows, self.last_dates
+
+
+def test_find_common_windows_message():
+    rows = [("A", "2026-10-19", p, "1") for p in range(1, 8) if p != 3] + [("B", "2026-10-19", 4, "1")]
+    repo = FakeScheduleRepo(rows, {"A": "2026-10-19", "B": "2026-10-19"})
+
+    text = asyncio.run(ScheduleService().find_common_windows(repo, ["A", "B"], MONDAY, days=2))
+
+    assert "19.10 (Пн) <b>3 пара</b>: <code>11:45 - 13:15</code>" in text
+    assert "Дней без опубликованного расписания: 1" in text
+
+
+def test_find_common_windows_without_windows():
+    rows = [("A", "2026-10-19", p, "1") for p in range(1, 8)]
+    repo = FakeScheduleRepo(rows, {"A": "2026-10-19"})
+
+    text = asyncio.run(ScheduleService().find_common_windows(repo, ["A"], MONDAY, days=1))
+    assert "Общих свободных окон не найдено" in text
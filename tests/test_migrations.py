@@ -0,0 +1,65 @@
+from sqlalchemy import create_engine, inspect, text
+
+from tgbot.database.migrations import LATEST_VERSION, get_schema_version, run_migrations
+
+# Схема до версионированных миграций (v0): occupancy ещё без is_free/group_name
+V0_SCHEMA = [
+    'CREATE TABLE user (telegram_id INTEGER NOT NULL PRIMARY KEY, username VARCHAR, full_name VARCHAR, '
+    'group_name VARCHAR, role VARCHAR NOT NULL, curator_group VARCHAR, settings_json VARCHAR NOT NULL, '
+    'favorites_json VARCHAR NOT NULL)',
+    "CREATE TABLE lesson (id INTEGER NOT NULL PRIMARY KEY, group_name VARCHAR NOT NULL, date VARCHAR NOT NULL, "
+    "pair_number INTEGER, start_time VARCHAR, end_time VARCHAR, subject VARCHAR, class_type VARCHAR, "
+    "teacher VARCHAR, building VARCHAR, room VARCHAR, subgroup VARCHAR, raw_info VARCHAR)",
+    "CREATE INDEX ix_lesson_group_name ON lesson (group_name)",
+    "CREATE TABLE occupancy (id INTEGER NOT NULL PRIMARY KEY, building VARCHAR NOT NULL, room VARCHAR NOT NULL, "
+    "date VARCHAR NOT NULL, pair_number INTEGER NOT NULL, start_time VARCHAR, end_time VARCHAR)",
+    "CREATE INDEX ix_occupancy_date ON occupancy (date)",
+    "CREATE TABLE action_logs (id INTEGER NOT NULL PRIMARY KEY, user_id INTEGER NOT NULL, action VARCHAR NOT NULL, "
+    "details VARCHAR, timestamp VARCHAR NOT NULL)",
+]
+
+
+def migrate(engine) -> int:
+    with engine.begin() as conn:
+        return run_migrations(conn)
+
+
+def test_empty_database_gets_latest_schema(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'empty.db'}")
+
+    assert migrate(engine) == LATEST_VERSION
+    assert migrate(engine) == 0
+
+    with engine.connect() as conn:
+        assert get_schema_version(conn) == LATEST_VERSION
+    tables = set(inspect(engine).get_table_names())
+    assert {"lesson", "schedule_templates", "user_favorites", "broadcast_jobs", "schema_version"} <= tables
+    assert "ix_lesson_group_date_pair" in {ix["name"] for ix in inspect(engine).get_indexes("lesson")}
+
+
+def test_v0_database_is_upgraded_with_backfill(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'v0.db'}")
+    with engine.begin() as conn:
+        for statement in V0_SCHEMA:
+            conn.execute(text(statement))
+        conn.execute(text(
+            "INSERT INTO user VALUES (1, 'u', 'User', 'A', 'user', NULL, '{}', '[\"A\", \"B\"]')"
+        ))
+        conn.execute(text(
+            "INSERT INTO lesson (group_name, date, pair_number, subject) VALUES ('A', '2026-10-19', 1, 'Математика')"
+        ))
+        conn.execute(text(
+            "INSERT INTO occupancy (building, room, date, pair_number) VALUES ('1', '101', '2026-10-19', 1)"
+        ))
+
+    assert migrate(engine) == LATEST_VERSION
+
+    with engine.connect() as conn:
+        occupancy_columns = {column["name"] for column in inspect(conn).get_columns("occupancy")}
+        assert {"is_free", "group_name"} <= occupancy_columns
+        favorites = conn.execute(text("SELECT group_name FROM user_favorites ORDER BY position")).scalars().all()
+        assert favorites == ["A", "B"]
+        templates = conn.execute(text("SELECT group_name, pair_number, subject FROM schedule_templates")).all()
+        assert templates == [("A", 1, "Математика")]
+        lesson_indexes = {ix["name"] for ix in inspect(conn).get_indexes("lesson")}
+        assert "ix_lesson_group_date_pair" in lesson_indexes and "ix_lesson_group_name" not in lesson_indexes
@@ -0,0 +1,54 @@
+from pathlib import Path
+
+import fitz
+import pytest
+
+from tgbot.services.parser.pdf_parser import process_pdf_sync
+
+FONT = Path("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf")
+GROUP = "ГРП-01"
+
+
+@pytest.fixture
+def schedule_pdf(tmp_path):
+    """Расписание группы в геометрии сайта: дата | время | занятие, строки разделены линиями."""
+    if not FONT.exists():
+        pytest.skip("нет шрифта с кириллицей")
+    path = tmp_path / "sched_123_20102026_26102026.pdf"
+    doc = fitz.open()
+    page = doc.new_page(width=595, height=842)
+    page.insert_font(fontname="dv", fontfile=str(FONT))
+    rows = [
+        ("20.10.26", "08:20-09:50", f"{GROUP} Математика Лекция Иванов И.И. 1-234"),
+        ("", "10:00-11:30", f"{GROUP} Физика Практика Петров П.П. 2-105"),
+    ]
+    y = 100
+    page.draw_line((30, y), (560, y))
+    for day, time, info in rows:
+        page.insert_text((41, y + 20), day, fontname="dv", fontsize=6)
+        page.insert_text((84, y + 20), time, fontname="dv", fontsize=8)
+        page.insert_text((150, y + 20), info, fontname="dv", fontsize=8)
+        y += 40
+        page.draw_line((30, y), (560, y))
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def test_parses_lessons_from_pdf(schedule_pdf):
+    lessons = process_pdf_sync(schedule_pdf, GROUP)
+
+    assert [(l.date, l.pair_number, l.start_time) for l in lessons] == [
+        ("2026-10-20", 1, "08:20"),
+        ("2026-10-20", 2, "10:00"),
+    ]
+    first = lessons[0]
+    assert first.subject == "Математика"
+    assert first.teacher == "Иванов И.И."
+    assert first.room == "234"
+
+
+def test_bad_filename_returns_nothing(tmp_path):
+    path = tmp_path / "schedule.pdf"
+    path.write_bytes(b"")
+    assert process_pdf_sync(path, GROUP) == []
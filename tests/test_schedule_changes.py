@@ -0,0 +1,53 @@
+from datetime import date, timedelta
+
+from tgbot.services.schedule_changes import MAX_MESSAGE_LENGTH, diff_day, format_day_changes, format_group_changes
+
+
+def row(pair, subject, room="101"):
+    return (pair, "08:20", "09:50", subject, "Лекция", "Иванов И.И.", "1", room, None)
+
+
+def test_diff_day_unchanged_ignores_order():
+    day = [row(1, "Математика"), row(2, "Физика")]
+    assert diff_day(day, list(reversed(day))) is None
+
+
+def test_diff_day_reports_multiset_difference():
+    old = [row(1, "Математика"), row(2, "Физика"), row(2, "Физика")]
+    new = [row(1, "Математика", room="202"), row(2, "Физика")]
+
+    removed, added = diff_day(old, new)
+    assert removed == [row(1, "Математика"), row(2, "Физика")]
+    assert added == [row(1, "Математика", room="202")]
+
+
+def test_format_day_changes_by_pair():
+    lines = format_day_changes(diff_day(
+        [row(1, "Математика"), row(2, "Физика")],
+        [row(1, "Химия"), row(3, "История")],
+    ))
+    assert lines[0].startswith("🔄 1 пара (08:20): Математика")
+    assert "<b>Химия" in lines[0]
+    assert lines[1].startswith("❌ 2 пара") and lines[1].endswith("отменена")
+    assert lines[2].startswith("➕ 3 пара")
+
+
+def test_format_group_changes_fits_telegram_limit():
+    days = {}
+    for i in range(20):
+        day = (date(2026, 10, 19) + timedelta(days=i)).isoformat()
+        days[day] = (
+            [row(p, "Старый предмет " * 3) for p in range(1, 8)],
+            [row(p, "Новый предмет " * 3) for p in range(1, 8)],
+        )
+
+    text = format_group_changes("ИВТб-1301-05-00", days)
+    assert len(text) <= MAX_MESSAGE_LENGTH
+    assert text.startswith("🔔 <b>Изменения в расписании ИВТб-1301-05-00</b>")
+    assert "дней с изменениями" in text or "дня с изменениями" in text
+
+
+def test_format_group_changes_single_day():
+    text = format_group_changes("Г-1", {"2026-10-19": ([row(1, "Математика")], [])})
+    assert "<b>Пн, 19.10</b>" in text
+    assert "… и ещё" not in text
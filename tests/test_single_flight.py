@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from tgbot.services.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("test_coalesce")
+    calls = []
+
+    async def load(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return f"value:{key}"
+
+    async def main():
+        return await asyncio.gather(*(flight.do("a", load, "a") for _ in range(5)), flight.do("b", load, "b"))
+
+    results = asyncio.run(main())
+
+    assert results == ["value:a"] * 5 + ["value:b"]
+    assert sorted(calls) == ["a", "b"]
+    assert flight.stats["executions"] == 2
+    assert flight.stats["coalesced"] == 4
+    assert flight.get_stats()["in_flight"] == 0
+
+
+def test_success_is_cached_for_result_ttl():
+    flight = SingleFlight("test_cached", result_ttl=60)
+    calls = []
+
+    async def load():
+        calls.append(1)
+        return len(calls)
+
+    async def main():
+        first = await flight.do("k", load)
+        second = await flight.do("k", load)
+        flight.forget("k")
+        third = await flight.do("k", load)
+        return first, second, third
+
+    assert asyncio.run(main()) == (1, 1, 2)
+    assert flight.stats["cached"] == 1
+
+
+def test_failure_is_shared_but_not_cached():
+    flight = SingleFlight("test_failure", result_ttl=60)
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        if len(calls) == 1:
+            raise RuntimeError("HTTP 503")
+        return "ok"
+
+    async def main():
+        failed = await asyncio.gather(flight.do("k", load), flight.do("k", load), return_exceptions=True)
+        return failed, await flight.do("k", load)
+
+    failed, retried = asyncio.run(main())
+
+    assert all(isinstance(e, RuntimeError) for e in failed)
+    assert retried == "ok"
+    assert len(calls) == 2
+
+
+def test_cancelled_waiter_does_not_cancel_shared_call():
+    flight = SingleFlight("test_cancel")
+
+    async def load():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def main():
+        first = asyncio.create_task(flight.do("k", load))
+        second = asyncio.create_task(flight.do("k", load))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "done"
@@ -0,0 +1,54 @@
+from tgbot.services.teacher_index import TeacherIndex, split_teachers, teacher_key
+
+NAMES = ["Иванов И.И.", "Иванова А.П.", "Петров С.С., Сидоров В.В.", "Ёлкин Д.А."]
+
+
+def build() -> TeacherIndex:
+    index = TeacherIndex()
+    index.rebuild(NAMES)
+    return index
+
+
+def test_split_and_key():
+    assert split_teachers("Петров С.С., Сидоров В.В.") == ["Петров С.С.", "Сидоров В.В."]
+    assert split_teachers(None) == []
+    assert teacher_key("Иванов Иван Иванович") == teacher_key("Иванов И.И.") == ("иванов", "и")
+
+
+def test_exact_beats_prefix():
+    results = build().search("иванов")
+    assert results[0] == ("Иванов И.И.", TeacherIndex.EXACT)
+    assert results[1][0] == "Иванова А.П."
+    assert TeacherIndex.SUBSTRING <= results[1][1] < TeacherIndex.EXACT
+
+
+def test_comma_joined_names_are_indexed_separately():
+    index = build()
+    assert len(index) == 5
+    assert index.search("сидоров")[0] == ("Сидоров В.В.", TeacherIndex.EXACT)
+
+
+def test_yo_and_substring():
+    index = build()
+    assert index.search("елкин")[0][0] == "Ёлкин Д.А."
+    name, score = index.search("идоро")[0]
+    assert name == "Сидоров В.В." and score == TeacherIndex.SUBSTRING
+
+
+def test_typo_is_fuzzy_below_substring_threshold():
+    results = build().search("Ивонов")
+    assert results and results[0][0] == "Иванов И.И."
+    assert results[0][1] < TeacherIndex.SUBSTRING
+
+
+def test_initials_refine_and_unknown_is_empty():
+    index = build()
+    assert index.search("Иванов А")[0][0] == "Иванова А.П."
+    assert index.search("Кузнецов") == []
+
+
+def test_added_names_survive_rebuild():
+    index = build()
+    index.add_names(["Кузнецов Олег Петрович"])
+    index.rebuild(NAMES)
+    assert index.search("кузнецов")[0][0] == "Кузнецов Олег Петрович"
@@ -6,11 +6,15 @@ Endpoints:
     GET /api/health             — Health check
     GET /api/groups/search?q=  — Search university groups
     GET /api/schedule/{group}  — Get schedule for the current week (upcoming 7 days)
+    GET /api/metrics           — SQL timings and DB pool stats (METRICS_TOKEN or localhost only)
 """
+import hmac
 import logging
 from datetime import date, timedelta
 
 from aiohttp import web
+from tgbot.config import config
+from tgbot.database.query_stats import query_stats
 from tgbot.database.repositories import DatabaseManager, ScheduleRepository
 
 _db_manager: DatabaseManager | None = None
@@ -45,17 +49,18 @@ async def handle_get_schedule(request: web.Request) -> web.Response:
     repo = ScheduleRepository(_db_manager)
     schedule_days = []
 
-    # Return 7 days of schedule starting from the requested date
-    for offset in range(7):
-        day = target + timedelta(days=offset)
-        lessons = await repo.get_lessons(group_name, day)
+    # Return 7 days of schedule starting from the requested date: one range query,
+    # plus one batched prediction for the days without real lessons
+    end = target + timedelta(days=6)
+    lessons_by_day = await repo.get_lessons_range(group_name, target, end)
+    empty_days = [day for day, lessons in lessons_by_day.items() if not lessons]
+    predicted_by_day = await repo.get_predicted_schedule_range(group_name, empty_days)
 
+    for day, lessons in lessons_by_day.items():
+        predicted = False
         if not lessons:
-            # Try predicted schedule if nothing was found for this day
-            lessons = await repo.get_predicted_schedule(group_name, day)
+            lessons = predicted_by_day.get(day, [])
             predicted = bool(lessons)
-        else:
-            predicted = False
 
         schedule_days.append({
             "date": day.isoformat(),
@@ -79,6 +84,21 @@ async def handle_get_schedule(request: web.Request) -> web.Response:
     return web.json_response({"group": group_name, "start_date": date_str, "schedule": schedule_days})
 
 
+async def handle_metrics(request: web.Request) -> web.Response:
+    if config.METRICS_TOKEN:
+        token = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+        if not hmac.compare_digest(token, config.METRICS_TOKEN):
+            return web.json_response({"error": "Unauthorized"}, status=401)
+    elif request.remote not in ("127.0.0.1", "::1"):
+        return web.json_response({"error": "Forbidden"}, status=403)
+
+    try:
+        limit = int(request.rel_url.query.get("limit", 20))
+    except ValueError:
+        return web.json_response({"error": "Invalid limit"}, status=400)
+    return web.json_response({"queries": query_stats.snapshot(limit=limit), "db": _db_manager.get_stats()})
+
+
 def setup_app(db: DatabaseManager) -> web.Application:
     global _db_manager
     _db_manager = db
@@ -88,6 +108,7 @@ def setup_app(db: DatabaseManager) -> web.Application:
         web.get("/api/health", handle_health),
         web.get("/api/groups/search", handle_groups_search),
         web.get("/api/schedule/{group_name}", handle_get_schedule),
+        web.get("/api/metrics", handle_metrics),
     ])
-    logging.info("✅ API routes registered: /api/health, /api/groups/search, /api/schedule/{group_name}")
+    logging.info("✅ API routes registered: /api/health, /api/groups/search, /api/schedule/{group_name}, /api/metrics")
     return app
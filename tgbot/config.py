@@ -34,6 +34,49 @@ class Settings(BaseSettings):
     API_HOST: str = os.getenv("API_HOST", "0.0.0.0")
     API_PORT: int = int(os.getenv("API_PORT", 8000))
     
+    # Database executor: number of reader threads (writes always go through one thread)
+    DB_READ_WORKERS: int = int(os.getenv("DB_READ_WORKERS", 4))
+    
+    # SQLite connection tuning: lock wait, page cache (KiB) and memory-mapped I/O (bytes)
+    DB_BUSY_TIMEOUT_MS: int = int(os.getenv("DB_BUSY_TIMEOUT_MS", 5000))
+    DB_CACHE_SIZE_KB: int = int(os.getenv("DB_CACHE_SIZE_KB", 16384))
+    DB_MMAP_SIZE: int = int(os.getenv("DB_MMAP_SIZE", 64 * 1024 * 1024))
+    # WAL: auto-checkpoint threshold (pages) and interval of scheduled PASSIVE checkpoints (seconds)
+    DB_WAL_AUTOCHECKPOINT: int = int(os.getenv("DB_WAL_AUTOCHECKPOINT", 1000))
+    DB_CHECKPOINT_INTERVAL: int = int(os.getenv("DB_CHECKPOINT_INTERVAL", 300))
+    # SQL statements slower than this (ms) go to the slow-query log with EXPLAIN QUERY PLAN
+    SLOW_QUERY_MS: float = float(os.getenv("SLOW_QUERY_MS", 100))
+    # Token for GET /api/metrics; without it the endpoint answers only to localhost
+    METRICS_TOKEN: str = os.getenv("METRICS_TOKEN", "")
+    
+    # Maintenance deletes: rows per write transaction and pause between batches (seconds)
+    DB_MAINTENANCE_BATCH_SIZE: int = int(os.getenv("DB_MAINTENANCE_BATCH_SIZE", 2000))
+    DB_MAINTENANCE_PAUSE: float = float(os.getenv("DB_MAINTENANCE_PAUSE", 0.05))
+    
+    # In-process user cache (LRU + TTL in seconds)
+    USER_CACHE_SIZE: int = int(os.getenv("USER_CACHE_SIZE", 5000))
+    USER_CACHE_TTL: int = int(os.getenv("USER_CACHE_TTL", 300))
+    
+    # Broadcasts: global messages/second (Telegram allows ~30), parallel requests, min seconds between messages to one chat
+    BROADCAST_RATE: float = float(os.getenv("BROADCAST_RATE", 25))
+    BROADCAST_CONCURRENCY: int = int(os.getenv("BROADCAST_CONCURRENCY", 8))
+    BROADCAST_CHAT_INTERVAL: float = float(os.getenv("BROADCAST_CHAT_INTERVAL", 1.0))
+    # Schedule change notifications after parsing: only days from today up to N days ahead
+    CHANGE_NOTIFY_DAYS: int = int(os.getenv("CHANGE_NOTIFY_DAYS", 14))
+    
+    # Rendered schedule messages (day/week HTML) keyed by group data version
+    RENDER_CACHE_SIZE: int = int(os.getenv("RENDER_CACHE_SIZE", 5000))
+    RENDER_CACHE_TTL: int = int(os.getenv("RENDER_CACHE_TTL", 6 * 60 * 60))
+    
+    # Lessons older than this move to per-semester archive DBs (keep above the 5-week PDF re-parse window)
+    LESSON_ARCHIVE_AFTER_WEEKS: int = int(os.getenv("LESSON_ARCHIVE_AFTER_WEEKS", 6))
+    
+    # Raw action_logs retention; long-term trends live in the daily rollup tables
+    ANALYTICS_RAW_RETENTION_DAYS: int = int(os.getenv("ANALYTICS_RAW_RETENTION_DAYS", 30))
+    
+    # Restore an empty piculi.db from SNAPSHOT_PATH on startup (fresh deployment / disaster recovery)
+    SNAPSHOT_RESTORE_ON_EMPTY: bool = os.getenv("SNAPSHOT_RESTORE_ON_EMPTY", "1") == "1"
+    
     # Database paths
     @property
     def DB_NAME(self) -> str:
@@ -43,6 +86,10 @@ class Settings(BaseSettings):
     def ANALYTICS_DB_NAME(self) -> str:
         return os.path.join(self.DB_DIR, "analytics.db")
     
+    @property
+    def SNAPSHOT_PATH(self) -> str:
+        return os.getenv("SNAPSHOT_PATH") or os.path.join(self.DATA_DIR, "snapshots", "piculi.db.gz")
+    
     # Словарь времени пар для конвертации в pair_number
     TIME_SLOTS: dict = {
         "08:20": 1, "08:20-09:50": 1,
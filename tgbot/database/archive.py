@@ -0,0 +1,184 @@
+"""
+Архив занятий по семестрам.
+
+В piculi.db остаются только занятия за последние LESSON_ARCHIVE_AFTER_WEEKS недель,
+более старые переносятся в файлы DB_DIR/archive/lessons_<семестр>.db
+(обычная плоская таблица lesson с тем же набором колонок). Список архивов — таблица
+archive_periods основной БД. Архив подключается ATTACH только на время запроса.
+
+Прогноз расписания работает по материализованным шаблонам (schedule_templates),
+которые переживают перенос занятий в архив.
+"""
+import logging
+import os
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from tgbot.config import config
+from tgbot.database.models import Lesson
+
+LESSON_COLUMNS = [column.name for column in Lesson.__table__.columns]
+
+_ARCHIVE_DDL = [
+    """CREATE TABLE IF NOT EXISTS {alias}.lesson (
+    id INTEGER PRIMARY KEY,
+    group_name VARCHAR NOT NULL,
+    date VARCHAR NOT NULL,
+    pair_number INTEGER,
+    start_time VARCHAR,
+    end_time VARCHAR,
+    subject VARCHAR,
+    class_type VARCHAR,
+    teacher VARCHAR,
+    building VARCHAR,
+    room VARCHAR,
+    subgroup VARCHAR,
+    raw_info VARCHAR
+)""",
+    "CREATE INDEX IF NOT EXISTS {alias}.ix_lesson_group_date_pair ON lesson (group_name, date, pair_number)",
+]
+
+
+def semester_key(d: date) -> str:
+    """Осенний семестр: сентябрь–январь (по году начала), весенний: февраль–август."""
+    if d.month >= 9:
+        return f"{d.year}-autumn"
+    if d.month == 1:
+        return f"{d.year - 1}-autumn"
+    return f"{d.year}-spring"
+
+
+def semester_bounds(key: str) -> Tuple[date, date]:
+    year, season = key.split("-")
+    year = int(year)
+    if season == "autumn":
+        return date(year, 9, 1), date(year + 1, 1, 31)
+    return date(year, 2, 1), date(year, 8, 31)
+
+
+def archive_dir() -> str:
+    return os.path.join(config.DB_DIR, "archive")
+
+
+def archive_path(filename: str) -> str:
+    return os.path.join(archive_dir(), filename)
+
+
+class ArchiveCatalog:
+    """Кэш archive_periods: большинство запросов не заходит за границу архива и не трогает его."""
+
+    def __init__(self):
+        self.periods: Optional[List[Tuple[str, str, str, str]]] = None  # (key, filename, start, end)
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.periods is not None
+
+    def load(self, periods: List[Tuple[str, str, str, str]]):
+        self.periods = sorted(periods, key=lambda p: p[2])
+
+    def invalidate(self):
+        self.periods = None
+
+    def overlapping(self, start_date: date, end_date: date) -> List[str]:
+        """Файлы архивов, пересекающихся с [start_date, end_date]."""
+        start, end = start_date.isoformat(), end_date.isoformat()
+        return [filename for _, filename, p_start, p_end in self.periods or [] if p_start <= end and p_end >= start]
+
+
+archive_catalog = ArchiveCatalog()
+
+
+def _copy_period(connection, key: str, start: date, end: date) -> int:
+    """Копирует занятия [start, end] в архив семестра и обновляет archive_periods (идемпотентно)."""
+    filename = f"lessons_{key}.db"
+    os.makedirs(archive_dir(), exist_ok=True)
+    created = not os.path.exists(archive_path(filename))
+    rows = 0
+    connection.execute("ATTACH DATABASE ? AS archive", (archive_path(filename),))
+    try:
+        connection.execute("PRAGMA archive.journal_mode=WAL")
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for statement in _ARCHIVE_DDL:
+                connection.execute(statement.format(alias="archive"))
+            columns = ", ".join(LESSON_COLUMNS)
+            # id сохраняется: повторный запуск после сбоя не создаёт дублей
+            copied = connection.execute(
+                f"INSERT OR IGNORE INTO archive.lesson ({columns}) "
+                f"SELECT {columns} FROM main.lesson WHERE date >= ? AND date <= ?",
+                (start.isoformat(), end.isoformat()),
+            ).rowcount
+            rows, first, last = connection.execute("SELECT COUNT(*), MIN(date), MAX(date) FROM archive.lesson").fetchone()
+            if not rows:
+                # Пустой архив в archive_periods не записываем (start_date NOT NULL)
+                connection.execute("ROLLBACK")
+                return 0
+            connection.execute(
+                "INSERT INTO main.archive_periods (key, filename, start_date, end_date, rows, archived_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(key) DO UPDATE SET "
+                "start_date = excluded.start_date, end_date = excluded.end_date, "
+                "rows = excluded.rows, archived_at = excluded.archived_at",
+                (key, filename, first, last, rows, datetime.now().isoformat(timespec="seconds")),
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+    finally:
+        connection.execute("DETACH DATABASE archive")
+        if created and not rows:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(archive_path(filename) + suffix):
+                    os.remove(archive_path(filename) + suffix)
+    return copied
+
+
+def archive_before(connection, cutoff: date) -> Dict[str, int]:
+    """
+    Копирует занятия с датой < cutoff в архивы по семестрам (сырое соединение писателя).
+    Удаление из основной БД — на вызывающем (пачками). Возвращает {семестр: скопировано строк}.
+    """
+    first = connection.execute("SELECT MIN(date) FROM lesson WHERE date < ?", (cutoff.isoformat(),)).fetchone()[0]
+    if not first:
+        return {}
+    copied = {}
+    key = semester_key(date.fromisoformat(first))
+    while True:
+        start, end = semester_bounds(key)
+        if start >= cutoff:
+            break
+        last = min(end, cutoff - timedelta(days=1))
+        # Семестры без занятий до cutoff (cutoff в начале семестра, пропуски) не трогаем
+        has_rows = connection.execute(
+            "SELECT 1 FROM lesson WHERE date >= ? AND date <= ? LIMIT 1", (start.isoformat(), last.isoformat())
+        ).fetchone()
+        if not has_rows:
+            key = semester_key(end + timedelta(days=1))
+            continue
+        copied[key] = _copy_period(connection, key, start, last)
+        logging.info(f"🗄️ Archive {key}: {copied[key]} lessons copied")
+        key = semester_key(end + timedelta(days=1))
+    return copied
+
+
+def read_archived_lessons(connection, filenames: List[str], group_name: str, start_date: date, end_date: date) -> List[Lesson]:
+    """Занятия группы за период из архивов (сырое соединение читателя, ATTACH на время запроса)."""
+    columns = ", ".join(LESSON_COLUMNS)
+    lessons = []
+    for filename in filenames:
+        path = archive_path(filename)
+        if not os.path.exists(path):
+            logging.warning(f"⚠️ Archive file is missing: {path}")
+            continue
+        connection.execute("ATTACH DATABASE ? AS archive", (path,))
+        try:
+            rows = connection.execute(
+                f"SELECT {columns} FROM archive.lesson WHERE group_name = ? AND date >= ? AND date <= ? "
+                f"ORDER BY date, pair_number",
+                (group_name, start_date.isoformat(), end_date.isoformat()),
+            ).fetchall()
+        finally:
+            connection.execute("DETACH DATABASE archive")
+        lessons.extend(Lesson(**dict(zip(LESSON_COLUMNS, row))) for row in rows)
+    return lessons
@@ -0,0 +1,34 @@
+from typing import Dict, Iterable, Tuple
+
+
+class GroupDataVersions:
+    """
+    Версии данных занятий по группам.
+
+    Запись занятий группы (парсер) вызывает `bump(groups)`, массовые изменения
+    (архивация, очистка) — `bump_all()`. Версия входит в ключи кэшей, построенных
+    по занятиям, поэтому устаревшие записи просто перестают находиться.
+    """
+
+    def __init__(self):
+        self.epoch = 0
+        self._versions: Dict[str, int] = {}
+        self.stats = {"bumps": 0, "bump_all": 0}
+
+    def get(self, group_name: str) -> Tuple[int, int]:
+        return self.epoch, self._versions.get(group_name, 0)
+
+    def bump(self, group_names: Iterable[str]):
+        for name in group_names:
+            self._versions[name] = self._versions.get(name, 0) + 1
+            self.stats["bumps"] += 1
+
+    def bump_all(self):
+        self.epoch += 1
+        self.stats["bump_all"] += 1
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "epoch": self.epoch, "groups": len(self._versions)}
+
+
+lesson_versions = GroupDataVersions()
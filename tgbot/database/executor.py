@@ -0,0 +1,255 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import SingletonThreadPool
+
+from tgbot.database.query_stats import query_stats, instrument_engine, method_name
+
+# Ожидание блокировки дольше порога считается "lock wait" в статистике
+LOCK_WAIT_THRESHOLD_MS = 5.0
+
+CHECKPOINT_MODES = ("PASSIVE", "FULL", "RESTART", "TRUNCATE")
+
+
+def sqlite_pragmas(busy_timeout_ms: int, cache_size_kb: int, mmap_size: int, wal_autocheckpoint: int) -> Dict[str, Any]:
+    """Общие PRAGMA соединений; journal_mode применяется только к пишущим соединениям."""
+    return {
+        # Действует для новой БД; существующие переводятся разовым VACUUM в DatabaseManager.optimize()
+        "auto_vacuum": "INCREMENTAL",
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": busy_timeout_ms,
+        # Отрицательное значение cache_size — размер в KiB, а не в страницах
+        "cache_size": -cache_size_kb,
+        "mmap_size": mmap_size,
+        "wal_autocheckpoint": wal_autocheckpoint,
+        "temp_store": "MEMORY",
+    }
+
+
+def _is_busy_error(exc: BaseException) -> bool:
+    orig = getattr(exc, "orig", exc)
+    return isinstance(orig, sqlite3.OperationalError) and ("locked" in str(orig) or "busy" in str(orig))
+
+
+class _DbPool:
+    """
+    Ограниченный пул потоков с собственным движком SQLAlchemy.
+
+    SingletonThreadPool держит одно соединение на поток, а размер пула совпадает
+    с числом потоков, поэтому каждый поток работает со своим долгоживущим
+    соединением SQLite и не делит его с чужими потоками (парсинг PDF и т.п.).
+
+    Пул чтения открывает соединения с `query_only`, пул записи начинает каждую
+    транзакцию с BEGIN IMMEDIATE: блокировка на запись берётся сразу, а время её
+    ожидания (busy_timeout) попадает в статистику lock wait.
+    """
+
+    def __init__(self, name: str, db_path: str, workers: int, max_pending: int,
+                 pragmas: Optional[Dict[str, Any]], read_only: bool = False):
+        self.name = name
+        self.workers = workers
+        self.read_only = read_only
+        self.engine = create_engine(
+            f"sqlite:///{db_path}",
+            poolclass=SingletonThreadPool,
+            pool_size=workers,
+            # Соединение используется только своим потоком; флаг нужен, чтобы dispose()
+            # при остановке мог закрыть соединения из главного потока
+            connect_args={"check_same_thread": False},
+        )
+        self._pragmas = dict(pragmas or {})
+        if read_only:
+            # Режим журнала и auto_vacuum — свойства файла, их задаёт пишущее соединение
+            self._pragmas.pop("journal_mode", None)
+            self._pragmas.pop("auto_vacuum", None)
+            self._pragmas["query_only"] = 1
+        event.listen(self.engine, "connect", self._on_connect)
+        instrument_engine(self.engine)
+        if not read_only:
+            event.listen(self.engine, "begin", self._on_begin)
+        self.session_factory = sessionmaker(self.engine, expire_on_commit=False, class_=Session)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"db-{name}")
+        self._max_pending = max_pending
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            "submitted": 0,
+            "completed": 0,
+            "errors": 0,
+            "queue_depth": 0,
+            "max_queue_depth": 0,
+            "total_wait_ms": 0.0,
+            "max_wait_ms": 0.0,
+            "total_exec_ms": 0.0,
+            "lock_waits": 0,
+            "total_lock_wait_ms": 0.0,
+            "max_lock_wait_ms": 0.0,
+            "busy_errors": 0,
+        }
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        if not self.read_only:
+            # Транзакциями управляет _on_begin, а не неявный BEGIN драйвера
+            dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for pragma, value in self._pragmas.items():
+            cursor.execute(f"PRAGMA {pragma}={value}")
+        cursor.close()
+
+    def _on_begin(self, conn):
+        started = time.perf_counter()
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        wait_ms = (time.perf_counter() - started) * 1000
+        with self._stats_lock:
+            self.stats["total_lock_wait_ms"] += wait_ms
+            self.stats["max_lock_wait_ms"] = max(self.stats["max_lock_wait_ms"], wait_ms)
+            if wait_ms >= LOCK_WAIT_THRESHOLD_MS:
+                self.stats["lock_waits"] += 1
+
+    def _run(self, submitted_at: float, fn: Callable[..., Any], args: tuple, raw: bool = False) -> Any:
+        started = time.perf_counter()
+        wait_ms = (started - submitted_at) * 1000
+        with self._stats_lock:
+            self.stats["queue_depth"] -= 1
+            self.stats["total_wait_ms"] += wait_ms
+            self.stats["max_wait_ms"] = max(self.stats["max_wait_ms"], wait_ms)
+        failed = busy = False
+        result = None
+        try:
+            if raw:
+                # Сырое DB-API соединение потока, вне транзакции SQLAlchemy (wal_checkpoint)
+                connection = self.engine.raw_connection()
+                try:
+                    result = fn(connection.driver_connection, *args)
+                finally:
+                    connection.close()
+            else:
+                with self.session_factory() as session:
+                    result = fn(session, *args)
+            return result
+        except Exception as e:
+            failed = True
+            busy = _is_busy_error(e)
+            raise
+        finally:
+            exec_ms = (time.perf_counter() - started) * 1000
+            with self._stats_lock:
+                self.stats["completed"] += 1
+                self.stats["errors"] += int(failed)
+                self.stats["busy_errors"] += int(busy)
+                self.stats["total_exec_ms"] += exec_ms
+            rows = len(result) if hasattr(result, "__len__") else int(result is not None)
+            query_stats.record_call(method_name(fn), self.name, wait_ms, exec_ms, rows)
+
+    async def submit(self, fn: Callable[..., Any], *args, raw: bool = False) -> Any:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self._max_pending)
+        # Ограничиваем очередь: при перегрузке вызывающие ждут здесь, а не копят задачи в пуле
+        async with self._slots:
+            with self._stats_lock:
+                self.stats["submitted"] += 1
+                self.stats["queue_depth"] += 1
+                self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], self.stats["queue_depth"])
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._run, time.perf_counter(), fn, args, raw)
+
+    def get_stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self.stats)
+        completed = stats["completed"] or 1
+        return {
+            **stats,
+            "workers": self.workers,
+            "avg_wait_ms": stats["total_wait_ms"] / completed,
+            "avg_exec_ms": stats["total_exec_ms"] / completed,
+            "avg_lock_wait_ms": stats["total_lock_wait_ms"] / completed,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+        self.engine.dispose()
+
+
+class DatabaseExecutor:
+    """
+    Выделенный слой исполнения запросов к БД.
+
+    Чтения идут в пул из `read_workers` потоков, все записи — в единственный
+    поток-писатель, так что запись в SQLite сериализуется внутри процесса,
+    а запросы пользователей не стоят в очереди за CPU-тяжёлым парсингом
+    в общем пуле asyncio.to_thread.
+    """
+
+    def __init__(self, db_path: str, read_workers: int = 4, max_pending: int = 256,
+                 pragmas: Optional[Dict[str, Any]] = None):
+        self.db_path = db_path
+        self.reader = _DbPool("read", db_path, read_workers, max_pending, pragmas, read_only=True)
+        self.writer = _DbPool("write", db_path, 1, max_pending, pragmas)
+        self.checkpoint_stats = {
+            "runs": 0,
+            "busy": 0,             # чекпойнт не дошёл до конца WAL из-за активных читателей
+            "frames_checkpointed": 0,
+            "last_wal_frames": 0,
+            "last_ms": 0.0,
+            "max_ms": 0.0,
+        }
+
+    async def read(self, fn: Callable[..., Any], *args) -> Any:
+        """Выполняет fn(session, *args) в пуле чтения."""
+        return await self.reader.submit(fn, *args)
+
+    async def write(self, fn: Callable[..., Any], *args) -> Any:
+        """Выполняет fn(session, *args) в потоке-писателе. Коммит — на стороне fn."""
+        return await self.writer.submit(fn, *args)
+
+    async def checkpoint(self, mode: str = "PASSIVE") -> tuple:
+        """
+        PRAGMA wal_checkpoint в потоке-писателе. PASSIVE не ждёт читателей и не
+        блокирует их: переносит в БД те кадры WAL, которые уже никому не нужны.
+        Возвращает (busy, кадров в WAL, перенесено кадров).
+        """
+        mode = mode.upper()
+        if mode not in CHECKPOINT_MODES:
+            raise ValueError(f"Unknown checkpoint mode: {mode}")
+
+        def _sync_checkpoint(connection):
+            return tuple(connection.execute(f"PRAGMA wal_checkpoint({mode})").fetchone())
+
+        started = time.perf_counter()
+        busy, wal_frames, checkpointed = await self.writer.submit(_sync_checkpoint, raw=True)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        stats = self.checkpoint_stats
+        stats["runs"] += 1
+        stats["busy"] += int(bool(busy))
+        stats["frames_checkpointed"] += max(checkpointed, 0)
+        stats["last_wal_frames"] = wal_frames
+        stats["last_ms"] = elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+        return busy, wal_frames, checkpointed
+
+    def _wal_size_kb(self) -> float:
+        try:
+            return os.path.getsize(f"{self.db_path}-wal") / 1024
+        except OSError:
+            return 0.0
+
+    def get_stats(self) -> dict:
+        return {
+            "read": self.reader.get_stats(),
+            "write": self.writer.get_stats(),
+            "checkpoint": {**self.checkpoint_stats, "wal_size_kb": self._wal_size_kb()},
+        }
+
+    def shutdown(self):
+        self.reader.shutdown()
+        self.writer.shutdown()
+        logging.info("⏹️ DB executor stopped.")
@@ -0,0 +1,150 @@
+import bisect
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Set
+
+
+def fold_group_name(text: str) -> str:
+    """Ключ поиска группы: casefold + ё -> е, без крайних пробелов."""
+    return text.strip().casefold().replace("ё", "е")
+
+
+def _trigrams(key: str) -> Set[str]:
+    return {key[i:i + 3] for i in range(len(key) - 2)}
+
+
+class GroupNameIndex:
+    """
+    In-memory индекс названий групп.
+
+    - отсортированные casefold-ключи: точное совпадение и префикс через bisect;
+    - постинги по триграммам: подстрока длиной >= 3 проверяется только у кандидатов.
+
+    Индекс версионирован: `invalidate()` увеличивает `version`, а `rebuild()`
+    запоминает версию, с которой начиналась загрузка. Если во время загрузки
+    пришла новая инвалидация, индекс остаётся устаревшим и перестроится снова.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.version = 1
+        self._built_version = 0
+        self._names: List[str] = []
+        self._keys: List[str] = []          # отсортированные ключи
+        self._key_ids: List[int] = []       # ключ -> индекс в _names
+        self._folded: List[str] = []        # _names[i] -> ключ
+        self._trigrams: Dict[str, Set[int]] = {}
+        self.built_at: float = 0.0
+        self.stats = {"rebuilds": 0, "searches": 0, "invalidations": 0}
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __contains__(self, name: str) -> bool:
+        key = fold_group_name(name)
+        pos = bisect.bisect_left(self._keys, key)
+        return pos < len(self._keys) and self._keys[pos] == key
+
+    @property
+    def is_stale(self) -> bool:
+        return self._built_version != self.version
+
+    def invalidate(self):
+        self.version += 1
+        self.stats["invalidations"] += 1
+
+    def rebuild(self, names: Iterable[str], version: int):
+        """`version` — значение self.version, прочитанное до загрузки имён из БД."""
+        unique = sorted({n for n in names if n})
+        folded = [fold_group_name(n) for n in unique]
+        order = sorted(range(len(unique)), key=lambda i: folded[i])
+        trigrams: Dict[str, Set[int]] = defaultdict(set)
+        for i, key in enumerate(folded):
+            for tri in _trigrams(key):
+                trigrams[tri].add(i)
+
+        self._names = unique
+        self._folded = folded
+        self._keys = [folded[i] for i in order]
+        self._key_ids = order
+        self._trigrams = dict(trigrams)
+        self._built_version = version
+        self.built_at = time.monotonic()
+        self.stats["rebuilds"] += 1
+
+    def search(self, query: str, limit: int = 15) -> List[str]:
+        """Точное совпадение, затем префикс, затем подстрока; внутри ранга — по алфавиту."""
+        self.stats["searches"] += 1
+        q = fold_group_name(query)
+        if not q or not self._names:
+            return []
+
+        ranked: Dict[int, int] = {}
+        # 0/1: точное совпадение и префикс — непрерывный диапазон отсортированных ключей
+        start = bisect.bisect_left(self._keys, q)
+        for pos in range(start, len(self._keys)):
+            key = self._keys[pos]
+            if not key.startswith(q):
+                break
+            ranked[self._key_ids[pos]] = 0 if key == q else 1
+
+        # 2: подстрока. Кандидаты — пересечение постингов триграмм запроса
+        if len(q) >= 3:
+            postings = sorted((self._trigrams.get(tri, set()) for tri in _trigrams(q)), key=len)
+            candidates = set.intersection(*postings) if postings and postings[0] else set()
+        else:
+            candidates = range(len(self._names))
+        for i in candidates:
+            if i not in ranked and q in self._folded[i]:
+                ranked[i] = 2
+
+        ordered = sorted(ranked, key=lambda i: (ranked[i], self._folded[i]))
+        return [self._names[i] for i in ordered[:limit]]
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "size": len(self._names), "version": self.version, "stale": self.is_stale}
+
+
+# Группы, по которым есть занятия в БД (Lesson.group_name)
+lesson_groups_index = GroupNameIndex("lesson_groups")
+# Полный список групп с сайта ВятГУ (TrackedGroup)
+tracked_groups_index = GroupNameIndex("tracked_groups")
+
+
+if __name__ == "__main__":
+    # Микробенчмарк: линейный фильтр (как раньше в search_groups) против индекса
+    import random
+
+    random.seed(0)
+    prefixes = ["ИВТб", "ПИб", "ФИб", "ЭКб", "ЮРб", "МЕНб", "ХИМб", "БИОб", "ПСб", "ЛИНГб", "СТРм", "ЭЛб"]
+    groups = sorted({
+        f"{random.choice(prefixes)}-{random.randint(1, 4)}{random.randint(100, 399)}-{random.randint(1, 9):02d}-00"
+        for _ in range(4000)
+    })
+    queries = [random.choice(prefixes)[:random.randint(2, 4)] for _ in range(300)]
+    queries += [g[random.randint(0, 4):random.randint(7, 12)] for g in random.sample(groups, 300)]
+
+    def linear(query: str) -> List[str]:
+        q = query.strip().lower()
+        matches = [g for g in groups if q in g.lower()]
+        matches.sort(key=lambda x: 0 if x.lower() == q else 1 if x.lower().startswith(q) else 2)
+        return matches[:15]
+
+    index = GroupNameIndex("bench")
+    t0 = time.perf_counter()
+    index.rebuild(groups, index.version)
+    build_ms = (time.perf_counter() - t0) * 1000
+
+    t0 = time.perf_counter()
+    for q in queries:
+        linear(q)
+    linear_ms = (time.perf_counter() - t0) * 1000
+
+    t0 = time.perf_counter()
+    for q in queries:
+        index.search(q)
+    index_ms = (time.perf_counter() - t0) * 1000
+
+    print(f"groups={len(groups)} queries={len(queries)} build={build_ms:.1f}ms")
+    print(f"linear: {linear_ms:.1f}ms ({linear_ms / len(queries) * 1000:.0f}us/query)")
+    print(f"index:  {index_ms:.1f}ms ({index_ms / len(queries) * 1000:.0f}us/query)")
@@ -0,0 +1,145 @@
+import logging
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlmodel import SQLModel
+
+from tgbot.database.models import (
+    ScheduleTemplate, DailyActionStat, DailyGroupStat, DailyUserStat, DailySummary, ArchivePeriod, UserFavorite,
+    BroadcastJob, BroadcastRecipient,
+)
+from tgbot.database.rollups import rebuild_rollups
+from tgbot.database.templates import rebuild_all_templates
+
+
+def _column_names(conn: Connection, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(text(f"PRAGMA table_info({table})")).fetchall()]
+
+
+def _m001_occupancy_columns(conn: Connection):
+    """Legacy-колонки occupancy, раньше добавлялись проверкой на каждом старте."""
+    columns = _column_names(conn, "occupancy")
+    if "is_free" not in columns:
+        conn.execute(text("ALTER TABLE occupancy ADD COLUMN is_free BOOLEAN DEFAULT 1"))
+    if "group_name" not in columns:
+        conn.execute(text("ALTER TABLE occupancy ADD COLUMN group_name VARCHAR"))
+
+
+def _m002_composite_indexes(conn: Connection):
+    """Составные индексы под запросы репозиториев."""
+    statements = [
+        # get_lessons / get_lessons_for_groups: group_name = ? AND date = ? ORDER BY pair_number;
+        # также покрывает DISTINCT group_name и поиск опорной даты в get_predicted_schedule
+        "CREATE INDEX IF NOT EXISTS ix_lesson_group_date_pair ON lesson (group_name, date, pair_number)",
+        # get_occupied_rooms: date, pair_number, is_free (+ building) -> room без обращения к таблице
+        "CREATE INDEX IF NOT EXISTS ix_occupancy_date_pair_free ON occupancy (date, pair_number, is_free, building, room)",
+        # get_available_pairs: date, building, is_free -> DISTINCT pair_number
+        "CREATE INDEX IF NOT EXISTS ix_occupancy_date_building_free ON occupancy (date, building, is_free, pair_number)",
+        # get_buildings / get_all_rooms: DISTINCT building, room
+        "CREATE INDEX IF NOT EXISTS ix_occupancy_building_room ON occupancy (building, room)",
+        # get_users_by_group (рассылки кураторов)
+        'CREATE INDEX IF NOT EXISTS ix_user_group_name ON "user" (group_name)',
+        # cleanup_old_logs: timestamp < ?
+        "CREATE INDEX IF NOT EXISTS ix_action_logs_timestamp ON action_logs (timestamp)",
+        # Одноколоночные индексы, ставшие префиксами составных, только замедляют вставку
+        "DROP INDEX IF EXISTS ix_lesson_group_name",
+        "DROP INDEX IF EXISTS ix_occupancy_date",
+        "DROP INDEX IF EXISTS ix_occupancy_building",
+    ]
+    for statement in statements:
+        conn.execute(text(statement))
+
+
+def _m003_schedule_templates(conn: Connection):
+    """Таблица шаблонов прогноза и бэкфилл по уже загруженным занятиям."""
+    ScheduleTemplate.__table__.create(conn, checkfirst=True)
+    rebuild_all_templates(conn)
+
+
+def _m004_analytics_rollups(conn: Connection):
+    """Дневные агрегаты аналитики и бэкфилл по сохранившимся сырым логам."""
+    for model in (DailyActionStat, DailyGroupStat, DailyUserStat, DailySummary):
+        model.__table__.create(conn, checkfirst=True)
+    rebuild_rollups(conn)
+
+
+def _m005_reserved(conn: Connection):
+    """Номер зарезервирован: lesson остаётся обычной таблицей, схема не меняется."""
+
+
+def _m006_archive_periods(conn: Connection):
+    """Каталог семестровых архивов занятий."""
+    ArchivePeriod.__table__.create(conn, checkfirst=True)
+
+
+def _m007_user_favorites(conn: Connection):
+    """Избранное из JSON-колонки user.favorites_json -> таблица user_favorites."""
+    UserFavorite.__table__.create(conn, checkfirst=True)
+    conn.execute(text(
+        'INSERT OR IGNORE INTO user_favorites (user_id, group_name, position) '
+        'SELECT u.telegram_id, j.value, j.key FROM "user" u, json_each(u.favorites_json) j '
+        "WHERE json_valid(u.favorites_json) AND json_type(u.favorites_json) = 'array' AND j.type = 'text'"
+    ))
+
+
+def _m008_broadcast_jobs(conn: Connection):
+    """Журнал рассылок для продолжения после рестарта."""
+    BroadcastJob.__table__.create(conn, checkfirst=True)
+    BroadcastRecipient.__table__.create(conn, checkfirst=True)
+
+
+# Упорядоченный список миграций: (версия, описание, функция).
+# Новые таблицы/колонки/индексы добавляются только новой записью в конце списка —
+# при актуальной схеме create_db_and_tables не делает никакой интроспекции.
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "occupancy: is_free/group_name columns", _m001_occupancy_columns),
+    (2, "composite indexes for repository queries", _m002_composite_indexes),
+    (3, "schedule_templates for predicted schedule", _m003_schedule_templates),
+    (4, "daily analytics rollups", _m004_analytics_rollups),
+    (5, "reserved (no schema change)", _m005_reserved),
+    (6, "semester lesson archive catalog", _m006_archive_periods),
+    (7, "normalized user favorites", _m007_user_favorites),
+    (8, "persistent broadcast jobs", _m008_broadcast_jobs),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn: Connection) -> int:
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        "version INTEGER PRIMARY KEY, description VARCHAR, applied_at VARCHAR)"
+    ))
+    return conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+
+
+def run_migrations(conn: Connection) -> int:
+    """
+    Приводит схему к LATEST_VERSION. Возвращает число применённых миграций.
+    Вызывающий отвечает за commit.
+    """
+    current = get_schema_version(conn)
+    if current >= LATEST_VERSION:
+        return 0
+
+    # Таблицы, которых ещё нет, создаём по моделям; всё остальное — через миграции
+    SQLModel.metadata.create_all(conn)
+
+    applied = 0
+    for version, description, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        logging.info(f"🛠️ Migration {version}: {description}")
+        migrate(conn)
+        conn.execute(
+            text("INSERT INTO schema_version (version, description, applied_at) VALUES (:v, :d, :t)"),
+            {"v": version, "d": description, "t": datetime.now().isoformat(timespec="seconds")},
+        )
+        applied += 1
+
+    # Обновляем статистику планировщика под новые индексы
+    conn.execute(text("ANALYZE"))
+    logging.info(f"✅ Schema migrated: v{current} -> v{LATEST_VERSION}")
+    return applied
@@ -1,14 +1,24 @@
 from __future__ import annotations
 from datetime import date
-from typing import Optional, List, Dict, Any
+from typing import Optional, Dict, Any
 from sqlmodel import SQLModel, Field, Relationship, JSON, Column
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 import json
 
 class UserSettings(BaseModel):
+    # Неизменяемые: экземпляр кэшируется на User, изменение — только через user.settings = ...
+    model_config = ConfigDict(frozen=True)
+
     show_teachers: bool = True
     show_building: bool = True
     show_windows: bool = True
+    # Уведомления об изменениях расписания после парсинга (см. services/schedule_changes.py)
+    notify_changes: bool = True
+    # Утренняя рассылка расписания на день (services/daily_digest.py), по подписке
+    daily_digest: bool = False
+
+# Поля UserSettings, не влияющие на текст расписания (не входят в ключ render_cache)
+NOTIFICATION_SETTINGS = {"notify_changes", "daily_digest"}
 
 class User(SQLModel, table=True):
     telegram_id: int = Field(primary_key=True)
@@ -18,34 +28,39 @@ class User(SQLModel, table=True):
     role: str = Field(default="user")
     curator_group: Optional[str] = None
     settings_json: str = Field(default="{}")
+    # Legacy: избранное перенесено в user_favorites (миграция 7), колонка больше не пишется
     favorites_json: str = Field(default="[]")
 
     @property
     def settings(self) -> UserSettings:
+        """Разбирается один раз на экземпляр; кэш сбрасывается при смене settings_json."""
+        # Кэш в __dict__, а не PrivateAttr: у экземпляров, загруженных ORM, нет приватного хранилища
+        cached = self.__dict__.get("_settings_cache")
+        if cached is not None and cached[0] == self.settings_json:
+            return cached[1]
         try:
-            data = json.loads(self.settings_json)
-            return UserSettings(**data)
+            settings = UserSettings(**json.loads(self.settings_json))
         except (json.JSONDecodeError, ValueError, TypeError):
-            return UserSettings()
+            settings = UserSettings()
+        self.__dict__["_settings_cache"] = (self.settings_json, settings)
+        return settings
 
     @settings.setter
     def settings(self, value: UserSettings):
         self.settings_json = value.model_dump_json()
+        self.__dict__["_settings_cache"] = (self.settings_json, value)
 
-    @property
-    def favorites(self) -> List[str]:
-        try:
-            return json.loads(self.favorites_json)
-        except (json.JSONDecodeError, ValueError, TypeError):
-            return []
-
-    @favorites.setter
-    def favorites(self, value: List[str]):
-        self.favorites_json = json.dumps(value)
+class UserFavorite(SQLModel, table=True):
+    """Избранная группа пользователя; индекс по group_name — для рассылок "всем, кто следит за группой"."""
+    __tablename__ = "user_favorites"
+    user_id: int = Field(primary_key=True)
+    group_name: str = Field(primary_key=True, index=True)
+    position: int = Field(default=0)
 
 class Lesson(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    group_name: str = Field(index=True)
+    # Индексы (group_name, date, pair_number) создаются миграциями
+    group_name: str = Field()
     date: str = Field(index=True)
     pair_number: Optional[int] = None
     start_time: Optional[str] = None
@@ -77,9 +92,10 @@ class BotSetting(SQLModel, table=True):
 
 class Occupancy(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    building: str = Field(index=True)
+    # Составные индексы по (date, ...) и (building, room) создаются миграциями
+    building: str = Field()
     room: str = Field(index=True)
-    date: str = Field(index=True)
+    date: str = Field()
     pair_number: int = Field()
     start_time: Optional[str] = None
     end_time: Optional[str] = None
@@ -93,3 +109,76 @@ class ActionLog(SQLModel, table=True):
     action: str = Field()
     details: Optional[str] = None
     timestamp: str = Field(default_factory=lambda: date.today().isoformat())
+
+class ScheduleTemplate(SQLModel, table=True):
+    """Материализованный шаблон прогноза: последняя известная пара группы в данной фазе 14-дневного цикла."""
+    __tablename__ = "schedule_templates"
+    group_name: str = Field(primary_key=True)
+    phase: int = Field(primary_key=True)
+    pair_number: int = Field(primary_key=True)
+    subject: Optional[str] = None
+    class_type: Optional[str] = None
+    teacher: Optional[str] = None
+    building: Optional[str] = None
+    room: Optional[str] = None
+    subgroup: Optional[str] = None
+    source_date: str = Field()
+
+class DailyActionStat(SQLModel, table=True):
+    """Дневной счётчик событий по действию (аналитика, обновляется инкрементально)."""
+    __tablename__ = "stats_daily_actions"
+    day: str = Field(primary_key=True)
+    action: str = Field(primary_key=True)
+    count: int = Field(default=0)
+
+class DailyGroupStat(SQLModel, table=True):
+    """Дневной счётчик событий по группе."""
+    __tablename__ = "stats_daily_groups"
+    day: str = Field(primary_key=True)
+    group_name: str = Field(primary_key=True)
+    count: int = Field(default=0)
+
+class DailyUserStat(SQLModel, table=True):
+    """Активность пользователя за день — нужна для подсчёта уникальных пользователей."""
+    __tablename__ = "stats_daily_users"
+    day: str = Field(primary_key=True)
+    user_id: int = Field(primary_key=True)
+    count: int = Field(default=0)
+
+class DailySummary(SQLModel, table=True):
+    """Итог дня: всего событий и уникальных пользователей."""
+    __tablename__ = "stats_daily_summary"
+    day: str = Field(primary_key=True)
+    events: int = Field(default=0)
+    unique_users: int = Field(default=0)
+
+class ArchivePeriod(SQLModel, table=True):
+    """Семестр занятий, вынесенный из lesson в отдельный файл архива (DB_DIR/archive)."""
+    __tablename__ = "archive_periods"
+    key: str = Field(primary_key=True)  # "2025-autumn", "2026-spring"
+    filename: str = Field()
+    start_date: str = Field()           # первая и последняя дата занятий в архиве
+    end_date: str = Field()
+    rows: int = Field(default=0)
+    archived_at: str = Field()
+
+class BroadcastJob(SQLModel, table=True):
+    """Рассылка: текст и итоговые счётчики; незавершённые (status = "running") продолжаются после рестарта."""
+    __tablename__ = "broadcast_jobs"
+    id: Optional[int] = Field(default=None, primary_key=True)
+    kind: str = Field()                 # "curator", "changes", "digest", ...
+    text: str = Field()
+    status: str = Field(default="running", index=True)  # running | done | cancelled
+    total: int = Field(default=0)
+    delivered: int = Field(default=0)
+    failed: int = Field(default=0)
+    blocked: int = Field(default=0)
+    created_at: str = Field()
+    finished_at: Optional[str] = None
+
+class BroadcastRecipient(SQLModel, table=True):
+    """Получатель рассылки; status: pending | sent | failed | blocked."""
+    __tablename__ = "broadcast_recipients"
+    job_id: int = Field(primary_key=True)
+    chat_id: int = Field(primary_key=True)
+    status: str = Field(default="pending")
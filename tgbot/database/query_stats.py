@@ -0,0 +1,173 @@
+"""
+Инструментирование SQL.
+
+- события before/after_cursor_execute на движках SQLAlchemy: время и число строк
+  (rowcount для DML) по каждому нормализованному оператору;
+- DatabaseExecutor сообщает время ожидания в пуле и выполнения по методам репозиториев;
+- операторы дольше SLOW_QUERY_MS пишутся в логгер "tgbot.slow_query" вместе с EXPLAIN QUERY PLAN.
+
+Всё хранится в памяти в гистограммах с фиксированными корзинами.
+"""
+import bisect
+import logging
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+
+from tgbot.config import config
+
+slow_query_logger = logging.getLogger("tgbot.slow_query")
+
+# Границы корзин, мс (последняя корзина — всё, что дольше)
+BUCKETS_MS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+# Сколько разных операторов/методов держим в памяти
+MAX_KEYS = 500
+
+_IN_LIST = re.compile(r"\(\?(?:, \?)+\)")
+_SPACES = re.compile(r"\s+")
+_EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+
+def normalize_sql(statement: str) -> str:
+    """Схлопывает пробелы и списки IN (?, ?, ...) — иначе каждый размер списка стал бы отдельным ключом."""
+    return _IN_LIST.sub("(?...)", _SPACES.sub(" ", statement).strip())
+
+
+class Histogram:
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+
+    def add(self, ms: float, rows: int = 0):
+        self.buckets[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.rows += max(rows, 0)
+
+    def percentile(self, p: float) -> float:
+        """Оценка перцентиля по верхней границе корзины."""
+        if not self.count:
+            return 0.0
+        target = self.count * p
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                return BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "total_ms": round(self.total_ms, 2),
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "max_ms": round(self.max_ms, 2),
+            "rows": self.rows,
+        }
+
+
+class QueryStats:
+    def __init__(self, slow_ms: float = 100.0):
+        self.slow_ms = slow_ms
+        self._lock = threading.Lock()
+        self.statements: Dict[str, Histogram] = {}
+        self.methods: Dict[str, Histogram] = {}
+        self.pool_wait: Dict[str, Histogram] = {}
+        self.slow_queries = 0
+        self.dropped_keys = 0
+
+    def _hist(self, table: Dict[str, Histogram], key: str) -> Optional[Histogram]:
+        hist = table.get(key)
+        if hist is None:
+            if len(table) >= MAX_KEYS:
+                self.dropped_keys += 1
+                return None
+            hist = table[key] = Histogram()
+        return hist
+
+    def record_statement(self, statement: str, ms: float, rows: int):
+        with self._lock:
+            hist = self._hist(self.statements, normalize_sql(statement))
+            if hist:
+                hist.add(ms, rows)
+
+    def record_call(self, method: str, pool: str, wait_ms: float, exec_ms: float, rows: int):
+        with self._lock:
+            hist = self._hist(self.methods, method)
+            if hist:
+                hist.add(exec_ms, rows)
+            self._hist(self.pool_wait, pool).add(wait_ms)
+
+    def top(self, by: str = "total_ms", limit: int = 10, kind: str = "statements") -> List[dict]:
+        """Топ операторов (kind="statements") или методов репозиториев (kind="methods")."""
+        with self._lock:
+            items = [{"key": key, **hist.summary()} for key, hist in getattr(self, kind).items()]
+        return sorted(items, key=lambda item: item[by], reverse=True)[:limit]
+
+    def snapshot(self, limit: int = 10) -> dict:
+        with self._lock:
+            pool_wait = {pool: hist.summary() for pool, hist in self.pool_wait.items()}
+        return {
+            "slow_ms": self.slow_ms,
+            "slow_queries": self.slow_queries,
+            "dropped_keys": self.dropped_keys,
+            "pool_wait": pool_wait,
+            "top_statements": self.top(limit=limit),
+            "top_methods": self.top(limit=limit, kind="methods"),
+        }
+
+    def reset(self):
+        with self._lock:
+            self.statements.clear()
+            self.methods.clear()
+            self.pool_wait.clear()
+            self.slow_queries = 0
+            self.dropped_keys = 0
+
+
+query_stats = QueryStats(slow_ms=config.SLOW_QUERY_MS)
+
+
+def method_name(fn) -> str:
+    """UserRepository.get_user.<locals>._sync_get -> UserRepository.get_user"""
+    return getattr(fn, "__qualname__", repr(fn)).split(".<locals>")[0]
+
+
+def _explain(cursor, statement: str, parameters) -> str:
+    if not statement.lstrip().upper().startswith(_EXPLAINABLE):
+        return "-"
+    try:
+        rows = cursor.connection.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ()).fetchall()
+        return "; ".join(row[-1] for row in rows)
+    except Exception as e:
+        return f"explain failed: {e}"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_start"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    ms = (time.perf_counter() - conn.info.pop("query_start", time.perf_counter())) * 1000
+    query_stats.record_statement(statement, ms, cursor.rowcount)
+    if ms >= query_stats.slow_ms:
+        query_stats.slow_queries += 1
+        # executemany: план один, берём первый набор параметров
+        params = parameters[0] if executemany and parameters else parameters
+        slow_query_logger.warning(
+            f"🐢 {ms:.1f} ms, rows={cursor.rowcount}: {normalize_sql(statement)[:500]} | plan: {_explain(cursor, statement, params)}"
+        )
+
+
+def instrument_engine(engine):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
@@ -1,66 +1,197 @@
 import json
 import logging
 import asyncio
-from datetime import date
-from typing import Optional, List, Set, Union, Any
+import time
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
+from typing import Optional, List, Set, Union, Any, Callable, Dict, Tuple
 
-from sqlalchemy import select, delete, update, func, or_, text, create_engine
+from sqlalchemy import select, insert, delete, update, func, or_, text, create_engine, event, tuple_, union_all
 from sqlalchemy.orm import sessionmaker, Session
-from sqlmodel import SQLModel, select as sqlmodel_select
-
-from tgbot.database.models import User, Lesson, TrackedGroup, ProcessedFile, BotSetting, UserSettings, Occupancy, ActionLog
+from sqlmodel import select as sqlmodel_select
+
+from tgbot.config import config
+from tgbot.database.archive import archive_catalog, archive_before, read_archived_lessons
+from tgbot.database.executor import DatabaseExecutor, sqlite_pragmas
+from tgbot.database.data_versions import lesson_versions
+from tgbot.database.group_index import GroupNameIndex, lesson_groups_index, tracked_groups_index
+from tgbot.database.migrations import run_migrations
+from tgbot.database.query_stats import instrument_engine
+from tgbot.database.snapshot import snapshot_connection
+from tgbot.database.models import (
+    User, Lesson, TrackedGroup, ProcessedFile, BotSetting, UserSettings, Occupancy, ActionLog, ScheduleTemplate,
+    DailyActionStat, DailyGroupStat, DailyUserStat, DailySummary, ArchivePeriod, UserFavorite,
+    BroadcastJob, BroadcastRecipient,
+)
+from tgbot.database.rollups import apply_rollups
+from tgbot.database.templates import CYCLE_DAYS, template_phase, predict_from_templates, prediction_stats
+from tgbot.services.cache import LRUCache
+
+
+SQLITE_PRAGMAS = sqlite_pragmas(
+    busy_timeout_ms=config.DB_BUSY_TIMEOUT_MS,
+    cache_size_kb=config.DB_CACHE_SIZE_KB,
+    mmap_size=config.DB_MMAP_SIZE,
+    wal_autocheckpoint=config.DB_WAL_AUTOCHECKPOINT,
+)
+
+
+def _set_sqlite_pragma(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {pragma}={value}")
+    cursor.close()
 
 
 class DatabaseManager:
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, read_workers: int = None):
         self.db_path = db_path
-        # Use synchronous engine to avoid greenlet dependency on Python 3.14
-        from sqlalchemy import event
+        # Use synchronous engine to avoid greenlet dependency on Python 3.14.
+        # Ad-hoc sessions only (CLI, tooling); bot and parser traffic goes through the executor
         self.engine = create_engine(f"sqlite:///{db_path}")
-        
-        @event.listens_for(self.engine, "connect")
-        def set_sqlite_pragma(dbapi_connection, connection_record):
-            cursor = dbapi_connection.cursor()
-            cursor.execute("PRAGMA journal_mode=WAL")
-            cursor.execute("PRAGMA synchronous=NORMAL")
-            cursor.close()
+        event.listen(self.engine, "connect", _set_sqlite_pragma)
+        instrument_engine(self.engine)
             
         self.session_factory = sessionmaker(
             self.engine, expire_on_commit=False, class_=Session
         )
+        # Read-only pool for queries, one serialized writer for everything else (incl. parsers)
+        self.executor = DatabaseExecutor(
+            db_path,
+            read_workers=read_workers or config.DB_READ_WORKERS,
+            pragmas=SQLITE_PRAGMAS,
+        )
 
-    def create_db_and_tables(self):
-        SQLModel.metadata.create_all(self.engine)
-        # Migration: ensure all columns exist in occupancy table
-        with self.engine.connect() as conn:
-            result = conn.execute(text("PRAGMA table_info(occupancy)"))
-            columns = [row[1] for row in result.fetchall()]
-            
-            if "is_free" not in columns:
-                logging.info("Migrating: Adding is_free column to occupancy table")
-                conn.execute(text("ALTER TABLE occupancy ADD COLUMN is_free BOOLEAN DEFAULT 1"))
-            
-            if "group_name" not in columns:
-                logging.info("Migrating: Adding group_name column to occupancy table")
-                conn.execute(text("ALTER TABLE occupancy ADD COLUMN group_name VARCHAR"))
-            
-            conn.commit()
+    def create_db_and_tables(self, session: Optional[Session] = None):
+        if session is None:
+            with self.get_session() as session:
+                return self.create_db_and_tables(session)
+
+        # Версионированные миграции: при актуальной схеме — один SELECT без интроспекции
+        run_migrations(session.connection())
+        session.commit()
 
     def get_session(self) -> Session:
         return self.session_factory()
 
+    async def read(self, fn: Callable[..., Any], *args) -> Any:
+        """Runs fn(session, *args) on the DB read pool."""
+        return await self.executor.read(fn, *args)
+
+    async def write(self, fn: Callable[..., Any], *args) -> Any:
+        """Runs fn(session, *args) on the single DB writer thread."""
+        return await self.executor.write(fn, *args)
+
+    async def read_raw(self, fn: Callable[..., Any], *args) -> Any:
+        """Runs fn(dbapi_connection, *args) on a reader thread, outside any SQLAlchemy transaction."""
+        return await self.executor.reader.submit(fn, *args, raw=True)
+
+    async def write_raw(self, fn: Callable[..., Any], *args) -> Any:
+        """Runs fn(dbapi_connection, *args) on the writer thread (autocommit: ATTACH, VACUUM, explicit BEGIN)."""
+        return await self.executor.writer.submit(fn, *args, raw=True)
+
+    async def checkpoint(self, mode: str = "PASSIVE") -> tuple:
+        """WAL checkpoint on the writer thread; returns (busy, wal_frames, checkpointed)."""
+        return await self.executor.checkpoint(mode)
+
+    def get_stats(self) -> dict:
+        return self.executor.get_stats()
+
+    async def delete_in_batches(self, model, *conditions, batch_size: int = None, pause: float = None) -> int:
+        """
+        Deletes rows of `model` matching `conditions` in transactions of at most `batch_size` rows,
+        sleeping `pause` seconds between them so the writer is not held by maintenance.
+        Returns the number of deleted rows.
+        """
+        batch_size = batch_size or config.DB_MAINTENANCE_BATCH_SIZE
+        pause = config.DB_MAINTENANCE_PAUSE if pause is None else pause
+        pk = list(model.__table__.primary_key.columns)
+        key = pk[0] if len(pk) == 1 else tuple_(*pk)
+
+        def _sync_delete_batch(session):
+            # Ключи выбираем отдельно: число удалённых строк = len(keys), без опоры на rowcount
+            keys = session.execute(select(*pk).where(*conditions).limit(batch_size)).all()
+            if keys:
+                values = [row[0] for row in keys] if len(pk) == 1 else [tuple(row) for row in keys]
+                session.execute(delete(model).where(key.in_(values)))
+                session.commit()
+            return len(keys)
+
+        total = 0
+        while True:
+            deleted = await self.write(_sync_delete_batch)
+            total += deleted
+            if deleted < batch_size:
+                return total
+            await asyncio.sleep(pause)
+
+    async def optimize(self) -> dict:
+        """
+        Returns free pages to the OS (PRAGMA incremental_vacuum) and refreshes planner statistics
+        (PRAGMA optimize). A database created before auto_vacuum=INCREMENTAL is converted once with VACUUM.
+        """
+        def _sync_optimize(connection):
+            page_size = connection.execute("PRAGMA page_size").fetchone()[0]
+            pages_before = connection.execute("PRAGMA page_count").fetchone()[0]
+            freelist_before = connection.execute("PRAGMA freelist_count").fetchone()[0]
+            converted = connection.execute("PRAGMA auto_vacuum").fetchone()[0] != 2
+            if converted:
+                connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                connection.execute("VACUUM")
+            else:
+                # Каждый шаг оператора освобождает страницу — дочитываем результат до конца
+                connection.execute("PRAGMA incremental_vacuum").fetchall()
+            connection.execute("PRAGMA optimize")
+            pages_after = connection.execute("PRAGMA page_count").fetchone()[0]
+            return {
+                "pages_freed": pages_before - pages_after,
+                "freed_kb": (pages_before - pages_after) * page_size / 1024,
+                "freelist_before": freelist_before,
+                "converted": converted,
+            }
+        result = await self.write_raw(_sync_optimize)
+        logging.info(
+            f"🧽 {self.db_path}: freed {result['pages_freed']} pages ({result['freed_kb']:.0f} KB)"
+            f"{', converted to incremental auto_vacuum' if result['converted'] else ''}"
+        )
+        return result
+
+    async def snapshot(self, dest_path: str) -> dict:
+        """Compressed consistent copy via the SQLite online backup API (see tgbot/database/snapshot.py)."""
+        return await self.read_raw(snapshot_connection, dest_path)
+
+    def close(self):
+        self.executor.shutdown()
+        self.engine.dispose()
+
+@asynccontextmanager
+async def db_manager_or_default(db_manager: Optional[DatabaseManager] = None):
+    """Yields the given manager, or a temporary one for config.DB_NAME closed on exit (CLI, standalone runs)."""
+    if db_manager is not None:
+        yield db_manager
+        return
+    temporary = DatabaseManager(config.DB_NAME)
+    try:
+        yield temporary
+    finally:
+        temporary.close()
+
 class BaseRepository:
     def __init__(self, db_manager: DatabaseManager):
         self.db_manager = db_manager
 
 
+# Пользователи — самая горячая сущность: get_user вызывается минимум раз на каждый апдейт
+user_cache = LRUCache(maxsize=config.USER_CACHE_SIZE, ttl=config.USER_CACHE_TTL, name="users")
+
+
 class UserRepository(BaseRepository):
     async def create_tables(self):
-        await asyncio.to_thread(self.db_manager.create_db_and_tables)
+        await self.db_manager.write(self.db_manager.create_db_and_tables)
         await self._init_default_settings()
 
     async def _init_default_settings(self):
-        def _sync_init():
+        def _sync_init(session):
             default_settings = {
                 'maintenance_mode': '0',
                 'scheduler_on': '1',
@@ -70,335 +201,620 @@ class UserRepository(BaseRepository):
                 'btn_settings': '1',
                 'btn_free_rooms': '1'
             }
-            with self.db_manager.get_session() as session:
-                for key, value in default_settings.items():
-                    statement = select(BotSetting).where(BotSetting.key == key)
-                    result = session.execute(statement)
-                    if not result.scalar_one_or_none():
-                        session.add(BotSetting(key=key, value=value))
-                session.commit()
-        await asyncio.to_thread(_sync_init)
-
-    async def get_settings(self) -> dict:
-        def _sync_get():
-            with self.db_manager.get_session() as session:
-                statement = select(BotSetting)
-                result = session.execute(statement)
-                rows = result.scalars().all()
-                return {row.key: row.value for row in rows}
-        return await asyncio.to_thread(_sync_get)
-
-    async def update_setting(self, key: str, value: str):
-        def _sync_update():
-            with self.db_manager.get_session() as session:
+            for key, value in default_settings.items():
                 statement = select(BotSetting).where(BotSetting.key == key)
                 result = session.execute(statement)
-                setting = result.scalar_one_or_none()
-                if setting:
-                    setting.value = value
-                else:
+                if not result.scalar_one_or_none():
                     session.add(BotSetting(key=key, value=value))
-                session.commit()
-        await asyncio.to_thread(_sync_update)
+            session.commit()
+        await self.db_manager.write(_sync_init)
 
-    async def update_user_setting(self, user_id: int, setting_field: str, new_value: bool):
-        def _sync_update():
-            with self.db_manager.get_session() as session:
-                statement = select(User).where(User.telegram_id == user_id)
-                result = session.execute(statement)
-                user = result.scalar_one_or_none()
-                if not user: return
+    async def get_settings(self) -> dict:
+        def _sync_get(session):
+            statement = select(BotSetting)
+            result = session.execute(statement)
+            rows = result.scalars().all()
+            return {row.key: row.value for row in rows}
+        return await self.db_manager.read(_sync_get)
+
+    async def update_setting(self, key: str, value: str):
+        def _sync_update(session):
+            statement = select(BotSetting).where(BotSetting.key == key)
+            result = session.execute(statement)
+            setting = result.scalar_one_or_none()
+            if setting:
+                setting.value = value
+            else:
+                session.add(BotSetting(key=key, value=value))
+            session.commit()
+        await self.db_manager.write(_sync_update)
+
+    async def update_user_setting(self, user_id: int, setting_field: str, new_value: bool) -> Optional[User]:
+        """Меняет одну настройку пользователя и возвращает обновлённого пользователя (None, если его нет)."""
+        def _sync_update(session):
+            statement = select(User).where(User.telegram_id == user_id)
+            result = session.execute(statement)
+            user = result.scalar_one_or_none()
+            if not user: return None
                 
-                settings = user.settings
-                setattr(settings, setting_field, new_value)
-                user.settings = settings
-                session.commit()
-        await asyncio.to_thread(_sync_update)
+            user.settings = user.settings.model_copy(update={setting_field: new_value})
+            session.commit()
+            return user.model_dump()
+        data = await self.db_manager.write(_sync_update)
+        if data is None:
+            user_cache.invalidate(user_id)
+            return None
+        user_cache.set(user_id, data)
+        return User(**data)
 
     async def upsert_user(self, user: User):
-        def _sync_upsert():
-            with self.db_manager.get_session() as session:
-                stmt = select(User).where(User.telegram_id == user.telegram_id)
-                res = session.execute(stmt)
-                exists = res.scalar_one_or_none()
-                if exists:
-                    data = user.model_dump(exclude={"telegram_id"})
-                    for key, value in data.items():
+        # Снимок до записи: в кэш кладём ровно то, что сохранили
+        data = user.model_dump()
+        def _sync_upsert(session):
+            stmt = select(User).where(User.telegram_id == user.telegram_id)
+            res = session.execute(stmt)
+            exists = res.scalar_one_or_none()
+            if exists:
+                for key, value in data.items():
+                    if key != "telegram_id":
                         setattr(exists, key, value)
-                else:
-                    session.add(user)
-                session.commit()
-        await asyncio.to_thread(_sync_upsert)
+            else:
+                session.add(user)
+            session.commit()
+        try:
+            await self.db_manager.write(_sync_upsert)
+        except Exception:
+            user_cache.invalidate(user.telegram_id)
+            raise
+        user_cache.set(user.telegram_id, data)
 
     async def get_user(self, telegram_id: int) -> Optional[User]:
-        def _sync_get():
-            with self.db_manager.get_session() as session:
-                statement = select(User).where(User.telegram_id == telegram_id)
-                result = session.execute(statement)
-                return result.scalar_one_or_none()
-        return await asyncio.to_thread(_sync_get)
+        # Кэш хранит model_dump(), каждый вызов получает свой экземпляр User:
+        # изменения в хендлере не попадут в кэш без upsert_user
+        data = user_cache.get(telegram_id)
+        if data is not LRUCache.MISSING:
+            return User(**data) if data is not None else None
+
+        def _sync_get(session):
+            statement = select(User).where(User.telegram_id == telegram_id)
+            result = session.execute(statement)
+            user = result.scalar_one_or_none()
+            return user.model_dump() if user else None
+        started = time.perf_counter()
+        data = await self.db_manager.read(_sync_get)
+        user_cache.record_load((time.perf_counter() - started) * 1000)
+        # add(), а не set(): если за время чтения прошёл upsert, его данные свежее
+        user_cache.add(telegram_id, data)
+        return User(**data) if data is not None else None
+
+    def invalidate_user(self, telegram_id: Optional[int] = None):
+        """Сбрасывает кэш пользователя (или весь кэш) после записи в обход репозитория."""
+        if telegram_id is None:
+            user_cache.clear()
+        else:
+            user_cache.invalidate(telegram_id)
+
+    def get_cache_stats(self) -> dict:
+        return user_cache.get_stats()
 
     async def get_users_by_group(self, group_name: str) -> List[User]:
-        def _sync_get():
-            with self.db_manager.get_session() as session:
-                statement = select(User).where(User.group_name == group_name)
-                result = session.execute(statement)
-                return list(result.scalars().all())
-        return await asyncio.to_thread(_sync_get)
+        def _sync_get(session):
+            statement = select(User).where(User.group_name == group_name)
+            result = session.execute(statement)
+            return list(result.scalars().all())
+        return await self.db_manager.read(_sync_get)
+
+    # ===== Избранное (user_favorites) =====
+
+    async def get_favorites(self, user_id: int) -> List[str]:
+        def _sync_get(session):
+            statement = select(UserFavorite.group_name).where(
+                UserFavorite.user_id == user_id
+            ).order_by(UserFavorite.position)
+            return list(session.execute(statement).scalars().all())
+        return await self.db_manager.read(_sync_get)
+
+    async def add_favorite(self, user_id: int, group_name: str) -> bool:
+        """Добавляет группу в конец избранного. False — если она уже там."""
+        def _sync_add(session):
+            exists = session.get(UserFavorite, (user_id, group_name))
+            if exists:
+                return False
+            last = session.execute(
+                select(func.max(UserFavorite.position)).where(UserFavorite.user_id == user_id)
+            ).scalar()
+            session.add(UserFavorite(user_id=user_id, group_name=group_name, position=(last + 1) if last is not None else 0))
+            session.commit()
+            return True
+        return await self.db_manager.write(_sync_add)
+
+    async def remove_favorite(self, user_id: int, group_name: str) -> bool:
+        def _sync_remove(session):
+            result = session.execute(
+                delete(UserFavorite).where(UserFavorite.user_id == user_id, UserFavorite.group_name == group_name)
+            )
+            session.commit()
+            return result.rowcount > 0
+        return await self.db_manager.write(_sync_remove)
+
+    async def get_favorite_user_ids(self, group_name: str) -> List[int]:
+        """Все пользователи, добавившие группу в избранное (индекс ix_user_favorites_group_name)."""
+        def _sync_get(session):
+            statement = select(UserFavorite.user_id).where(UserFavorite.group_name == group_name)
+            return list(session.execute(statement).scalars().all())
+        return await self.db_manager.read(_sync_get)
+
+    async def get_group_audience(
+        self, group_names: List[str], include_favorites: bool = True, setting: Optional[str] = None, default: bool = True
+    ) -> Dict[str, Set[int]]:
+        """
+        Для рассылок по группам: {группа: id пользователей, у которых она основная или в избранном}.
+        Один запрос (UNION ALL по индексам ix_user_group_name и ix_user_favorites_group_name)
+        на весь набор групп. `setting` — булево поле UserSettings: остаются только пользователи,
+        у которых оно включено (`default` — для тех, кто его не менял).
+        """
+        group_names = list(set(group_names))
+        audience: Dict[str, Set[int]] = {name: set() for name in group_names}
+        if not group_names:
+            return audience
+        def _sync_get(session):
+            main = select(User.group_name, User.telegram_id).where(User.group_name.in_(group_names))
+            favorites = (
+                select(UserFavorite.group_name, UserFavorite.user_id)
+                .join(User, User.telegram_id == UserFavorite.user_id)
+                .where(UserFavorite.group_name.in_(group_names))
+            )
+            if setting is not None:
+                # settings_json пишется из UserSettings: булевы поля лежат как true/false
+                enabled = func.coalesce(func.json_extract(User.settings_json, f"$.{setting}"), int(default)) == 1
+                main, favorites = main.where(enabled), favorites.where(enabled)
+            statement = union_all(main, favorites) if include_favorites else main
+            return session.execute(statement).all()
+        for group_name, user_id in await self.db_manager.read(_sync_get):
+            audience[group_name].add(user_id)
+        return audience
+
+    async def get_setting_subscribers(self, setting: str) -> List[Tuple[int, str, UserSettings]]:
+        """(telegram_id, группа, настройки) пользователей с выбранной группой и включённым полем `setting`."""
+        def _sync_get(session):
+            statement = select(User.telegram_id, User.group_name, User.settings_json).where(
+                User.group_name.is_not(None),
+                func.json_extract(User.settings_json, f"$.{setting}") == 1,
+            )
+            return session.execute(statement).all()
+        rows = await self.db_manager.read(_sync_get)
+        subscribers = []
+        for telegram_id, group_name, settings_json in rows:
+            try:
+                settings = UserSettings.model_validate_json(settings_json)
+            except ValueError:
+                settings = UserSettings()
+            subscribers.append((telegram_id, group_name, settings))
+        return subscribers
 
 class ScheduleRepository(BaseRepository):
     async def get_lessons_for_groups(self, group_names: List[str], target_date: date) -> List[Lesson]:
         if not group_names: return []
-        def _sync_get():
-            with self.db_manager.get_session() as session:
-                statement = select(Lesson).where(
-                    Lesson.date == target_date.isoformat(),
-                    Lesson.group_name.in_(group_names)
+        def _sync_get(session):
+            statement = select(Lesson).where(
+                Lesson.date == target_date.isoformat(),
+                Lesson.group_name.in_(group_names)
+            )
+            result = session.execute(statement)
+            return list(result.scalars().all())
+        return await self.db_manager.read(_sync_get)
+
+    async def get_busy_pairs(
+        self, group_names: List[str], start_date: date, end_date: date
+    ) -> Tuple[List[Tuple[str, str, int, Optional[str]]], Dict[str, str]]:
+        """
+        Занятые пары групп за период одним запросом: [(group_name, date, pair_number, building)],
+        плюс последняя известная дата расписания каждой группы (дальше — ещё не опубликовано).
+        """
+        if not group_names: return [], {}
+        def _sync_get(session):
+            busy = session.execute(
+                select(Lesson.group_name, Lesson.date, Lesson.pair_number, Lesson.building).distinct().where(
+                    Lesson.group_name.in_(group_names),
+                    Lesson.date >= start_date.isoformat(),
+                    Lesson.date <= end_date.isoformat(),
+                    Lesson.pair_number.is_not(None)
                 )
-                result = session.execute(statement)
-                return list(result.scalars().all())
-        return await asyncio.to_thread(_sync_get)
+            ).all()
+            last_dates = session.execute(
+                select(Lesson.group_name, func.max(Lesson.date))
+                .where(Lesson.group_name.in_(group_names))
+                .group_by(Lesson.group_name)
+            ).all()
+            return [tuple(row) for row in busy], {g: d for g, d in last_dates}
+        return await self.db_manager.read(_sync_get)
 
     async def get_all_group_names(self) -> List[str]:
-        def _sync_get():
-            with self.db_manager.get_session() as session:
-                statement = select(Lesson.group_name).distinct().order_by(Lesson.group_name)
-                result = session.execute(statement)
-                return list(result.scalars().all())
-        return await asyncio.to_thread(_sync_get)
+        def _sync_get(session):
+            statement = select(Lesson.group_name).distinct().order_by(Lesson.group_name)
+            result = session.execute(statement)
+            return list(result.scalars().all())
+        return await self.db_manager.read(_sync_get)
+
+    async def get_teacher_names(self) -> List[str]:
+        def _sync_get(session):
+            statement = select(Lesson.teacher).where(Lesson.teacher.is_not(None)).distinct()
+            result = session.execute(statement)
+            return [t for t in result.scalars().all() if t]
+        return await self.db_manager.read(_sync_get)
 
     async def get_lessons(self, group_name: str, target_date: date) -> List[Lesson]:
-        def _sync_get():
-            with self.db_manager.get_session() as session:
-                statement = select(Lesson).where(
-                    Lesson.group_name == group_name,
-                    Lesson.date == target_date.isoformat()
-                ).order_by(Lesson.pair_number)
-                result = session.execute(statement)
-                return list(result.scalars().all())
-        return await asyncio.to_thread(_sync_get)
+        if await self._archived_files(target_date, target_date):
+            lessons_by_day = await self.get_lessons_range(group_name, target_date, target_date)
+            return lessons_by_day[target_date]
+        def _sync_get(session):
+            statement = select(Lesson).where(
+                Lesson.group_name == group_name,
+                Lesson.date == target_date.isoformat()
+            ).order_by(Lesson.pair_number)
+            result = session.execute(statement)
+            return list(result.scalars().all())
+        return await self.db_manager.read(_sync_get)
+
+    async def get_lessons_range(self, group_name: str, start_date: date, end_date: date) -> Dict[date, List[Lesson]]:
+        """
+        Занятия группы за период [start_date, end_date] одним запросом по индексу
+        (group_name, date, pair_number). В результате есть ключ для каждого дня периода.
+        """
+        def _sync_get(session):
+            statement = select(Lesson).where(
+                Lesson.group_name == group_name,
+                Lesson.date >= start_date.isoformat(),
+                Lesson.date <= end_date.isoformat()
+            ).order_by(Lesson.date, Lesson.pair_number)
+            lessons_by_day = {
+                start_date + timedelta(days=i): []
+                for i in range((end_date - start_date).days + 1)
+            }
+            for lesson in session.execute(statement).scalars().all():
+                lessons_by_day.setdefault(date.fromisoformat(lesson.date), []).append(lesson)
+            return lessons_by_day
+        lessons_by_day = await self.db_manager.read(_sync_get)
+
+        # Старые семестры — в архивах; горячий путь (текущие недели) сюда не заходит
+        archived = await self._archived_files(start_date, end_date)
+        if archived:
+            hot_days = {day for day, lessons in lessons_by_day.items() if lessons}
+            for lesson in await self.db_manager.read_raw(read_archived_lessons, archived, group_name, start_date, end_date):
+                day = date.fromisoformat(lesson.date)
+                # День, который есть в основной БД (перепарсинг после архивации), берём оттуда
+                if day not in hot_days:
+                    lessons_by_day[day].append(lesson)
+        return lessons_by_day
+
+    async def _archived_files(self, start_date: date, end_date: date) -> List[str]:
+        if not archive_catalog.is_loaded:
+            def _sync_load(session):
+                statement = select(ArchivePeriod.key, ArchivePeriod.filename, ArchivePeriod.start_date, ArchivePeriod.end_date)
+                return [tuple(row) for row in session.execute(statement).all()]
+            archive_catalog.load(await self.db_manager.read(_sync_load))
+        return archive_catalog.overlapping(start_date, end_date)
+
+    async def archive_old_lessons(self, weeks: int = None) -> int:
+        """
+        Переносит занятия старше `weeks` недель в семестровые архивы: копирование одной
+        транзакцией на семестр, затем удаление из основной БД пачками. Возвращает число перенесённых занятий.
+        """
+        weeks = weeks or config.LESSON_ARCHIVE_AFTER_WEEKS
+        cutoff = date.today() - timedelta(weeks=weeks)
+        copied = await self.db_manager.write_raw(archive_before, cutoff)
+        if not copied:
+            return 0
+        archive_catalog.invalidate()
+        moved = await self.db_manager.delete_in_batches(Lesson, Lesson.date < cutoff.isoformat())
+        lesson_groups_index.invalidate()
+        lesson_versions.bump_all()
+        logging.info(f"🗄️ База: {moved} занятий старше {cutoff} перенесены в архив ({', '.join(copied)})")
+        return moved
+
+    async def _ensure_group_index(self, index: GroupNameIndex, statement) -> GroupNameIndex:
+        """Перестраивает индекс групп, только если его инвалидировали (парсинг, синхронизация списка)."""
+        if index.is_stale:
+            version = index.version
+            def _sync_load(session):
+                return list(session.execute(statement).scalars().all())
+            index.rebuild(await self.db_manager.read(_sync_load), version)
+        return index
 
     async def search_groups(self, query: str) -> List[str]:
-        query_clean = query.strip().lower()
-        if not query_clean: return []
-        def _sync_search():
-            with self.db_manager.get_session() as session:
-                # Fetch all distinct group names and filter in Python for proper Cyrillic support
-                statement = select(Lesson.group_name).distinct()
-                result = session.execute(statement)
-                all_groups = list(result.scalars().all())
-                
-                matches = [g for g in all_groups if query_clean in g.lower()]
-                matches.sort(key=lambda x: (
-                    0 if x.lower() == query_clean 
-                    else 1 if x.lower().startswith(query_clean) 
-                    else 2
-                ))
-                return matches[:15]
-        return await asyncio.to_thread(_sync_search)
+        if not query.strip(): return []
+        index = await self._ensure_group_index(lesson_groups_index, select(Lesson.group_name).distinct())
+        return index.search(query, limit=15)
 
     async def search_tracked_groups(self, query: str) -> List[str]:
-        query_clean = query.strip().lower()
-        if not query_clean: return []
-        def _sync_search():
-            with self.db_manager.get_session() as session:
-                # Proper Cyrillic support by filtering in Python
-                statement = select(TrackedGroup.group_name)
-                result = session.execute(statement)
-                all_groups = list(result.scalars().all())
-                
-                matches = [g for g in all_groups if query_clean in g.lower()]
-                matches.sort(key=lambda x: (
-                    0 if x.lower() == query_clean 
-                    else 1 if x.lower().startswith(query_clean) 
-                    else 2
-                ))
-                return matches[:15]
-        return await asyncio.to_thread(_sync_search)
+        if not query.strip(): return []
+        index = await self._ensure_group_index(tracked_groups_index, select(TrackedGroup.group_name))
+        return index.search(query, limit=15)
 
     async def get_tracked_groups_count(self) -> int:
-        def _sync_count():
-            with self.db_manager.get_session() as session:
-                statement = select(func.count()).select_from(TrackedGroup)
-                result = session.execute(statement)
-                return result.scalar() or 0
-        return await asyncio.to_thread(_sync_count)
+        def _sync_count(session):
+            statement = select(func.count()).select_from(TrackedGroup)
+            result = session.execute(statement)
+            return result.scalar() or 0
+        return await self.db_manager.read(_sync_count)
 
     async def set_group_tracked(self, group_name: str, is_tracked: bool = True):
-        def _sync_set():
-            with self.db_manager.get_session() as session:
-                statement = select(TrackedGroup).where(TrackedGroup.group_name == group_name)
-                result = session.execute(statement)
-                tg = result.scalar_one_or_none()
-                if tg:
-                    tg.is_tracked = is_tracked
-                    session.commit()
-        await asyncio.to_thread(_sync_set)
+        def _sync_set(session):
+            statement = select(TrackedGroup).where(TrackedGroup.group_name == group_name)
+            result = session.execute(statement)
+            tg = result.scalar_one_or_none()
+            if tg:
+                tg.is_tracked = is_tracked
+                session.commit()
+        await self.db_manager.write(_sync_set)
+
+    async def get_predicted_schedule_range(self, group_name: str, dates: List[date]) -> Dict[date, List[Lesson]]:
+        """
+        Прогноз для нескольких дат по материализованным шаблонам:
+        один запрос по первичному ключу (group_name, phase, pair_number).
+        """
+        if not dates:
+            return {}
+
+        def _sync_predict(session):
+            phases = set()
+            for d in dates:
+                phases.update({template_phase(d), (template_phase(d) + 7) % CYCLE_DAYS})
+            statement = select(ScheduleTemplate).where(
+                ScheduleTemplate.group_name == group_name,
+                ScheduleTemplate.phase.in_(phases)
+            )
+            return predict_from_templates(group_name, dates, session.execute(statement).scalars().all())
+
+        predicted = await self.db_manager.read(_sync_predict)
+        served = sum(1 for lessons in predicted.values() if lessons)
+        prediction_stats["requests"] += 1
+        prediction_stats["days"] += len(dates)
+        prediction_stats["served"] += served
+        prediction_stats["empty"] += len(dates) - served
+        return predicted
 
     async def get_predicted_schedule(self, group_name: str, target_date: date) -> List[Lesson]:
-        def _sync_predict():
-            # VyatSU usually has a 2-week cycle (14 days)
-            # We look for lessons on the same day of the week, 
-            # prioritizing those that match the 14-day phase (Numerator/Denominator)
-            with self.db_manager.get_session() as session:
-                # Find all lessons for this group on this weekday in the past 28 days
-                weekday = target_date.weekday()
-                raw_query = text("""
-                    SELECT pair_number, subject, class_type, teacher, building, room, subgroup, date
-                    FROM lesson
-                    WHERE group_name = :group_name AND 
-                          (strftime('%w', date) + 6) % 7 = :weekday
-                    ORDER BY date DESC
-                """)
-                result = session.execute(raw_query, {
-                    "group_name": group_name, 
-                    "weekday": weekday
-                })
-                rows = result.fetchall()
-                
-                if not rows:
-                    return []
-                
-                # Group by phase (date mod 14)
-                # We need a reference date. Let's use the first date in the DB for this group as reference.
-                ref_stmt = select(Lesson.date).where(Lesson.group_name == group_name).order_by(Lesson.date).limit(1)
-                ref_date_str = session.execute(ref_stmt).scalar()
-                if not ref_date_str: return []
-                ref_date = date.fromisoformat(ref_date_str)
-                
-                target_phase = (target_date - ref_date).days % 14
-                
-                predicted = {}
-                # First pass: try exact phase match (most accurate for 2-week cycle)
-                for row in rows:
-                    row_date = date.fromisoformat(row.date)
-                    row_phase = (row_date - ref_date).days % 14
-                    
-                    if row_phase == target_phase:
-                        p_num = row.pair_number
-                        if p_num not in predicted:
-                            predicted[p_num] = Lesson(
-                                group_name=group_name,
-                                date=target_date.isoformat(),
-                                pair_number=p_num,
-                                subject=row.subject,
-                                class_type=row.class_type,
-                                teacher=row.teacher,
-                                building=row.building,
-                                room=row.room,
-                                subgroup=row.subgroup
-                            )
-                
-                # Second pass: fill gaps with any weekday match if phase match failed
-                for row in rows:
-                    p_num = row.pair_number
-                    if p_num not in predicted:
-                         predicted[p_num] = Lesson(
-                            group_name=group_name,
-                            date=target_date.isoformat(),
-                            pair_number=p_num,
-                            subject=row.subject,
-                            class_type=row.class_type,
-                            teacher=row.teacher,
-                            building=row.building,
-                            room=row.room,
-                            subgroup=row.subgroup
-                        )
-                
-                return sorted(predicted.values(), key=lambda x: x.pair_number)
-        return await asyncio.to_thread(_sync_predict)
-
-    async def cleanup_old_lessons(self, weeks: int = 5):
-        """Удаляет старые занятия из базы данных"""
-        def _sync_cleanup():
-            from datetime import timedelta
-            cutoff_date = (date.today() - timedelta(weeks=weeks)).isoformat()
-            with self.db_manager.get_session() as session:
-                statement = delete(Lesson).where(Lesson.date < cutoff_date)
-                session.execute(statement)
-                session.commit()
-                logging.info(f"🧹 База: Удалены занятия старше {cutoff_date}")
-        await asyncio.to_thread(_sync_cleanup)
+        predicted = await self.get_predicted_schedule_range(group_name, [target_date])
+        return predicted.get(target_date, [])
+
+    async def cleanup_old_lessons(self, weeks: int = 5) -> int:
+        """Удаляет старые занятия пачками (не держит блокировку записи). Возвращает число удалённых занятий."""
+        cutoff_date = (date.today() - timedelta(weeks=weeks)).isoformat()
+        deleted = await self.db_manager.delete_in_batches(Lesson, Lesson.date < cutoff_date)
+        deleted_templates = await self.db_manager.delete_in_batches(
+            # Шаблоны, источник которых удалён, тоже устарели
+            ScheduleTemplate, ScheduleTemplate.source_date < cutoff_date
+        )
+        # Группа могла исчезнуть из lesson вместе со старыми занятиями
+        lesson_groups_index.invalidate()
+        lesson_versions.bump_all()
+        logging.info(
+            f"🧹 База: Удалены занятия старше {cutoff_date}: {deleted} занятий, "
+            f"{deleted_templates} шаблонов"
+        )
+        return deleted
 
 class OccupancyRepository(BaseRepository):
     async def get_occupied_rooms(self, target_date: date, pair_number: int, building: Optional[str] = None) -> Set[str]:
-        def _sync_get():
-            with self.db_manager.get_session() as session:
-                statement = select(Occupancy).where(
-                    Occupancy.date == target_date.isoformat(),
-                    Occupancy.pair_number == pair_number,
-                    Occupancy.is_free == False
-                )
-                if building: statement = statement.where(Occupancy.building == building)
-                result = session.execute(statement)
-                rows = result.scalars().all()
-                if building: return {row.room for row in rows}
-                return {f"{row.building}-{row.room}" for row in rows}
-        return await asyncio.to_thread(_sync_get)
+        def _sync_get(session):
+            statement = select(Occupancy).where(
+                Occupancy.date == target_date.isoformat(),
+                Occupancy.pair_number == pair_number,
+                Occupancy.is_free == False
+            )
+            if building: statement = statement.where(Occupancy.building == building)
+            result = session.execute(statement)
+            rows = result.scalars().all()
+            if building: return {row.room for row in rows}
+            return {f"{row.building}-{row.room}" for row in rows}
+        return await self.db_manager.read(_sync_get)
 
     async def get_all_rooms(self, building: Optional[str] = None) -> Set[str]:
-        def _sync_get():
-            with self.db_manager.get_session() as session:
-                statement = select(Occupancy.building, Occupancy.room).distinct()
-                if building: statement = statement.where(Occupancy.building == building)
-                result = session.execute(statement)
-                rows = result.all()
-                if building: return {row[1] for row in rows}
-                return {f"{row[0]}-{row[1]}" for row in rows}
-        return await asyncio.to_thread(_sync_get)
+        def _sync_get(session):
+            statement = select(Occupancy.building, Occupancy.room).distinct()
+            if building: statement = statement.where(Occupancy.building == building)
+            result = session.execute(statement)
+            rows = result.all()
+            if building: return {row[1] for row in rows}
+            return {f"{row[0]}-{row[1]}" for row in rows}
+        return await self.db_manager.read(_sync_get)
 
     async def get_buildings(self) -> List[str]:
-        def _sync_get():
-            with self.db_manager.get_session() as session:
-                statement = select(Occupancy.building).distinct()
-                result = session.execute(statement)
-                buildings = [b for b in result.scalars().all() if b]
-                try:
-                    return sorted(buildings, key=lambda x: int(x) if x.isdigit() else 999)
-                except (ValueError, TypeError):
-                    return sorted(buildings)
-        return await asyncio.to_thread(_sync_get)
+        def _sync_get(session):
+            statement = select(Occupancy.building).distinct()
+            result = session.execute(statement)
+            buildings = [b for b in result.scalars().all() if b]
+            try:
+                return sorted(buildings, key=lambda x: int(x) if x.isdigit() else 999)
+            except (ValueError, TypeError):
+                return sorted(buildings)
+        return await self.db_manager.read(_sync_get)
 
     async def get_available_pairs(self, target_date: date, building: str) -> List[int]:
-        def _sync_get():
-            with self.db_manager.get_session() as session:
-                # A pair is available if there is at least one free room in that building/date
-                statement = select(Occupancy.pair_number).where(
-                    Occupancy.date == target_date.isoformat(),
-                    Occupancy.building == building,
-                    Occupancy.is_free == True
-                ).distinct().order_by(Occupancy.pair_number)
-                result = session.execute(statement)
-                return list(result.scalars().all())
-        return await asyncio.to_thread(_sync_get)
+        def _sync_get(session):
+            # A pair is available if there is at least one free room in that building/date
+            statement = select(Occupancy.pair_number).where(
+                Occupancy.date == target_date.isoformat(),
+                Occupancy.building == building,
+                Occupancy.is_free == True
+            ).distinct().order_by(Occupancy.pair_number)
+            result = session.execute(statement)
+            return list(result.scalars().all())
+        return await self.db_manager.read(_sync_get)
+
+    async def get_occupancy_range(
+        self, start_date: date, end_date: date
+    ) -> Tuple[List[Tuple[str, str]], List[Tuple[str, int, str, str]], Set[str]]:
+        """
+        Всё для планировщика встреч одним чтением: все аудитории [(building, room)],
+        занятые за период [(date, pair_number, building, room)] и даты, по которым есть отчёт.
+        """
+        def _sync_get(session):
+            in_range = (Occupancy.date >= start_date.isoformat(), Occupancy.date <= end_date.isoformat())
+            rooms = session.execute(
+                select(Occupancy.building, Occupancy.room).distinct().order_by(Occupancy.building, Occupancy.room)
+            ).all()
+            occupied = session.execute(
+                select(Occupancy.date, Occupancy.pair_number, Occupancy.building, Occupancy.room)
+                .where(*in_range, Occupancy.is_free == False)
+            ).all()
+            covered = session.execute(select(Occupancy.date).distinct().where(*in_range)).scalars().all()
+            return [tuple(row) for row in rooms], [tuple(row) for row in occupied], set(covered)
+        return await self.db_manager.read(_sync_get)
 
     async def add_occupancy_batch(self, occupancies: List[Occupancy]):
-        def _sync_add():
-            with self.db_manager.get_session() as session:
-                session.add_all(occupancies)
-                session.commit()
-        await asyncio.to_thread(_sync_add)
+        def _sync_add(session):
+            session.add_all(occupancies)
+            session.commit()
+        await self.db_manager.write(_sync_add)
 
 class AnalyticsRepository(BaseRepository):
     async def create_tables(self):
-        await asyncio.to_thread(self.db_manager.create_db_and_tables)
+        await self.db_manager.write(self.db_manager.create_db_and_tables)
+
+    writer = None
+
+    def attach_writer(self, writer):
+        """После подключения AnalyticsWriter log_action только ставит событие в очередь."""
+        self.writer = writer
 
     async def log_action(self, user_id: int, action: str, details: Optional[str] = None):
-        def _sync_log():
-            with self.db_manager.get_session() as session:
-                log = ActionLog(user_id=user_id, action=action, details=details)
-                session.add(log)
-                session.commit()
-        await asyncio.to_thread(_sync_log)
-
-    async def cleanup_old_logs(self, days: int = 90):
-        """Удаляет старые логи действий"""
-        def _sync_cleanup():
-            from datetime import timedelta
-            cutoff_date = (date.today() - timedelta(days=days)).isoformat()
-            with self.db_manager.get_session() as session:
-                statement = delete(ActionLog).where(ActionLog.timestamp < cutoff_date)
-                session.execute(statement)
+        if self.writer is not None:
+            self.writer.enqueue(user_id, action, details)
+            return
+        def _sync_log(session):
+            log = ActionLog(user_id=user_id, action=action, details=details)
+            session.add(log)
+            apply_rollups(session, [(user_id, action, details, log.timestamp)])
+            session.commit()
+        await self.db_manager.write(_sync_log)
+
+    async def log_actions_batch(self, events: List[tuple]):
+        """Пишет пачку событий (user_id, action, details, timestamp) одной транзакцией."""
+        if not events: return
+        def _sync_log(session):
+            session.execute(insert(ActionLog), [
+                {"user_id": user_id, "action": action, "details": details, "timestamp": timestamp}
+                for user_id, action, details, timestamp in events
+            ])
+            # Дневные агрегаты обновляются в той же транзакции
+            apply_rollups(session, events)
+            session.commit()
+        await self.db_manager.write(_sync_log)
+
+    async def cleanup_old_logs(self, days: int = None, user_days: int = 180) -> int:
+        """
+        Удаляет старые сырые логи действий. Долгосрочные тренды остаются в дневных
+        агрегатах, поэтому сырые логи храним недолго (ANALYTICS_RAW_RETENTION_DAYS).
+        Поштучная активность пользователей (stats_daily_users) хранится `user_days` дней.
+        """
+        days = days or config.ANALYTICS_RAW_RETENTION_DAYS
+        cutoff_date = (date.today() - timedelta(days=days)).isoformat()
+        users_cutoff = (date.today() - timedelta(days=user_days)).isoformat()
+        deleted = await self.db_manager.delete_in_batches(ActionLog, ActionLog.timestamp < cutoff_date)
+        deleted += await self.db_manager.delete_in_batches(DailyUserStat, DailyUserStat.day < users_cutoff)
+        logging.info(f"🧹 Аналитика: Удалены логи старше {cutoff_date}: {deleted} строк")
+        return deleted
+
+    async def get_dashboard(self, days: int = 7, top: int = 5) -> dict:
+        """Сводка для админки только по таблицам агрегатов (без сканирования сырых логов)."""
+        def _sync_get(session):
+            since = (date.today() - timedelta(days=days - 1)).isoformat()
+            summary = session.execute(
+                select(DailySummary).where(DailySummary.day >= since).order_by(DailySummary.day.desc())
+            ).scalars().all()
+            top_actions = session.execute(
+                select(DailyActionStat.action, func.sum(DailyActionStat.count).label("n"))
+                .where(DailyActionStat.day >= since)
+                .group_by(DailyActionStat.action).order_by(text("n DESC")).limit(top)
+            ).all()
+            top_groups = session.execute(
+                select(DailyGroupStat.group_name, func.sum(DailyGroupStat.count).label("n"))
+                .where(DailyGroupStat.day >= since)
+                .group_by(DailyGroupStat.group_name).order_by(text("n DESC")).limit(top)
+            ).all()
+            unique_users = session.execute(
+                select(func.count(func.distinct(DailyUserStat.user_id))).where(DailyUserStat.day >= since)
+            ).scalar()
+            return {
+                "days": [(row.day, row.events, row.unique_users) for row in summary],
+                "top_actions": [(row.action, row.n) for row in top_actions],
+                "top_groups": [(row.group_name, row.n) for row in top_groups],
+                "unique_users": unique_users,
+            }
+        return await self.db_manager.read(_sync_get)
+
+class BroadcastRepository(BaseRepository):
+    """Журнал рассылок: задание, получатели и их статусы (см. tgbot/services/broadcaster.py)."""
+
+    async def create_job(self, kind: str, text: str, chat_ids: List[int]) -> int:
+        def _sync_create(session):
+            job = BroadcastJob(kind=kind, text=text, total=len(chat_ids), created_at=datetime.now().isoformat(timespec="seconds"))
+            session.add(job)
+            session.flush()
+            session.execute(insert(BroadcastRecipient), [{"job_id": job.id, "chat_id": chat_id} for chat_id in chat_ids])
+            session.commit()
+            return job.id
+        return await self.db_manager.write(_sync_create)
+
+    async def count_jobs_since(self, kind: str, since: datetime) -> int:
+        def _sync_count(session):
+            return session.execute(
+                select(func.count()).select_from(BroadcastJob)
+                .where(BroadcastJob.kind == kind, BroadcastJob.created_at >= since.isoformat(timespec="seconds"))
+            ).scalar()
+        return await self.db_manager.read(_sync_count)
+
+    async def get_unfinished_jobs(self) -> List[BroadcastJob]:
+        def _sync_get(session):
+            return list(session.execute(select(BroadcastJob).where(BroadcastJob.status == "running")).scalars().all())
+        return await self.db_manager.read(_sync_get)
+
+    async def get_pending_recipients(self, job_id: int) -> List[int]:
+        def _sync_get(session):
+            statement = select(BroadcastRecipient.chat_id).where(
+                BroadcastRecipient.job_id == job_id, BroadcastRecipient.status == "pending"
+            )
+            return list(session.execute(statement).scalars().all())
+        return await self.db_manager.read(_sync_get)
+
+    async def save_results(self, job_id: int, results: List[tuple]):
+        """Статусы пачки получателей [(chat_id, status)] и счётчики задания — одной транзакцией."""
+        if not results: return
+        def _sync_save(session):
+            session.execute(update(BroadcastRecipient), [
+                {"job_id": job_id, "chat_id": chat_id, "status": status} for chat_id, status in results
+            ])
+            counts = {"sent": 0, "failed": 0, "blocked": 0}
+            for _, status in results:
+                counts[status] += 1
+            session.execute(update(BroadcastJob).where(BroadcastJob.id == job_id).values(
+                delivered=BroadcastJob.delivered + counts["sent"],
+                failed=BroadcastJob.failed + counts["failed"],
+                blocked=BroadcastJob.blocked + counts["blocked"],
+            ))
+            session.commit()
+        await self.db_manager.write(_sync_save)
+
+    async def finish_job(self, job_id: int, status: str = "done") -> Optional[BroadcastJob]:
+        def _sync_finish(session):
+            job = session.get(BroadcastJob, job_id)
+            if job:
+                job.status = status
+                job.finished_at = datetime.now().isoformat(timespec="seconds")
                 session.commit()
-                logging.info(f"🧹 Аналитика: Удалены логи старше {cutoff_date}")
-        await asyncio.to_thread(_sync_cleanup)
\ No newline at end of file
+            return job
+        return await self.db_manager.write(_sync_finish)
+
+    async def cleanup_old_jobs(self, days: int = 30) -> int:
+        """Получатели завершённых рассылок старше `days` дней больше не нужны (счётчики остаются в задании)."""
+        cutoff = (date.today() - timedelta(days=days)).isoformat()
+        def _sync_old_jobs(session):
+            return list(session.execute(
+                select(BroadcastJob.id).where(BroadcastJob.status != "running", BroadcastJob.created_at < cutoff)
+            ).scalars().all())
+        job_ids = await self.db_manager.read(_sync_old_jobs)
+        if not job_ids:
+            return 0
+        return await self.db_manager.delete_in_batches(BroadcastRecipient, BroadcastRecipient.job_id.in_(job_ids))
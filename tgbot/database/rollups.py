@@ -0,0 +1,85 @@
+import re
+from collections import Counter
+from typing import Iterable, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert
+
+from tgbot.database.models import ActionLog, DailyActionStat, DailyGroupStat, DailySummary, DailyUserStat
+
+ActionEvent = Tuple[int, str, Optional[str], str]  # (user_id, action, details, day)
+
+# Действия, у которых details — это само название группы
+_GROUP_DETAIL_ACTIONS = {"view_my_schedule", "add_favorite", "select_favorite", "set_group"}
+_GROUP_RE = re.compile(r"group:\s*([^,]+)")
+
+
+def extract_group(action: str, details: Optional[str]) -> Optional[str]:
+    """Группа из details: либо details целиком, либо фрагмент "group: X" (навигация по расписанию)."""
+    if not details:
+        return None
+    if action in _GROUP_DETAIL_ACTIONS:
+        return details.strip() or None
+    match = _GROUP_RE.search(details)
+    return match.group(1).strip() if match else None
+
+
+def _upsert_counts(session, model, key_columns: Tuple[str, ...], counts: Counter):
+    if not counts:
+        return
+    stmt = insert(model)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(key_columns),
+        set_={"count": model.count + stmt.excluded["count"]},
+    )
+    session.execute(stmt, [{**dict(zip(key_columns, key)), "count": n} for key, n in counts.items()])
+
+
+def apply_rollups(session, events: Iterable[ActionEvent]):
+    """
+    Инкрементально обновляет дневные агрегаты по пачке событий.
+    Вызывается в той же транзакции, что и вставка сырых логов; commit — на вызывающем.
+    """
+    actions, groups, users = Counter(), Counter(), Counter()
+    for user_id, action, details, day in events:
+        actions[(day, action)] += 1
+        users[(day, user_id)] += 1
+        group_name = extract_group(action, details)
+        if group_name:
+            groups[(day, group_name)] += 1
+    if not actions:
+        return
+
+    _upsert_counts(session, DailyActionStat, ("day", "action"), actions)
+    _upsert_counts(session, DailyGroupStat, ("day", "group_name"), groups)
+    _upsert_counts(session, DailyUserStat, ("day", "user_id"), users)
+
+    # Итог дня пересчитываем по агрегатам: диапазон по первичному ключу (day, ...)
+    for day in {day for day, _ in actions}:
+        events_count = session.execute(
+            select(func.coalesce(func.sum(DailyActionStat.count), 0)).where(DailyActionStat.day == day)
+        ).scalar()
+        unique_users = session.execute(
+            select(func.count()).select_from(DailyUserStat).where(DailyUserStat.day == day)
+        ).scalar()
+        stmt = insert(DailySummary).values(day=day, events=events_count, unique_users=unique_users)
+        session.execute(stmt.on_conflict_do_update(
+            index_elements=["day"],
+            set_={"events": stmt.excluded.events, "unique_users": stmt.excluded.unique_users},
+        ))
+
+
+def rebuild_rollups(session, batch_size: int = 5000) -> int:
+    """Бэкфилл агрегатов по сырым action_logs (миграцией). Возвращает число обработанных строк."""
+    total = 0
+    last_id = 0
+    while True:
+        rows = session.execute(
+            select(ActionLog.id, ActionLog.user_id, ActionLog.action, ActionLog.details, ActionLog.timestamp)
+            .where(ActionLog.id > last_id).order_by(ActionLog.id).limit(batch_size)
+        ).all()
+        if not rows:
+            return total
+        apply_rollups(session, [(r.user_id, r.action, r.details, r.timestamp[:10]) for r in rows])
+        last_id = rows[-1].id
+        total += len(rows)
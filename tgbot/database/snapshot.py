@@ -0,0 +1,175 @@
+"""
+Сжатые снимки piculi.db для быстрого старта и восстановления.
+
+Снимок снимается online backup API SQLite (согласованная копия даже при активной
+записи и с непустым WAL), копия переводится в journal_mode=DELETE, сжимается VACUUM
+и gzip. Восстановление распаковывает снимок во временный файл, проверяет его
+`PRAGMA quick_check` и тем же backup API переносит в рабочую БД.
+
+Семестровые архивы (DB_DIR/archive) в снимок не входят: занятия из них на новой
+инстанции просто не показываются, пока файлы архивов не скопированы отдельно.
+
+CLI (бот должен быть остановлен для import):
+    python -m tgbot.database.snapshot export [snapshot.db.gz]
+    python -m tgbot.database.snapshot import [snapshot.db.gz] [--force]
+"""
+import gzip
+import logging
+import os
+import shutil
+import sqlite3
+import time
+from typing import Optional
+
+GZIP_LEVEL = 6
+
+
+def _counts(connection: sqlite3.Connection) -> dict:
+    def scalar(sql: str) -> int:
+        try:
+            return connection.execute(sql).fetchone()[0] or 0
+        except sqlite3.OperationalError:
+            return 0
+    return {
+        "schema_version": scalar("SELECT MAX(version) FROM schema_version"),
+        "tracked_groups": scalar("SELECT COUNT(*) FROM tracked_groups"),
+        "users": scalar('SELECT COUNT(*) FROM "user"'),
+        "lessons": scalar("SELECT COUNT(*) FROM lesson"),
+    }
+
+
+def snapshot_connection(source: sqlite3.Connection, dest_path: str) -> dict:
+    """Снимок из открытого соединения (в т.ч. сырого соединения читателя DatabaseExecutor)."""
+    started = time.perf_counter()
+    os.makedirs(os.path.dirname(os.path.abspath(dest_path)), exist_ok=True)
+    raw_path = f"{dest_path}.raw"
+    tmp_path = f"{dest_path}.tmp"
+    try:
+        # pages=-1 (по умолчанию): вся БД за один шаг, внутри одной транзакции чтения
+        copy = sqlite3.connect(raw_path, isolation_level=None)
+        try:
+            source.backup(copy)
+            copy.execute("PRAGMA journal_mode=DELETE")
+            copy.execute("VACUUM")
+            info = _counts(copy)
+        finally:
+            copy.close()
+        raw_size = os.path.getsize(raw_path)
+
+        with open(raw_path, "rb") as src, gzip.open(tmp_path, "wb", compresslevel=GZIP_LEVEL) as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        # Старый снимок заменяется только готовым новым
+        os.replace(tmp_path, dest_path)
+    finally:
+        for path in (raw_path, tmp_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    info.update({
+        "path": dest_path,
+        "raw_kb": raw_size / 1024,
+        "size_kb": os.path.getsize(dest_path) / 1024,
+        "ms": (time.perf_counter() - started) * 1000,
+    })
+    logging.info(
+        f"📸 Snapshot written: {dest_path} ({info['raw_kb']:.0f} KB -> {info['size_kb']:.0f} KB, "
+        f"{info['lessons']} lessons, {info['ms']:.0f} ms)"
+    )
+    return info
+
+
+def create_snapshot(db_path: str, dest_path: str) -> dict:
+    """Снимок файла БД (CLI). Работающему боту не мешает: backup читает как обычный читатель."""
+    source = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        return snapshot_connection(source, dest_path)
+    finally:
+        source.close()
+
+
+def restore_snapshot(snapshot_path: str, db_path: str) -> dict:
+    """
+    Заменяет содержимое db_path снимком. Вызывать только когда БД никто не использует
+    (до создания DatabaseManager или при остановленном боте).
+    """
+    started = time.perf_counter()
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    tmp_path = f"{db_path}.restore"
+    try:
+        with gzip.open(snapshot_path, "rb") as src, open(tmp_path, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        source = sqlite3.connect(tmp_path)
+        try:
+            check = source.execute("PRAGMA quick_check").fetchone()[0]
+            if check != "ok":
+                raise ValueError(f"Snapshot {snapshot_path} is corrupted: {check}")
+            info = _counts(source)
+            # backup API корректно перезаписывает и БД в режиме WAL (в отличие от копирования файла)
+            target = sqlite3.connect(db_path)
+            try:
+                source.backup(target)
+                target.execute("PRAGMA journal_mode=WAL")
+            finally:
+                target.close()
+        finally:
+            source.close()
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    info["ms"] = (time.perf_counter() - started) * 1000
+    logging.info(
+        f"♻️ Restored {db_path} from snapshot {snapshot_path}: {info['tracked_groups']} groups, "
+        f"{info['lessons']} lessons, {info['ms']:.0f} ms"
+    )
+    return info
+
+
+def needs_bootstrap(db_path: str) -> bool:
+    """
+    БД ещё нет (или файл пустой), либо в ней нет ни групп, ни пользователей.
+    Одних групп мало: до первой синхронизации списка групп их нет и в живой БД.
+    """
+    if not os.path.exists(db_path) or os.path.getsize(db_path) == 0:
+        return True
+    connection = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        counts = _counts(connection)
+    finally:
+        connection.close()
+    return counts["tracked_groups"] == 0 and counts["users"] == 0
+
+
+def bootstrap_from_snapshot(db_path: str, snapshot_path: str) -> Optional[dict]:
+    """Стартовый путь: восстанавливает пустую БД из снимка, если он есть. Ошибки не фатальны."""
+    if not os.path.exists(snapshot_path):
+        return None
+    try:
+        if not needs_bootstrap(db_path):
+            return None
+        logging.warning(
+            f"⚠️ {db_path} is missing or has no groups and no users: OVERWRITING it with snapshot {snapshot_path}"
+        )
+        return restore_snapshot(snapshot_path, db_path)
+    except Exception as e:
+        logging.error(f"❌ Snapshot bootstrap failed, starting without it: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    import sys
+
+    from tgbot.config import config
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    if not args or args[0] not in ("export", "import"):
+        sys.exit("usage: python -m tgbot.database.snapshot export|import [snapshot.db.gz] [--force]")
+    path = args[1] if len(args) > 1 else config.SNAPSHOT_PATH
+
+    if args[0] == "export":
+        create_snapshot(config.DB_NAME, path)
+    else:
+        if not needs_bootstrap(config.DB_NAME) and "--force" not in sys.argv:
+            sys.exit(f"{config.DB_NAME} already has data; stop the bot and pass --force to overwrite it")
+        restore_snapshot(path, config.DB_NAME)
@@ -0,0 +1,120 @@
+from datetime import date
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.sqlite import insert
+
+from tgbot.database.models import Lesson, ScheduleTemplate
+
+# Фиксированный понедельник: фаза = (дата - эпоха) % 14, одинакова для всех групп.
+# Совпадение фаз двух дат не зависит от выбора эпохи, поэтому прогноз тот же,
+# что и при опорной дате "первое занятие группы".
+TEMPLATE_EPOCH = date(2024, 1, 1)
+CYCLE_DAYS = 14
+
+_TEMPLATE_FIELDS = ("subject", "class_type", "teacher", "building", "room", "subgroup")
+
+prediction_stats = {
+    "requests": 0,      # вызовов get_predicted_schedule_range
+    "days": 0,          # запрошенных дней
+    "served": 0,        # дней, для которых нашёлся прогноз
+    "empty": 0,         # дней без шаблона
+    "template_rows": 0, # строк шаблонов, обновлённых после парсинга
+}
+
+
+def template_phase(d: date) -> int:
+    return (d - TEMPLATE_EPOCH).days % CYCLE_DAYS
+
+
+def update_templates(session, lessons: Iterable[Lesson], days: Iterable[Tuple[str, str]] = ()) -> int:
+    """
+    Инкрементально обновляет шаблоны по свежеразобранным занятиям (upsert).
+    Побеждает самая поздняя дата-источник; вызывающий отвечает за commit.
+    `session` может быть Session или Connection, `lessons` — Lesson или строки с теми же полями.
+    `days` — перезаписанные дни (группа, дата ISO), включая очищенные: пары их фазы,
+    взятые из этих или более ранних дат, удаляются, чтобы отменённые пары не попадали в прогноз.
+    """
+    rewritten: Dict[Tuple[str, int], str] = {}
+    for group_name, day in days:
+        key = (group_name, template_phase(date.fromisoformat(day)))
+        rewritten[key] = max(day, rewritten.get(key, day))
+    for (group_name, phase), day in rewritten.items():
+        session.execute(delete(ScheduleTemplate).where(
+            ScheduleTemplate.group_name == group_name,
+            ScheduleTemplate.phase == phase,
+            ScheduleTemplate.source_date <= day,
+        ))
+
+    latest: Dict[Tuple[str, int, int], Lesson] = {}
+    for lesson in sorted(lessons, key=lambda l: l.date, reverse=True):
+        if lesson.pair_number is None:
+            continue
+        phase = template_phase(date.fromisoformat(lesson.date))
+        # Более поздний перезаписанный день той же фазы уже определил её пары
+        if lesson.date < rewritten.get((lesson.group_name, phase), lesson.date):
+            continue
+        key = (lesson.group_name, phase, lesson.pair_number)
+        latest.setdefault(key, lesson)
+    if not latest:
+        return 0
+
+    rows = [
+        {
+            "group_name": group_name,
+            "phase": phase,
+            "pair_number": pair_number,
+            "source_date": lesson.date,
+            **{field: getattr(lesson, field) for field in _TEMPLATE_FIELDS},
+        }
+        for (group_name, phase, pair_number), lesson in latest.items()
+    ]
+    stmt = insert(ScheduleTemplate)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["group_name", "phase", "pair_number"],
+        set_={**{field: stmt.excluded[field] for field in _TEMPLATE_FIELDS}, "source_date": stmt.excluded.source_date},
+        where=stmt.excluded.source_date >= ScheduleTemplate.source_date,
+    )
+    session.execute(stmt, rows)
+    prediction_stats["template_rows"] += len(rows)
+    return len(rows)
+
+
+def rebuild_all_templates(session) -> int:
+    """Полная перестройка шаблонов по таблице lesson (бэкфилл миграцией)."""
+    columns = [Lesson.group_name, Lesson.date, Lesson.pair_number] + [getattr(Lesson, f) for f in _TEMPLATE_FIELDS]
+    rows = session.execute(select(*columns)).all()
+    return update_templates(session, rows)
+
+
+def predict_from_templates(
+    group_name: str, dates: List[date], templates: Iterable[ScheduleTemplate]
+) -> Dict[date, List[Lesson]]:
+    """
+    Строит прогноз по шаблонам: сначала пары той же фазы цикла,
+    пробелы заполняются парами того же дня недели из второй недели цикла.
+    """
+    by_phase: Dict[int, Dict[int, ScheduleTemplate]] = {}
+    for t in templates:
+        by_phase.setdefault(t.phase, {})[t.pair_number] = t
+
+    predicted = {}
+    for d in dates:
+        phase = template_phase(d)
+        pairs = dict(by_phase.get((phase + 7) % CYCLE_DAYS, {}))
+        pairs.update(by_phase.get(phase, {}))
+        predicted[d] = [
+            Lesson(
+                group_name=group_name,
+                date=d.isoformat(),
+                pair_number=pair_number,
+                **{field: getattr(t, field) for field in _TEMPLATE_FIELDS},
+            )
+            for pair_number, t in sorted(pairs.items())
+        ]
+    return predicted
+
+
+def get_prediction_stats() -> dict:
+    days = prediction_stats["days"]
+    return {**prediction_stats, "served_ratio": prediction_stats["served"] / days if days else 0.0}
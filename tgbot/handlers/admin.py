@@ -1,7 +1,9 @@
 from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.filters import Command, BaseFilter
-from tgbot.database.repositories import UserRepository
+from aiogram.exceptions import TelegramBadRequest
+from tgbot.database.repositories import UserRepository, AnalyticsRepository, ScheduleRepository
+from tgbot.services.services import BotSettingsStore
 from tgbot.keyboards.inline import get_admin_menu_kb, get_bot_settings_kb
 from tgbot.keyboards.callback_data import AdminCallback
 from tgbot.config import config
@@ -26,38 +28,211 @@ async def admin_stop_bot(message: Message):
     # Send SIGTERM to own process to trigger graceful shutdown in main.py
     os.kill(os.getpid(), signal.SIGTERM)
 
+@admin_router.message(Command("db_stats"))
+async def admin_db_stats(message: Message):
+    """Топ SQL-операторов и методов репозиториев по суммарному времени. /db_stats reset — сбросить."""
+    from html import escape
+    from tgbot.database.query_stats import query_stats
+
+    if (message.text or "").split()[1:2] == ["reset"]:
+        query_stats.reset()
+        await message.answer("🧹 Статистика запросов сброшена")
+        return
+
+    snap = query_stats.snapshot(limit=8)
+    lines = [
+        "🗄 <b>SQL: топ по суммарному времени</b>",
+        f"Медленных (≥ {snap['slow_ms']:.0f} мс): {snap['slow_queries']}",
+    ]
+    for pool, wait in snap["pool_wait"].items():
+        lines.append(f"Ожидание пула {pool}: p50 {wait['p50_ms']} мс, p95 {wait['p95_ms']} мс, max {wait['max_ms']} мс")
+    lines += ["", "<b>Операторы</b>"]
+    for item in snap["top_statements"]:
+        lines.append(
+            f"• {item['count']}× avg {item['avg_ms']:.2f} / p95 {item['p95_ms']} / Σ {item['total_ms']:.0f} мс, "
+            f"строк {item['rows']}\n<code>{escape(item['key'][:150])}</code>"
+        )
+    lines += ["", "<b>Методы репозиториев</b>"]
+    for item in snap["top_methods"]:
+        lines.append(
+            f"• {escape(item['key'])}: {item['count']}× avg {item['avg_ms']:.2f} / p95 {item['p95_ms']} / "
+            f"Σ {item['total_ms']:.0f} мс"
+        )
+    await message.answer("\n".join(lines)[:4000])
+
+@admin_router.message(Command("db_snapshot"))
+async def admin_db_snapshot(message: Message, user_repo: UserRepository):
+    """Снимок piculi.db (backup API + gzip) в SNAPSHOT_PATH; файл отправляется админу."""
+    from aiogram.types import FSInputFile
+
+    status = await message.answer("📸 Создаю снимок базы...")
+    try:
+        info = await user_repo.db_manager.snapshot(config.SNAPSHOT_PATH)
+    except Exception as e:
+        await status.edit_text(f"❌ Ошибка создания снимка: {e}")
+        return
+
+    text = (
+        f"✅ <b>Снимок готов</b> за {info['ms'] / 1000:.1f} с\n"
+        f"Размер: {info['raw_kb'] / 1024:.1f} МБ → {info['size_kb'] / 1024:.1f} МБ\n"
+        f"Групп: {info['tracked_groups']}, занятий: {info['lessons']}, схема v{info['schema_version']}\n"
+        f"<code>{info['path']}</code>"
+    )
+    await status.edit_text(text)
+    # Лимит Telegram на отправку файлов ботом — 50 МБ
+    if info["size_kb"] < 49 * 1024:
+        await message.answer_document(FSInputFile(info["path"], filename="piculi.db.gz"))
+
 @admin_router.callback_query(F.data == "admin_panel")
 async def callback_admin_panel(callback: CallbackQuery):
     await callback.message.edit_text("👑 <b>Панель администратора</b>", reply_markup=get_admin_menu_kb())
     await callback.answer()
 
 @admin_router.callback_query(AdminCallback.filter(F.action == "sett"))
-async def admin_settings(callback: CallbackQuery, user_repo: UserRepository):
-    settings = await user_repo.get_settings()
+async def admin_settings(callback: CallbackQuery, settings_store: BotSettingsStore):
+    settings = await settings_store.get()
     await callback.message.edit_text("⚙️ <b>Настройки кнопок меню</b>", reply_markup=get_bot_settings_kb(settings))
     await callback.answer()
 
 @admin_router.callback_query(AdminCallback.filter(F.action == "btn_tog"))
-async def admin_toggle_btn(callback: CallbackQuery, callback_data: AdminCallback, user_repo: UserRepository):
-    settings = await user_repo.get_settings()
+async def admin_toggle_btn(callback: CallbackQuery, callback_data: AdminCallback, settings_store: BotSettingsStore):
+    settings = await settings_store.get()
     current_val = settings.get(callback_data.value, '1')
     new_val = '0' if current_val == '1' else '1'
     
-    await user_repo.update_setting(callback_data.value, new_val)
-    settings[callback_data.value] = new_val
+    # set() перечитывает снимок и уведомляет подписчиков (например, maintenance middleware)
+    settings = await settings_store.set(callback_data.value, new_val)
     
     await callback.message.edit_reply_markup(reply_markup=get_bot_settings_kb(settings))
-    await callback.answer(f"Кнопка {'выключена' if new_val == '0' else 'включена'}")
+    if callback_data.value == "maintenance_mode":
+        await callback.answer(f"Режим обслуживания {'включён' if new_val == '1' else 'выключен'}")
+    else:
+        await callback.answer(f"Кнопка {'выключена' if new_val == '0' else 'включена'}")
+
+@admin_router.callback_query(AdminCallback.filter(F.action == "stats"))
+async def admin_stats(callback: CallbackQuery, analytics_repo: AnalyticsRepository):
+    if analytics_repo.writer is not None:
+        # Дописываем буфер, чтобы сводка включала последние клики
+        await analytics_repo.writer.flush()
+    dashboard = await analytics_repo.get_dashboard(days=7)
+
+    lines = ["📈 <b>Статистика за 7 дней</b>", "", f"👥 Уникальных пользователей: <b>{dashboard['unique_users']}</b>", ""]
+    if dashboard["days"]:
+        lines.append("📅 <b>По дням</b> (событий / пользователей)")
+        lines += [f"{day}: {events} / {users}" for day, events, users in dashboard["days"]]
+    else:
+        lines.append("Данных пока нет.")
+    if dashboard["top_actions"]:
+        lines += ["", "🔥 <b>Топ действий</b>"]
+        lines += [f"{action}: {n}" for action, n in dashboard["top_actions"]]
+    if dashboard["top_groups"]:
+        lines += ["", "🎓 <b>Топ групп</b>"]
+        lines += [f"{group}: {n}" for group, n in dashboard["top_groups"]]
+
+    try:
+        await callback.message.edit_text(
+            "\n".join(lines),
+            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+                [InlineKeyboardButton(text="🔄 Обновить", callback_data=AdminCallback(action="stats").pack())],
+                [InlineKeyboardButton(text="« Назад", callback_data="admin_panel")],
+            ])
+        )
+    except TelegramBadRequest as e:
+        if "message is not modified" not in str(e):
+            raise
+    await callback.answer()
+
+@admin_router.callback_query(AdminCallback.filter(F.action == "metrics"))
+async def admin_metrics(
+    callback: CallbackQuery, user_repo: UserRepository, analytics_repo: AnalyticsRepository, broadcaster=None
+):
+    from tgbot.database.group_index import lesson_groups_index, tracked_groups_index
+    from tgbot.database.templates import get_prediction_stats
+    from tgbot.handlers.teacher import teacher_nav_cache
+    from tgbot.services.single_flight import get_single_flight_stats
+    from tgbot.services.render_cache import render_cache
+
+    users = user_repo.get_cache_stats()
+    db = user_repo.db_manager.get_stats()
+    teachers = teacher_nav_cache.get_stats()
+    predictions = get_prediction_stats()
+    renders = render_cache.get_stats()
+
+    lines = [
+        "📊 <b>Метрики</b>",
+        "",
+        "👤 <b>Кэш пользователей</b>",
+        f"Hit ratio: {users['hit_ratio']:.1%} ({users['hits']}/{users['hits'] + users['misses']})",
+        f"Размер: {users['size']}/{users['maxsize']}, вытеснено: {users['evictions']}, истекло: {users['expired']}",
+        f"Загрузка из БД: avg {users['load_ms_avg']:.1f} мс, max {users['load_ms_max']:.1f} мс",
+        "",
+        "🗄 <b>БД</b>",
+    ]
+    for pool_name in ("read", "write"):
+        pool = db[pool_name]
+        lines.append(
+            f"{pool_name}: {pool['completed']} запр., очередь {pool['queue_depth']} (max {pool['max_queue_depth']}), "
+            f"ожидание avg {pool['avg_wait_ms']:.1f} мс, выполнение avg {pool['avg_exec_ms']:.1f} мс"
+        )
+    lines.append(
+        f"Блокировки: {db['write']['lock_waits']} ожиданий (max {db['write']['max_lock_wait_ms']:.0f} мс), "
+        f"busy: {db['read']['busy_errors'] + db['write']['busy_errors']}"
+    )
+    cp = db["checkpoint"]
+    lines.append(
+        f"WAL: {cp['wal_size_kb']:.0f} КБ, чекпойнтов {cp['runs']} (busy {cp['busy']}), "
+        f"последний {cp['last_ms']:.0f} мс"
+    )
+    from tgbot.database.query_stats import query_stats
+    lines.append(f"Медленных запросов: {query_stats.slow_queries} (подробно: /db_stats)")
+    if broadcaster is not None:
+        bs = broadcaster.get_stats()
+        lines.append(
+            f"Рассылки: {bs['jobs']} (+{bs['resumed']} продолжено, активных {bs['active_jobs']}), "
+            f"доставлено {bs['sent']}, ошибок {bs['failed']}, заблокировали {bs['blocked']}, RetryAfter {bs['retry_after']}"
+        )
+    if analytics_repo.writer is not None:
+        aw = analytics_repo.writer.get_stats()
+        lines.append(
+            f"analytics: очередь {aw['queue_depth']} (max {aw['max_queue_depth']}), записано {aw['written']} "
+            f"за {aw['batches']} пачек, отброшено {aw['dropped']}, ошибок {aw['failures']}"
+        )
+    lines += [
+        "",
+        "🔮 <b>Прогноз</b>",
+        f"Дней с прогнозом: {predictions['served']}/{predictions['days']} ({predictions['served_ratio']:.1%})",
+        "",
+        "🔎 <b>Индексы и кэши</b>",
+        f"Группы: {len(lesson_groups_index)} с занятиями, {len(tracked_groups_index)} всего",
+        f"Преподаватели (навигация): hit ratio {teachers['hit_ratio']:.1%}",
+        f"Сообщения расписания: hit ratio {renders['hit_ratio']:.1%} ({renders['size']}/{renders['maxsize']}), "
+        f"рендер avg {renders['load_ms_avg']:.1f} мс",
+    ]
+    for name, sf in get_single_flight_stats().items():
+        lines.append(f"{name}: {sf['executions']} выполн., {sf['coalesced']} объединено, {sf['cached']} из кэша")
+
+    try:
+        await callback.message.edit_text(
+            "\n".join(lines),
+            reply_markup=InlineKeyboardMarkup(inline_keyboard=[
+                [InlineKeyboardButton(text="🔄 Обновить", callback_data=AdminCallback(action="metrics").pack())],
+                [InlineKeyboardButton(text="« Назад", callback_data="admin_panel")],
+            ])
+        )
+    except TelegramBadRequest as e:
+        if "message is not modified" not in str(e):
+            raise
+    await callback.answer()
 
 @admin_router.callback_query(F.data == "admin_sync_groups")
-async def admin_sync_groups(callback: CallbackQuery):
+async def admin_sync_groups(callback: CallbackQuery, schedule_repo: ScheduleRepository):
     from tgbot.services.parser.site_to_pdf import sync_groups_list
     from tgbot.services.parser.progress import ProgressReporter
     
     progress = ProgressReporter(callback.message)
     await progress.report("⏳ Начало синхронизации списка групп...", 0.0)
     
-    success = await sync_groups_list(progress=progress)
+    success = await sync_groups_list(schedule_repo.db_manager, progress=progress)
     
     if success:
         await callback.message.edit_text("✅ Список групп успешно обновлен!", reply_markup=get_admin_menu_kb())
@@ -75,17 +250,15 @@ async def admin_sync_groups(callback: CallbackQuery):
     await callback.answer()
 
 @admin_router.callback_query(F.data == "admin_sync_occupancy")
-async def admin_sync_occupancy(callback: CallbackQuery):
+async def admin_sync_occupancy(callback: CallbackQuery, schedule_repo: ScheduleRepository):
     from tgbot.services.parser.occupancy_parser import update_occupancy
     from tgbot.services.parser.progress import ProgressReporter
-    from sqlalchemy import create_engine
     
     progress = ProgressReporter(callback.message)
     await progress.report("⏳ Начало обновления занятости...", 0.0)
     
-    engine = create_engine(f"sqlite:///{config.DB_NAME}")
     try:
-        await update_occupancy(engine=engine, progress=progress)
+        await update_occupancy(schedule_repo.db_manager, progress=progress)
         await callback.message.edit_text("✅ Занятость аудиторий успешно обновлена!", reply_markup=get_admin_menu_kb())
     except Exception as e:
         await callback.message.edit_text(f"❌ Ошибка при обновлении занятости: {e}", reply_markup=get_admin_menu_kb())
@@ -70,6 +70,21 @@ async def cmd_parser_status(message: Message, parser_scheduler):
     text += f"▫️ Успешных: <code>{stats['successful_runs']}</code>\n"
     text += f"▫️ Ошибок: <code>{stats['failed_runs']}</code>\n"
     
+    # Последнее обслуживание БД
+    maintenance = status.get('last_maintenance')
+    if maintenance:
+        text += f"\n🧹 <b>Обслуживание</b> ({maintenance['finished_at'].strftime('%d.%m.%Y %H:%M')}):\n"
+        text += f"▫️ В архив: <code>{maintenance['lessons_archived']}</code>, удалено занятий: <code>{maintenance['lessons_deleted']}</code>, логов: <code>{maintenance['logs_deleted']}</code>\n"
+        text += f"▫️ Освобождено: <code>{maintenance['pages_freed']}</code> стр. ({maintenance['freed_kb']:.0f} КБ) за {maintenance['duration_s']:.1f}с\n"
+        if maintenance.get('errors'):
+            text += f"▫️ Ошибки: <code>{', '.join(maintenance['errors'])}</code>\n"
+
+    digest = status.get('last_digest')
+    if digest:
+        text += f"\n☀️ <b>Утренняя рассылка</b> ({digest['date']}):\n"
+        text += f"▫️ Подписчиков: <code>{digest['subscribers']}</code>, групп: <code>{digest['groups']}</code>, вариантов: <code>{digest['variants']}</code> (рендер {digest['render_ms']:.0f} мс)\n"
+        text += f"▫️ Доставлено: <code>{digest['delivered']}</code>, ошибок: <code>{digest['failed']}</code>, заблокировали: <code>{digest['blocked']}</code> за {digest['duration_s']:.1f}с\n"
+    
     # Кнопки управления
     builder = InlineKeyboardBuilder()
     builder.button(text="▶️ Запустить сейчас", callback_data="parser_run_now")
@@ -108,6 +123,20 @@ async def callback_parser_status_refresh(callback: CallbackQuery, parser_schedul
     text += f"▫️ Успешных: <code>{stats['successful_runs']}</code>\n"
     text += f"▫️ Ошибок: <code>{stats['failed_runs']}</code>\n"
     
+    maintenance = status.get('last_maintenance')
+    if maintenance:
+        text += f"\n🧹 <b>Обслуживание</b> ({maintenance['finished_at'].strftime('%d.%m.%Y %H:%M')}):\n"
+        text += f"▫️ В архив: <code>{maintenance['lessons_archived']}</code>, удалено занятий: <code>{maintenance['lessons_deleted']}</code>, логов: <code>{maintenance['logs_deleted']}</code>\n"
+        text += f"▫️ Освобождено: <code>{maintenance['pages_freed']}</code> стр. ({maintenance['freed_kb']:.0f} КБ) за {maintenance['duration_s']:.1f}с\n"
+        if maintenance.get('errors'):
+            text += f"▫️ Ошибки: <code>{', '.join(maintenance['errors'])}</code>\n"
+
+    digest = status.get('last_digest')
+    if digest:
+        text += f"\n☀️ <b>Утренняя рассылка</b> ({digest['date']}):\n"
+        text += f"▫️ Подписчиков: <code>{digest['subscribers']}</code>, групп: <code>{digest['groups']}</code>, вариантов: <code>{digest['variants']}</code> (рендер {digest['render_ms']:.0f} мс)\n"
+        text += f"▫️ Доставлено: <code>{digest['delivered']}</code>, ошибок: <code>{digest['failed']}</code>, заблокировали: <code>{digest['blocked']}</code> за {digest['duration_s']:.1f}с\n"
+    
     builder = InlineKeyboardBuilder()
     builder.button(text="▶️ Запустить сейчас", callback_data="parser_run_now")
     builder.adjust(2)
@@ -228,13 +257,11 @@ async def cmd_parser_logs(message: Message):
 
 
 @admin_parser_router.message(Command("sync_occupancy"))
-async def cmd_sync_occupancy(message: Message):
+async def cmd_sync_occupancy(message: Message, parser_scheduler):
     """Принудительная синхронизация занятости аудиторий"""
     await message.answer("🔄 Запускаю синхронизацию занятости аудиторий...")
-    from sqlalchemy import create_engine
-    engine = create_engine(f"sqlite:///{config.DB_NAME}")
     try:
-        await update_occupancy(engine)
+        await update_occupancy(parser_scheduler.db_manager)
         await message.answer("✅ Занятость аудиторий успешно обновлена!")
     except Exception as e:
         await message.answer(f"❌ Ошибка при обновлении занятости: {e}")
@@ -1,10 +1,9 @@
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from typing import List
-import json
 
-from tgbot.database.models import User
 from tgbot.database.repositories import UserRepository, ScheduleRepository, AnalyticsRepository
+from tgbot.services.services import BotSettingsStore
 from tgbot.keyboards.inline import get_main_menu, get_schedule_hub_kb
 from tgbot.keyboards.callback_data import GroupSelectCb
 from aiogram.utils.keyboard import InlineKeyboardBuilder
@@ -24,8 +23,7 @@ def get_favorites_kb(favorites: List[str]) -> InlineKeyboardBuilder:
 
 @favorites_router.callback_query(F.data == "fav_menu")
 async def show_favorites(callback: CallbackQuery, user_repo: UserRepository):
-    user = await user_repo.get_user(callback.from_user.id)
-    favorites = user.favorites
+    favorites = await user_repo.get_favorites(callback.from_user.id)
     
     if not favorites:
         await callback.answer("⭐ У вас пока нет избранных групп. Добавьте их в меню расписания!", show_alert=True)
@@ -39,18 +37,13 @@ async def show_favorites(callback: CallbackQuery, user_repo: UserRepository):
 
 @favorites_router.callback_query(GroupSelectCb.filter(F.action == "fav_add"))
 async def add_to_favorites(callback: CallbackQuery, callback_data: GroupSelectCb, user_repo: UserRepository, analytics_repo: AnalyticsRepository):
-    user = await user_repo.get_user(callback.from_user.id)
-    favorites = user.favorites
     group_name = callback_data.name
     
-    if group_name in favorites:
+    if not await user_repo.add_favorite(callback.from_user.id, group_name):
         await callback.answer("⭐ Группа уже есть в избранном!", show_alert=True)
         return
         
-    favorites.append(group_name)
-    user.favorites = favorites
-    await user_repo.upsert_user(user)
-    await analytics_repo.log_action(user.telegram_id, "add_favorite", group_name)
+    await analytics_repo.log_action(callback.from_user.id, "add_favorite", group_name)
     
     await callback.answer(f"✅ {group_name} добавлена в избранное!")
     # Update current keyboard to hide "add to fav" button if it was there
@@ -58,18 +51,14 @@ async def add_to_favorites(callback: CallbackQuery, callback_data: GroupSelectCb
     # For better UX we could refresh the schedule hub kb.
 
 @favorites_router.callback_query(GroupSelectCb.filter(F.action == "fav_remove"))
-async def remove_from_favorites(callback: CallbackQuery, callback_data: GroupSelectCb, user_repo: UserRepository):
-    user = await user_repo.get_user(callback.from_user.id)
-    favorites = user.favorites
+async def remove_from_favorites(callback: CallbackQuery, callback_data: GroupSelectCb, user_repo: UserRepository, settings_store: BotSettingsStore):
     group_name = callback_data.name
-    
-    if group_name in favorites:
-        favorites.remove(group_name)
-        user.favorites = favorites
-        await user_repo.upsert_user(user)
+    await user_repo.remove_favorite(callback.from_user.id, group_name)
+    favorites = await user_repo.get_favorites(callback.from_user.id)
     
     if not favorites:
-        bot_settings = await user_repo.get_settings()
+        user = await user_repo.get_user(callback.from_user.id)
+        bot_settings = await settings_store.get()
         await callback.message.edit_text("Главное меню", reply_markup=get_main_menu(user, bot_settings))
     else:
         await callback.message.edit_reply_markup(reply_markup=get_favorites_kb(favorites).as_markup())
@@ -2,7 +2,7 @@ from datetime import date
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
-from tgbot.database.repositories import UserRepository, ScheduleRepository, AnalyticsRepository
+from tgbot.database.repositories import UserRepository, ScheduleRepository, AnalyticsRepository, OccupancyRepository
 from tgbot.services.services import ScheduleService
 from tgbot.keyboards.inline import (
     get_meeting_all_groups_kb, 
@@ -96,6 +96,47 @@ async def process_meet_date(
     await analytics_repo.log_action(callback.from_user.id, "check_common_windows", f"groups:{groups}, date:{target_date}")
     
     result_text = await service.find_common_free_slots(schedule_repo, groups, target_date)
+    await callback.message.edit_text(result_text, reply_markup=get_back_to_dates_kb(f"{target_date.isoformat()}+1"))
+    await callback.answer()
+
+@meeting_router.callback_query(MeetingCb.filter(F.action == "range"))
+async def process_meet_range(
+    callback: CallbackQuery,
+    callback_data: MeetingCb,
+    state: FSMContext,
+    schedule_repo: ScheduleRepository,
+    service: ScheduleService,
+    analytics_repo: AnalyticsRepository
+):
+    days = int(callback_data.value)
+    data = await state.get_data()
+    groups = data.get("selected_groups", [])
+
+    await analytics_repo.log_action(callback.from_user.id, "check_common_windows_range", f"groups:{groups}, days:{days}")
+
+    result_text = await service.find_common_windows(schedule_repo, groups, date.today(), days)
+    await callback.message.edit_text(result_text, reply_markup=get_back_to_dates_kb(f"{date.today().isoformat()}+{days}"))
+    await callback.answer()
+
+@meeting_router.callback_query(MeetingCb.filter(F.action == "plan"))
+async def process_meet_plan(
+    callback: CallbackQuery,
+    callback_data: MeetingCb,
+    state: FSMContext,
+    schedule_repo: ScheduleRepository,
+    occupancy_repo: OccupancyRepository,
+    service: ScheduleService,
+    analytics_repo: AnalyticsRepository
+):
+    start_iso, days = callback_data.value.split("+")
+    data = await state.get_data()
+    groups = data.get("selected_groups", [])
+    if len(groups) < 2:
+        return await callback.answer("Сначала выберите группы заново.", show_alert=True)
+
+    await analytics_repo.log_action(callback.from_user.id, "plan_meeting", f"groups:{groups}, from:{start_iso}, days:{days}")
+
+    result_text = await service.plan_meeting(schedule_repo, occupancy_repo, groups, date.fromisoformat(start_iso), int(days))
     await callback.message.edit_text(result_text, reply_markup=get_back_to_dates_kb())
     await callback.answer()
 
@@ -125,7 +166,7 @@ async def process_manual_date(
     
     result_text = await service.find_common_free_slots(schedule_repo, groups, target_date)
     await state.set_state(None)
-    await message.answer(result_text, reply_markup=get_back_to_dates_kb())
+    await message.answer(result_text, reply_markup=get_back_to_dates_kb(f"{target_date.isoformat()}+1"))
 # Note: meeting_router.message handler for ScheduleState.waiting_for_date is handled in user.py or we should add it here if it's meeting-specific. 
 # Looking at user.py, it handles ScheduleState.waiting_for_date but it seems oriented towards 'show_schedule_for_group'.
 # Let's add a specific state OR check how it's used.
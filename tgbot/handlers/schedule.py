@@ -65,16 +65,10 @@ async def show_schedule_for_group(
     service: ScheduleService,
 ):
     user = await user_repo.get_user(callback.from_user.id)
-    settings = user.settings if user and user.settings else None
-    lessons = await schedule_repo.get_lessons(group_name, target_date)
-    is_predicted = False
-    
-    if not lessons:
-        lessons = await schedule_repo.get_predicted_schedule(group_name, target_date)
-        is_predicted = True if lessons else False
+    settings = user.settings if user else None
 
     await callback.message.edit_text(
-        service.format_day(lessons, target_date, group_name, settings, is_predicted=is_predicted),
+        await service.render_day(schedule_repo, group_name, target_date, settings),
         reply_markup=get_schedule_hub_kb(group_name),
     )
 
@@ -101,7 +95,7 @@ async def navigate_schedule(
     from aiogram.exceptions import TelegramBadRequest
     
     user = await user_repo.get_user(callback.from_user.id)
-    settings = user.settings if user else {}
+    settings = user.settings if user else None
     current = date.fromisoformat(callback_data.current_date)
     group = callback_data.group
 
@@ -111,28 +105,9 @@ async def navigate_schedule(
         return
 
     if callback_data.action == "week":
-        start_date = current
-        end_date = start_date + timedelta(days=6)
-
-        text_parts = [
-            f"📆 <b>Расписание на неделю ({start_date.strftime('%d.%m')} — {end_date.strftime('%d.%m')})</b>\nГруппа: {group}\n"
-        ]
-
-        has_any = False
-        for i in range(7):
-            day_date = start_date + timedelta(days=i)
-            lessons = await schedule_repo.get_lessons(group, day_date)
-            if lessons:
-                has_any = True
-                day_text = service.format_day(lessons, day_date, group, settings)
-                text_parts.append(day_text)
-
-        if not has_any:
-            text_parts.append("🎉 На эту неделю пар нет!")
-
         try:
             await callback.message.edit_text(
-                text="\n\n".join(text_parts),
+                text=await service.render_week(schedule_repo, group, current, settings),
                 reply_markup=get_schedule_hub_kb(group)
             )
         except TelegramBadRequest as e:
@@ -145,12 +120,6 @@ async def navigate_schedule(
     
     if callback_data.action == "show_date":
         target_date = current
-        lessons = await schedule_repo.get_lessons(group, target_date)
-        is_predicted = False
-        if not lessons:
-            lessons = await schedule_repo.get_predicted_schedule(group, target_date)
-            is_predicted = True if lessons else False
-            
         await analytics_repo.log_action(
             callback.from_user.id,
             "schedule_nav_calendar",
@@ -159,7 +128,7 @@ async def navigate_schedule(
         
         try:
             await callback.message.edit_text(
-                text=service.format_day(lessons, target_date, group, settings, is_predicted=is_predicted),
+                text=await service.render_day(schedule_repo, group, target_date, settings),
                 reply_markup=get_schedule_hub_kb(group)
             )
         except TelegramBadRequest as e:
@@ -192,15 +161,9 @@ async def navigate_schedule(
             f"group: {callback_data.group}, date:{new_date}",
         )
 
-    lessons = await schedule_repo.get_lessons(group, new_date)
-    is_predicted = False
-    if not lessons:
-        lessons = await schedule_repo.get_predicted_schedule(group, new_date)
-        is_predicted = True if lessons else False
-    
     try:
         await callback.message.edit_text(
-            text=service.format_day(lessons, new_date, group, settings, is_predicted=is_predicted),
+            text=await service.render_day(schedule_repo, group, new_date, settings),
             reply_markup=get_schedule_hub_kb(group)
         )
     except TelegramBadRequest as e:
@@ -233,10 +196,9 @@ async def process_custom_date(
 
     await state.clear()
     user = await user_repo.get_user(message.from_user.id)
-    lessons = await schedule_repo.get_lessons(group, chosen_date)
-    settings = user.settings if user else {}
+    settings = user.settings if user else None
 
     await message.answer(
-        service.format_day(lessons, chosen_date, group, settings),
+        await service.render_day(schedule_repo, group, chosen_date, settings, predict=False),
         reply_markup=get_schedule_hub_kb(group),
     )
@@ -11,7 +11,8 @@ settings_router = Router()
 async def settings_menu(callback: CallbackQuery, user_repo: UserRepository):
     user = await user_repo.get_user(callback.from_user.id)
     await callback.message.edit_text(
-        "⚙️ <b>Настройки отображения</b>\n\nЗдесь вы можете настроить, какие элементы расписания будут видны:",
+        "⚙️ <b>Настройки отображения</b>\n\nЗдесь вы можете настроить, какие элементы расписания будут видны, "
+        "и уведомления об изменениях в расписании ваших групп:",
         reply_markup=get_user_settings_kb(user.settings)
     )
     await callback.answer()
@@ -20,13 +21,9 @@ async def settings_menu(callback: CallbackQuery, user_repo: UserRepository):
 async def toggle_setting(callback: CallbackQuery, callback_data: SettingCb, user_repo: UserRepository):
     user = await user_repo.get_user(callback.from_user.id)
     
-    # Toggle the boolean value
-    current_val = getattr(user.settings, callback_data.field)
-    new_val = not current_val
-    setattr(user.settings, callback_data.field, new_val)
-    
-    # Save to DB
-    await user_repo.upsert_user(user)
+    # Toggle the boolean value (UserSettings is immutable: save through the repository)
+    new_val = not getattr(user.settings, callback_data.field)
+    user = await user_repo.update_user_setting(callback.from_user.id, callback_data.field, new_val)
     
     # Update keyboard
     await callback.message.edit_reply_markup(reply_markup=get_user_settings_kb(user.settings))
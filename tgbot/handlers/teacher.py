@@ -1,8 +1,9 @@
 import asyncio
 import logging
 import re
+import time
 from datetime import date
-import aiohttp
+from pathlib import Path
 
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery, InlineKeyboardButton
@@ -16,21 +17,31 @@ from tgbot.keyboards.inline import (
     get_teacher_institutes_kb, 
     get_teacher_faculties_kb, 
     get_teacher_departments_kb,
+    get_teacher_candidates_kb,
     get_main_menu
 )
-from tgbot.services.parser.teacher_parser import get_teacher_navigation_data, parse_teacher_html_report
+from tgbot.services.parser.teacher_parser import get_teacher_navigation_data, fetch_teacher_report
 from tgbot.services.parser.progress import ProgressReporter
+from tgbot.services.cache import RefreshingCache
+from tgbot.services.teacher_index import TeacherIndex, split_teachers, teacher_index, teacher_key
+from tgbot.database.repositories import ScheduleRepository
 
 teacher_router = Router()
 
-# Cache for navigation data to avoid constant scraping
-_nav_cache = None
+# Cache for navigation data to avoid constant scraping.
+# Fresh for 6 hours, then served stale while refreshing in background; persisted across restarts.
+teacher_nav_cache = RefreshingCache(
+    get_teacher_navigation_data,
+    ttl=6 * 60 * 60,
+    persist_path=Path(config.DATA_DIR) / "cache" / "teacher_nav.json",
+    name="teacher_nav",
+)
+
+# Teacher name index is rebuilt from Lesson.teacher at most once an hour
+TEACHER_INDEX_TTL = 60 * 60
 
 async def get_cached_nav():
-    global _nav_cache
-    if _nav_cache is None:
-        _nav_cache = await get_teacher_navigation_data()
-    return _nav_cache
+    return await teacher_nav_cache.get()
 
 @teacher_router.callback_query(TeacherNav.filter(F.action == "start"))
 async def teacher_search_start(callback: CallbackQuery, state: FSMContext):
@@ -107,14 +118,86 @@ async def teacher_select_dept(callback: CallbackQuery, callback_data: TeacherNav
     await state.set_state(ScheduleState.waiting_for_teacher)
 
 @teacher_router.message(ScheduleState.waiting_for_teacher)
-async def teacher_search_surname(message: Message, state: FSMContext):
+async def teacher_search_surname(message: Message, state: FSMContext, schedule_repo: ScheduleRepository):
     data = await state.get_data()
     dept = data.get("teacher_dept")
     
-    surname = message.text.strip().lower()
+    surname = message.text.strip()
     if len(surname) < 3:
         return await message.answer("⚠️ Введите хотя бы 3 буквы для поиска.")
 
+    # Сначала ищем по индексу известных преподавателей: неоднозначный или
+    # опечатанный запрос разрешается выбором из списка без обхода всех кафедр
+    await ensure_teacher_index(schedule_repo)
+    results = teacher_index.search(surname)
+    strong = [name for name, score in results if score >= TeacherIndex.SUBSTRING]
+
+    if len(strong) == 1:
+        # Индекс знает только преподавателей из PDF групп: ищем по подстроке, чтобы не потерять
+        # тех, кто есть лишь в отчётах кафедр; при нескольких найденных покажем список
+        return await run_teacher_search(message, state, dept, surname, resolved_name=strong[0])
+
+    candidates = strong or [name for name, _ in results]
+    if candidates:
+        # Нужного преподавателя может не быть в индексе: оставляем обход отчётов кафедр по запросу
+        await state.update_data(teacher_candidates=candidates, teacher_query=surname)
+        title = "🔎 Найдено несколько преподавателей" if strong else "🤔 Точных совпадений нет. Возможно, вы имели в виду"
+        return await message.answer(f"{title}:", reply_markup=get_teacher_candidates_kb(candidates, search_all=True))
+
+    await run_teacher_search(message, state, dept, surname)
+
+@teacher_router.callback_query(TeacherNav.filter(F.action == "pick"))
+async def teacher_pick_candidate(callback: CallbackQuery, callback_data: TeacherNav, state: FSMContext):
+    data = await state.get_data()
+    candidates = data.get("teacher_candidates") or []
+    idx = int(callback_data.target)
+    if idx >= len(candidates):
+        return await callback.answer("⚠️ Список устарел, введите фамилию ещё раз.", show_alert=True)
+
+    await callback.answer()
+    await run_teacher_search(callback.message, state, data.get("teacher_dept"), candidates[idx], exact_name=candidates[idx])
+
+@teacher_router.callback_query(TeacherNav.filter(F.action == "crawl"))
+async def teacher_crawl_reports(callback: CallbackQuery, state: FSMContext):
+    data = await state.get_data()
+    query = data.get("teacher_query")
+    if not query:
+        return await callback.answer("⚠️ Список устарел, введите фамилию ещё раз.", show_alert=True)
+
+    await callback.answer()
+    await run_teacher_search(callback.message, state, data.get("teacher_dept"), query)
+
+async def ensure_teacher_index(schedule_repo: ScheduleRepository):
+    """Перестраивает индекс преподавателей из БД не чаще раза в TEACHER_INDEX_TTL."""
+    if teacher_index.built_at and time.monotonic() - teacher_index.built_at < TEACHER_INDEX_TTL:
+        return
+    names = await schedule_repo.get_teacher_names()
+    teacher_index.rebuild(names)
+    logging.info(f"👤 Teacher index rebuilt: {len(teacher_index)} names")
+
+async def run_teacher_search(
+    message: Message, state: FSMContext, dept, query: str, exact_name: str = None, resolved_name: str = None
+):
+    """
+    Обходит отчёты кафедр и показывает расписание преподавателя.
+    С `exact_name` (выбор из списка) ищется конкретный преподаватель (по фамилии и инициалу),
+    иначе — все, чья фамилия содержит `query`, плюс `resolved_name`, найденный по индексу.
+    """
+    surname = query.lower()
+    exact_key = teacher_key(exact_name) if exact_name else None
+    resolved_key = teacher_key(resolved_name) if resolved_name else None
+
+    def is_match(name: str) -> bool:
+        if exact_key:
+            return teacher_key(name) == exact_key
+        if resolved_key and teacher_key(name) == resolved_key:
+            return True
+        return surname in name.lower()
+
+    def matched_teachers(lesson) -> list:
+        # В отчёте кафедры у занятия может быть несколько преподавателей через запятую
+        return [name for name in split_teachers(lesson.teacher) if is_match(name)]
+
     progress = ProgressReporter(message)
     
     try:
@@ -135,48 +218,42 @@ async def teacher_search_surname(message: Message, state: FSMContext):
         
         all_teacher_lessons = []
         
-        async with aiohttp.ClientSession(headers=config.HTTP_HEADERS) as session:
-            async def fetch_and_parse(d_name, url):
-                try:
-                    async with session.get(url, timeout=10) as resp:
-                        if resp.status == 200:
-                            html = await resp.read()
-                            lessons = parse_teacher_html_report(html, d_name)
-                            return [l for l in lessons if surname in (l.teacher or "").lower()]
-                except:
-                    return []
-                return []
-
-            # Process in chunks to avoid overwhelming server or hitting limits
-            chunk_size = 10
-            for i in range(0, len(reports_to_scan), chunk_size):
-                chunk = reports_to_scan[i:i + chunk_size]
-                tasks = [fetch_and_parse(name, url) for name, url in chunk]
-                results = await asyncio.gather(*tasks)
-                for res in results:
-                    all_teacher_lessons.extend(res)
-                
-                p = 0.1 + (i / len(reports_to_scan)) * 0.8
-                await progress.report(f"⏳ Проверено {min(i+chunk_size, len(reports_to_scan))}/{len(reports_to_scan)} кафедр...", p)
+        async def fetch_and_parse(d_name, url):
+            lessons = await fetch_teacher_report(url, d_name)
+            teacher_index.add_names(l.teacher for l in lessons)
+            return [l for l in lessons if matched_teachers(l)]
+
+        # Process in chunks to avoid overwhelming server or hitting limits
+        chunk_size = 10
+        for i in range(0, len(reports_to_scan), chunk_size):
+            chunk = reports_to_scan[i:i + chunk_size]
+            tasks = [fetch_and_parse(name, url) for name, url in chunk]
+            results = await asyncio.gather(*tasks)
+            for res in results:
+                all_teacher_lessons.extend(res)
+            
+            p = 0.1 + (i / len(reports_to_scan)) * 0.8
+            await progress.report(f"⏳ Проверено {min(i+chunk_size, len(reports_to_scan))}/{len(reports_to_scan)} кафедр...", p)
 
         if not all_teacher_lessons:
-            return await message.answer(f"🔍 Преподаватель '{surname}' не найден ни на одной кафедре в текущем расписании.")
+            return await message.answer(f"🔍 Преподаватель '{query}' не найден ни на одной кафедре в текущем расписании.")
         
         # Group results by teacher name
         teachers_found = {}
         for l in all_teacher_lessons:
-            if l.teacher not in teachers_found:
-                teachers_found[l.teacher] = []
-            teachers_found[l.teacher].append(l)
-
-        if len(teachers_found) > 1:
-            text = "🔎 Найдено несколько преподавателей. Уточните поиск:\n\n"
-            for t in sorted(teachers_found.keys()):
-                text += f"• {t}\n"
-            return await message.answer(text)
+            for name in matched_teachers(l):
+                teachers_found.setdefault(name, []).append(l)
+
+        if len(teachers_found) > 1 and not exact_key:
+            candidates = sorted(teachers_found.keys())[:20]
+            await state.update_data(teacher_candidates=candidates)
+            return await message.answer(
+                "🔎 Найдено несколько преподавателей. Выберите нужного:",
+                reply_markup=get_teacher_candidates_kb(candidates)
+            )
         
-        teacher_name = list(teachers_found.keys())[0]
-        teacher_lessons = teachers_found[teacher_name]
+        teacher_name = exact_name if len(teachers_found) > 1 else list(teachers_found.keys())[0]
+        teacher_lessons = all_teacher_lessons
         
         today_iso = date.today().isoformat()
         today_lessons = [l for l in teacher_lessons if l.date == today_iso]
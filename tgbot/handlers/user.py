@@ -5,7 +5,6 @@ from aiogram.types import Message, CallbackQuery
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.exceptions import TelegramBadRequest
-from tgbot.config import config
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.types import InlineKeyboardButton
 from typing import Union
@@ -16,7 +15,7 @@ from tgbot.database.repositories import (
     AnalyticsRepository,
 )
 from tgbot.services.parser.runner import run_pipeline
-from tgbot.services.services import ScheduleService
+from tgbot.services.services import ScheduleService, BotSettingsStore
 from tgbot.services.utils import parse_date
 from tgbot.states.states import RegState, FavState
 from tgbot.keyboards.inline import get_main_menu, get_group_selection_kb, get_schedule_hub_kb
@@ -25,6 +24,9 @@ from tgbot.services.rate_limiter import parser_rate_limiter
 
 user_router = Router()
 
+# /meet ... +N: не больше этого числа дней вперёд
+MEET_MAX_RANGE_DAYS = 60
+
 @user_router.message(Command("meet"))
 async def cmd_meet(
     message: Message, 
@@ -32,16 +34,24 @@ async def cmd_meet(
     service: ScheduleService
 ):
     """
-    Использование: /meet Группа1 Группа2 [Группа3...] [Дата]
+    Использование: /meet Группа1 Группа2 [Группа3...] [Дата] [+N]
     Пример: /meet ИВТб ПИб
     Пример 2: /meet ИВТб ПИб 25.10
+    Пример 3: /meet ИВТб ПИб +14  (окна на 14 дней вперёд)
     """
     args = message.text.split()[1:] # Убираем саму команду /meet
+
+    # +N в конце — поиск окон на N дней, начиная с даты (или сегодня)
+    range_days = None
+    if args and args[-1].startswith("+") and args[-1][1:].isdigit():
+        range_days = min(max(int(args[-1][1:]), 1), MEET_MAX_RANGE_DAYS)
+        args = args[:-1]
     
     if len(args) < 2:
         return await message.answer(
-            "⚠️ Использование: <code>/meet Группа1 Группа2 [Дата]</code>\n"
-            "Пример: <code>/meet ИВТб ПИб</code>"
+            "⚠️ Использование: <code>/meet Группа1 Группа2 [Дата] [+N]</code>\n"
+            "Пример: <code>/meet ИВТб ПИб</code>\n"
+            "Окна на 2 недели: <code>/meet ИВТб ПИб +14</code>"
         )
     
     # Пытаемся понять, является ли последний аргумент датой
@@ -69,8 +79,10 @@ async def cmd_meet(
     if len(valid_groups) < 2:
          return await message.answer("⚠️ Необходимо минимум 2 группы для сравнения.")
 
-    # Вызываем нашу новую функцию
-    result_text = await service.find_common_free_slots(schedule_repo, valid_groups, target_date)
+    if range_days:
+        result_text = await service.find_common_windows(schedule_repo, valid_groups, target_date, range_days)
+    else:
+        result_text = await service.find_common_free_slots(schedule_repo, valid_groups, target_date)
     
     await message.answer(result_text)
 # ================= БАЗОВАЯ ЛОГИКА ГЛАВНОГО МЕНЮ =================
@@ -127,6 +139,7 @@ HELP_TEXT = (
 async def cmd_start(
     message: Message,
     user_repo: UserRepository,
+    settings_store: BotSettingsStore,
     state: FSMContext,
 ):
     user = await user_repo.get_user(message.from_user.id)
@@ -138,7 +151,7 @@ async def cmd_start(
         )
         await user_repo.upsert_user(user)
         
-    bot_settings = await user_repo.get_settings()
+    bot_settings = await settings_store.get()
     await show_main_menu(message, user, bot_settings, state)
 
 # ================= ОБРАБОТЧИК КОМАНДЫ /help =================
@@ -147,10 +160,10 @@ async def cmd_help(message: Message):
     await message.answer(HELP_TEXT)
 
 @user_router.callback_query(F.data == "cmd_help")
-async def callback_cmd_help(callback: CallbackQuery, user_repo: UserRepository):
+async def callback_cmd_help(callback: CallbackQuery, user_repo: UserRepository, settings_store: BotSettingsStore):
     user = await user_repo.get_user(callback.from_user.id)
     try:
-        await callback.message.edit_text(HELP_TEXT, reply_markup=get_main_menu(user, {}))
+        await callback.message.edit_text(HELP_TEXT, reply_markup=get_main_menu(user, await settings_store.get()))
     except TelegramBadRequest as e:
         if "message is not modified" in str(e):
             # Message already shows the help text, just acknowledge the click
@@ -165,10 +178,11 @@ async def callback_cmd_help(callback: CallbackQuery, user_repo: UserRepository):
 async def callback_cmd_start(
     callback: CallbackQuery,
     user_repo: UserRepository,
+    settings_store: BotSettingsStore,
     state: FSMContext,
 ):
     user = await user_repo.get_user(callback.from_user.id)
-    bot_settings = await user_repo.get_settings()
+    bot_settings = await settings_store.get()
     await show_main_menu(callback, user, bot_settings, state)
 
 
@@ -206,7 +220,7 @@ async def process_group_search(
         if tracked_count == 0:
             from tgbot.services.parser.site_to_pdf import sync_groups_list
             sync_msg = await message.answer("🔄 Загрузка списка групп с сайта ВятГУ, пожалуйста, подождите...")
-            sync_ok = await sync_groups_list() # Uses default config.DB_NAME 
+            sync_ok = await sync_groups_list(schedule_repo.db_manager)
             await sync_msg.delete()
             if sync_ok:
                 fast_results = await schedule_repo.search_tracked_groups(message.text.strip())
@@ -244,6 +258,7 @@ async def change_group(
     callback: CallbackQuery,
     callback_data: GroupSelectCb,
     user_repo: UserRepository,
+    settings_store: BotSettingsStore,
     analytics_repo: AnalyticsRepository,
     state: FSMContext,
 ):
@@ -263,7 +278,7 @@ async def change_group(
     await user_repo.upsert_user(user)
     await state.clear()
 
-    bot_settings = await user_repo.get_settings()
+    bot_settings = await settings_store.get()
     await callback.message.edit_text(
         f"✅ Ваша группа успешно установлена: <b>{callback_data.name}</b>",
         reply_markup=get_main_menu(user, bot_settings),
@@ -304,6 +319,7 @@ async def toggle_group_for_parsing(
 async def confirm_multi_parse(
     callback: CallbackQuery,
     user_repo: UserRepository,
+    settings_store: BotSettingsStore,
     schedule_repo: ScheduleRepository,
     state: FSMContext,
 ):
@@ -339,11 +355,8 @@ async def confirm_multi_parse(
     await progress.report(f"⏳ Начинаю загрузку расписания для {num} групп...", 0.0)
     
     try:
-        from tgbot.services.parser.runner import run_pipeline
-        from tgbot.database.repositories import DatabaseManager
-        db_manager = DatabaseManager(config.DB_NAME)
-        # Мы обновим run_pipeline чтобы он принимал список
-        await run_pipeline(db_manager=db_manager, group_keywords=selected_groups, progress=progress)
+        from tgbot.services.parser.runner import run_pipeline_for_groups
+        await run_pipeline_for_groups(schedule_repo.db_manager, selected_groups, progress=progress)
         
         # 4. Если выбрана была только одна группа, установим её как основную
         user = await user_repo.get_user(callback.from_user.id)
@@ -362,7 +375,7 @@ async def confirm_multi_parse(
                 text += "\n\nНе забудьте установить свою основную группу через поиск."
 
         await state.clear()
-        bot_settings = await user_repo.get_settings()
+        bot_settings = await settings_store.get()
         await callback.message.edit_text(text, reply_markup=get_main_menu(user, bot_settings))
 
         parser_rate_limiter.record_usage(callback.from_user.id)
@@ -403,10 +416,8 @@ async def parse_group_ondemand(
     await progress.report(f"⏳ Начинаю загрузку расписания для {group_name}...", 0.0)
     
     try:
-        from tgbot.services.parser.runner import run_pipeline
-        from tgbot.database.repositories import DatabaseManager
-        db_manager = DatabaseManager(config.DB_NAME)
-        await run_pipeline(db_manager=db_manager, group_keywords=[group_name], progress=progress)
+        from tgbot.services.parser.runner import run_pipeline_for_groups
+        await run_pipeline_for_groups(schedule_repo.db_manager, [group_name], progress=progress)
         
         user = await user_repo.get_user(callback.from_user.id)
         if not user:
@@ -1,5 +1,5 @@
 from datetime import date, timedelta
-from typing import List
+from typing import List, Optional
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from tgbot.database.models import User, UserSettings
@@ -176,6 +176,8 @@ def get_user_settings_kb(settings: UserSettings) -> InlineKeyboardMarkup:
         [btn("Показывать преподавателей", "show_teachers")],
         [btn("Показывать аудитории", "show_building")],
         [btn("Показывать окна (своб. время)", "show_windows")],
+        [btn("🔔 Уведомлять об изменениях", "notify_changes")],
+        [btn("☀️ Расписание каждое утро", "daily_digest")],
         [InlineKeyboardButton(text="🔎 Сменить группу", callback_data="search_start")],
         [InlineKeyboardButton(text="« Главное меню", callback_data="cmd_start")]
     ]
@@ -229,13 +231,16 @@ def get_meeting_date_kb() -> InlineKeyboardMarkup:
         InlineKeyboardButton(text="Завтра", callback_data=MeetingCb(action="date", value=tomorrow.isoformat()).pack()),
         InlineKeyboardButton(text="Послезавтра", callback_data=MeetingCb(action="date", value=after_tomorrow.isoformat()).pack())
     )
+    builder.row(InlineKeyboardButton(text="🔎 Окна на 2 недели", callback_data=MeetingCb(action="range", value="14").pack()))
     builder.row(InlineKeyboardButton(text="📅 Ввести дату вручную", callback_data=MeetingCb(action="manual_date").pack()))
     builder.row(InlineKeyboardButton(text="« Назад к списку групп", callback_data=MeetingCb(action="back_to_groups").pack()))
     return builder.as_markup()
 
-def get_back_to_dates_kb() -> InlineKeyboardMarkup:
-    """Клавиатура для возврата из результата обратно в даты"""
+def get_back_to_dates_kb(plan_value: Optional[str] = None) -> InlineKeyboardMarkup:
+    """Клавиатура для возврата из результата обратно в даты; plan_value = "<дата>+<дней>" для подбора аудитории"""
     builder = InlineKeyboardBuilder()
+    if plan_value:
+        builder.row(InlineKeyboardButton(text="🏫 Подобрать аудиторию", callback_data=MeetingCb(action="plan", value=plan_value).pack()))
     builder.row(InlineKeyboardButton(text="« К выбору даты", callback_data=MeetingCb(action="pick_date").pack()))
     builder.row(InlineKeyboardButton(text="« В главное меню", callback_data="cmd_start"))
     return builder.as_markup()
@@ -279,6 +284,8 @@ def get_admin_menu_kb() -> InlineKeyboardMarkup:
         [InlineKeyboardButton(text="🔄 Синхронизировать список групп", callback_data="admin_sync_groups")],
         [InlineKeyboardButton(text="🏢 Обновить занятость", callback_data="admin_sync_occupancy")],
         [InlineKeyboardButton(text="⚙️ Настройки бота", callback_data=AdminCallback(action="sett").pack())],
+        [InlineKeyboardButton(text="📈 Статистика", callback_data=AdminCallback(action="stats").pack())],
+        [InlineKeyboardButton(text="📊 Метрики", callback_data=AdminCallback(action="metrics").pack())],
         [InlineKeyboardButton(text="« Меню", callback_data="cmd_start")]
     ])
 def get_meeting_groups_kb(added_groups: list[str]) -> InlineKeyboardMarkup:
@@ -309,6 +316,7 @@ def get_bot_settings_kb(settings: dict) -> InlineKeyboardMarkup:
         [InlineKeyboardButton(text=f"{status_icon(settings.get('btn_favorites', '1'))} Избранное", callback_data=AdminCallback(action="btn_tog", value="btn_favorites").pack())],
         [InlineKeyboardButton(text=f"{status_icon(settings.get('btn_settings', '1'))} Настройки", callback_data=AdminCallback(action="btn_tog", value="btn_settings").pack())],
         [InlineKeyboardButton(text=f"{status_icon(settings.get('btn_free_rooms', '1'))} Свободные аудитории", callback_data=AdminCallback(action="btn_tog", value="btn_free_rooms").pack())],
+        [InlineKeyboardButton(text=f"{'🛠' if settings.get('maintenance_mode', '0') == '1' else '⚪'} Режим обслуживания", callback_data=AdminCallback(action="btn_tog", value="maintenance_mode").pack())],
         [InlineKeyboardButton(text="« Назад", callback_data="admin_panel")]
     ])
 
@@ -346,3 +354,16 @@ def get_teacher_departments_kb(departments: List[dict], inst_idx: int, fac_idx:
     builder.adjust(1)
     builder.row(InlineKeyboardButton(text="« Назад", callback_data=TeacherNav(action="select_inst", target=str(inst_idx)).pack()))
     return builder.as_markup()
+
+def get_teacher_candidates_kb(names: List[str], search_all: bool = False) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    for idx, name in enumerate(names):
+        builder.button(
+            text=f"👤 {name}",
+            callback_data=TeacherNav(action="pick", target=str(idx)).pack()
+        )
+    if search_all:
+        builder.button(text="🔎 Искать во всех отчётах кафедр", callback_data=TeacherNav(action="crawl").pack())
+    builder.adjust(1)
+    builder.row(InlineKeyboardButton(text="« Назад", callback_data=TeacherNav(action="start").pack()))
+    return builder.as_markup()
@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import date
+from typing import Deque, List, Optional, Tuple
+
+ActionEvent = Tuple[int, str, Optional[str], str]  # (user_id, action, details, timestamp)
+
+
+class AnalyticsWriter:
+    """
+    Фоновая запись аналитики пачками.
+
+    Хендлеры вызывают `enqueue()` (без await и без обращения к БД), фоновая задача
+    сбрасывает события одной транзакцией, когда набирается `batch_size` событий
+    или проходит `flush_interval` секунд. Очередь ограничена `max_queue`:
+    при переполнении вытесняются самые старые события (счётчик `dropped`).
+    """
+
+    def __init__(self, analytics_repo, max_queue: int = 10000, batch_size: int = 200, flush_interval: float = 2.0):
+        self.analytics_repo = analytics_repo
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: Deque[ActionEvent] = deque(maxlen=max_queue)
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.stats = {
+            "enqueued": 0,
+            "dropped": 0,
+            "written": 0,
+            "batches": 0,
+            "failures": 0,
+            "max_queue_depth": 0,
+            "last_flush_ms": 0.0,
+        }
+
+    def enqueue(self, user_id: int, action: str, details: Optional[str] = None):
+        if len(self._queue) == self.max_queue:
+            self.stats["dropped"] += 1
+        self._queue.append((user_id, action, details, date.today().isoformat()))
+        self.stats["enqueued"] += 1
+        self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], len(self._queue))
+        if len(self._queue) >= self.batch_size:
+            self._wakeup.set()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logging.info("📝 Analytics writer started.")
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def _take_batch(self) -> List[ActionEvent]:
+        return [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+
+    async def flush(self):
+        """Сбрасывает всю текущую очередь пачками по batch_size."""
+        while self._queue:
+            batch = self._take_batch()
+            started = time.perf_counter()
+            try:
+                await self.analytics_repo.log_actions_batch(batch)
+            except Exception as e:
+                self.stats["failures"] += 1
+                logging.error(f"❌ Analytics flush failed ({len(batch)} events): {e}")
+                # Возвращаем пачку в начало очереди; лишнее вытеснится по лимиту
+                overflow = max(0, len(self._queue) + len(batch) - self.max_queue)
+                self.stats["dropped"] += overflow
+                self._queue.extendleft(reversed(batch[overflow:]))
+                return
+            self.stats["batches"] += 1
+            self.stats["written"] += len(batch)
+            self.stats["last_flush_ms"] = (time.perf_counter() - started) * 1000
+
+    async def stop(self):
+        """Останавливает фоновую задачу и дописывает всё, что осталось в очереди."""
+        self._stopping = True
+        self._wakeup.set()
+        if self._task:
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        logging.info(f"⏹️ Analytics writer stopped ({self.stats['written']} written, {self.stats['dropped']} dropped).")
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "queue_depth": len(self._queue)}
@@ -0,0 +1,212 @@
+"""
+Движок рассылок: общий token bucket, ограниченная параллельность и журнал
+заданий в БД (продолжение после рестарта).
+
+Сейчас через него отправляют ChangeNotifier (изменения расписания, submit)
+и DailyDigestService (утренняя рассылка, broadcast). CuratorService.broadcast_to_group
+тоже идёт через движок, но обработчика кураторов в боте пока нет.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+
+SENT, FAILED, BLOCKED = "sent", "failed", "blocked"
+
+
+class TokenBucket:
+    """
+    Глобальный лимит отправки (сообщений в секунду) с запасом `capacity` на всплеск.
+    `pause()` — общий стоп после RetryAfter: флуд-лимит Telegram действует на бота целиком.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        # Ожидающие выстраиваются в очередь на блокировке — порядок FIFO
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+
+
+class Broadcaster:
+    """
+    Рассылки с глобальным token bucket, ограниченным числом одновременных запросов,
+    интервалом между сообщениями в один чат и повторами после RetryAfter/сетевых ошибок.
+
+    Каждая рассылка — задание в broadcast_jobs со списком получателей; статусы
+    сохраняются пачками, поэтому прерванная рестартом рассылка продолжается
+    с неотправленных получателей (`resume_unfinished()`).
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        broadcast_repo,
+        rate: float = 25.0,
+        concurrency: int = 8,
+        chat_interval: float = 1.0,
+        max_attempts: int = 5,
+        flush_every: int = 50,
+    ):
+        self.bot = bot
+        self.broadcast_repo = broadcast_repo
+        self.bucket = TokenBucket(rate)
+        self.concurrency = concurrency
+        self.chat_interval = chat_interval
+        self.max_attempts = max_attempts
+        self.flush_every = flush_every
+        self._inflight = asyncio.Semaphore(concurrency)
+        self._chat_next: Dict[int, float] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self.stats = {
+            "jobs": 0,
+            "resumed": 0,
+            "sent": 0,
+            "failed": 0,
+            "blocked": 0,
+            "retry_after": 0,
+            "retries": 0,
+        }
+
+    async def _pace_chat(self, chat_id: int):
+        """Не чаще одного сообщения в chat_interval секунд в один чат (лимит Telegram на чат)."""
+        now = time.monotonic()
+        next_at = self._chat_next.get(chat_id, 0.0)
+        self._chat_next[chat_id] = max(now, next_at) + self.chat_interval
+        if len(self._chat_next) > 50000:
+            self._chat_next = {cid: t for cid, t in self._chat_next.items() if t > now}
+        if next_at > now:
+            await asyncio.sleep(next_at - now)
+
+    async def _send(self, chat_id: int, text: str) -> str:
+        for attempt in range(self.max_attempts):
+            if attempt:
+                self.stats["retries"] += 1
+            await self._pace_chat(chat_id)
+            await self.bucket.acquire()
+            try:
+                async with self._inflight:
+                    await self.bot.send_message(chat_id, text)
+                return SENT
+            except TelegramRetryAfter as e:
+                # Останавливаем всю отправку, а не только этот чат; повтор — на следующей итерации
+                self.stats["retry_after"] += 1
+                logging.warning(f"⏳ Broadcast flood limit: retry after {e.retry_after}s")
+                self.bucket.pause(e.retry_after)
+            except TelegramForbiddenError:
+                return BLOCKED
+            except TelegramBadRequest as e:
+                logging.warning(f"⚠️ Broadcast to {chat_id} rejected: {e}")
+                return FAILED
+            except (TelegramNetworkError, TelegramServerError) as e:
+                logging.warning(f"⚠️ Broadcast to {chat_id} failed (attempt {attempt + 1}): {e}")
+                await asyncio.sleep(min(2 ** attempt, 30))
+            except Exception as e:
+                logging.error(f"❌ Broadcast to {chat_id} failed: {e}")
+                return FAILED
+        return FAILED
+
+    async def _run_job(self, job_id: int, text: str, chat_ids: List[int]) -> dict:
+        started = time.perf_counter()
+        queue: Deque[int] = deque(chat_ids)
+        results: List[tuple] = []
+
+        async def flush():
+            batch = results[:]
+            results.clear()
+            await self.broadcast_repo.save_results(job_id, batch)
+
+        async def worker():
+            while queue:
+                chat_id = queue.popleft()
+                status = await self._send(chat_id, text)
+                self.stats[status] += 1
+                results.append((chat_id, status))
+                if len(results) >= self.flush_every:
+                    await flush()
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(queue)) or 1)))
+        finally:
+            # И при отмене (остановка бота) сохраняем то, что уже отправлено
+            await flush()
+        job = await self.broadcast_repo.finish_job(job_id)
+        report = {
+            "job_id": job_id,
+            "total": job.total,
+            "delivered": job.delivered,
+            "failed": job.failed,
+            "blocked": job.blocked,
+            "duration_s": time.perf_counter() - started,
+        }
+        logging.info(
+            f"📨 Broadcast #{job_id} ({job.kind}): {job.delivered}/{job.total} delivered, "
+            f"{job.failed} failed, {job.blocked} blocked in {report['duration_s']:.1f}s"
+        )
+        return report
+
+    async def broadcast(self, chat_ids: List[int], text: str, kind: str = "manual") -> dict:
+        """Рассылка с ожиданием результата: {job_id, total, delivered, failed, blocked, duration_s}."""
+        chat_ids = list(dict.fromkeys(chat_ids))
+        job_id = await self.broadcast_repo.create_job(kind, text, chat_ids)
+        self.stats["jobs"] += 1
+        return await self._run_job(job_id, text, chat_ids)
+
+    def submit(self, chat_ids: List[int], text: str, kind: str = "manual") -> asyncio.Task:
+        """Рассылка в фоне (не блокирует хендлер/парсер)."""
+        return self._track(asyncio.create_task(self.broadcast(chat_ids, text, kind)))
+
+    def _track(self, task: asyncio.Task) -> asyncio.Task:
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def resume_unfinished(self) -> int:
+        """Продолжает рассылки, прерванные рестартом. Возвращает число заданий."""
+        jobs = await self.broadcast_repo.get_unfinished_jobs()
+        for job in jobs:
+            pending = await self.broadcast_repo.get_pending_recipients(job.id)
+            logging.info(f"🔁 Resuming broadcast #{job.id} ({job.kind}): {len(pending)}/{job.total} left")
+            self.stats["resumed"] += 1
+            self._track(asyncio.create_task(self._run_job(job.id, job.text, pending)))
+        return len(jobs)
+
+    async def stop(self):
+        """Останавливает фоновые рассылки; неотправленные получатели останутся pending до рестарта."""
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "active_jobs": len(self._tasks)}
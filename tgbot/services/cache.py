@@ -0,0 +1,249 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional
+
+
+class RefreshingCache:
+    """
+    Кэш одного значения, получаемого медленной корутиной (например, скрапингом сайта).
+
+    - `ttl` — сколько секунд значение считается свежим;
+    - после истечения TTL устаревшее значение отдаётся сразу, а обновление
+      запускается в фоне (stale-while-revalidate);
+    - пустой результат/ошибка кэшируются как негативный с экспоненциальным backoff,
+      чтобы не повторять медленный запрос на каждый клик;
+    - при наличии `persist_path` значение сохраняется на диск и поднимается при рестарте.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: float = 6 * 60 * 60,
+        persist_path: Optional[Path] = None,
+        negative_ttl: float = 30,
+        max_negative_ttl: float = 15 * 60,
+        name: str = "cache",
+    ):
+        self.loader = loader
+        self.ttl = ttl
+        self.persist_path = Path(persist_path) if persist_path else None
+        self.negative_ttl = negative_ttl
+        self.max_negative_ttl = max_negative_ttl
+        self.name = name
+
+        self._value: Any = None
+        self._loaded_at: float = 0.0
+        self._failures = 0
+        self._retry_at: float = 0.0
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._restored = False
+        self.stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "negative_hits": 0,
+            "refreshes": 0,
+            "failures": 0,
+        }
+
+    @staticmethod
+    def _is_empty(value: Any) -> bool:
+        return value is None or value == [] or value == {}
+
+    def _restore(self):
+        """Поднимает значение с диска (один раз за жизнь процесса)."""
+        self._restored = True
+        if not self.persist_path or not self.persist_path.exists():
+            return
+        try:
+            data = json.loads(self.persist_path.read_text(encoding="utf-8"))
+            if not self._is_empty(data.get("value")):
+                self._value = data["value"]
+                # Время загрузки переводим из wall-clock в monotonic, чтобы TTL считался корректно
+                age = max(0.0, time.time() - data.get("saved_at", 0))
+                self._loaded_at = time.monotonic() - age
+                logging.info(f"💾 {self.name}: restored from {self.persist_path} (age {age:.0f}s)")
+        except (OSError, ValueError, TypeError) as e:
+            logging.warning(f"⚠️ {self.name}: failed to restore cache from disk: {e}")
+
+    def _persist(self):
+        if not self.persist_path:
+            return
+        try:
+            self.persist_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.persist_path.with_suffix(self.persist_path.suffix + ".tmp")
+            tmp_path.write_text(
+                json.dumps({"saved_at": time.time(), "value": self._value}, ensure_ascii=False),
+                encoding="utf-8",
+            )
+            tmp_path.replace(self.persist_path)
+        except (OSError, TypeError) as e:
+            logging.warning(f"⚠️ {self.name}: failed to persist cache: {e}")
+
+    async def _load(self) -> Any:
+        """Выполняет загрузку и обновляет состояние кэша. Вызывается под self._lock."""
+        self.stats["refreshes"] += 1
+        try:
+            value = await self.loader()
+        except Exception as e:
+            logging.error(f"❌ {self.name}: loader failed: {e}")
+            value = None
+
+        now = time.monotonic()
+        if self._is_empty(value):
+            self.stats["failures"] += 1
+            self._failures += 1
+            backoff = min(self.negative_ttl * (2 ** (self._failures - 1)), self.max_negative_ttl)
+            self._retry_at = now + backoff
+            logging.warning(f"⚠️ {self.name}: empty result, next retry in {backoff:.0f}s")
+            return self._value
+
+        self._value = value
+        self._loaded_at = now
+        self._failures = 0
+        self._retry_at = 0.0
+        await asyncio.to_thread(self._persist)
+        return value
+
+    async def _background_refresh(self):
+        async with self._lock:
+            await self._load()
+
+    def _schedule_refresh(self):
+        if self._refresh_task and not self._refresh_task.done():
+            return
+        self._refresh_task = asyncio.create_task(self._background_refresh())
+
+    async def get(self) -> Any:
+        if not self._restored:
+            self._restore()
+
+        now = time.monotonic()
+        has_value = not self._is_empty(self._value)
+
+        if has_value and now - self._loaded_at < self.ttl:
+            self.stats["hits"] += 1
+            return self._value
+
+        if now < self._retry_at:
+            # Негативный кэш: недавно не удалось загрузить, не долбим сайт
+            self.stats["negative_hits"] += 1
+            return self._value if has_value else []
+
+        if has_value:
+            # Устаревшее значение отдаём сразу, обновляем в фоне
+            self.stats["stale_hits"] += 1
+            self._schedule_refresh()
+            return self._value
+
+        self.stats["misses"] += 1
+        async with self._lock:
+            # Пока ждали блокировку, другой вызов мог уже загрузить значение
+            if not self._is_empty(self._value) or time.monotonic() < self._retry_at:
+                return self._value if not self._is_empty(self._value) else []
+            value = await self._load()
+        return value if not self._is_empty(value) else []
+
+    def invalidate(self):
+        """Помечает значение устаревшим: следующий вызов get() запустит обновление."""
+        self._loaded_at = 0.0
+        self._retry_at = 0.0
+        self._failures = 0
+
+    def get_stats(self) -> dict:
+        total = self.stats["hits"] + self.stats["stale_hits"] + self.stats["misses"] + self.stats["negative_hits"]
+        served = self.stats["hits"] + self.stats["stale_hits"]
+        return {
+            **self.stats,
+            "hit_ratio": served / total if total else 0.0,
+            "age_seconds": time.monotonic() - self._loaded_at if self._loaded_at else None,
+        }
+
+
+class LRUCache:
+    """
+    Ограниченный по размеру LRU-кэш с TTL для горячих сущностей (пользователи и т.п.).
+
+    Хранит значения как есть, поэтому класть стоит неизменяемые данные
+    (например, model_dump()), а объекты собирать заново при чтении.
+    `None` — допустимое значение (негативный кэш), отсутствие ключа отличается
+    через `MISSING`.
+    """
+
+    MISSING = object()
+
+    def __init__(self, maxsize: int = 5000, ttl: float = 300, name: str = "lru"):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self._data: "OrderedDict[Any, tuple]" = OrderedDict()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "evictions": 0,
+            "invalidations": 0,
+            "loads": 0,
+            "load_ms_total": 0.0,
+            "load_ms_max": 0.0,
+        }
+
+    def get(self, key: Any, default: Any = MISSING) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return default
+        stored_at, value = entry
+        if time.monotonic() - stored_at >= self.ttl:
+            del self._data[key]
+            self.stats["expired"] += 1
+            self.stats["misses"] += 1
+            return default
+        self._data.move_to_end(key)
+        self.stats["hits"] += 1
+        return value
+
+    def set(self, key: Any, value: Any):
+        self._data[key] = (time.monotonic(), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def add(self, key: Any, value: Any):
+        """Кладёт значение, только если ключа ещё нет (не затирает более свежую запись)."""
+        if key not in self._data:
+            self.set(key, value)
+
+    def invalidate(self, key: Any):
+        if self._data.pop(key, None) is not None:
+            self.stats["invalidations"] += 1
+
+    def clear(self):
+        self.stats["invalidations"] += len(self._data)
+        self._data.clear()
+
+    def record_load(self, elapsed_ms: float):
+        """Учитывает время загрузки значения из источника при промахе."""
+        self.stats["loads"] += 1
+        self.stats["load_ms_total"] += elapsed_ms
+        self.stats["load_ms_max"] = max(self.stats["load_ms_max"], elapsed_ms)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get_stats(self) -> dict:
+        total = self.stats["hits"] + self.stats["misses"]
+        loads = self.stats["loads"]
+        return {
+            **self.stats,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hit_ratio": self.stats["hits"] / total if total else 0.0,
+            "load_ms_avg": self.stats["load_ms_total"] / loads if loads else 0.0,
+        }
@@ -0,0 +1,95 @@
+"""
+Утренняя рассылка расписания на день (по подписке `daily_digest` в настройках).
+
+Подписчики группируются по (группа, настройки отображения): каждый вариант
+рендерится один раз через ScheduleService.render_day — заодно прогревается
+render_cache для тех, кто утром откроет бота сам — и уходит одной рассылкой
+Broadcaster. Работа рендера — группы × варианты настроек, а не пользователи.
+"""
+import asyncio
+import logging
+import time
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from tgbot.database.models import UserSettings
+from tgbot.database.repositories import BroadcastRepository, ScheduleRepository, UserRepository
+from tgbot.services.broadcaster import Broadcaster
+from tgbot.services.render_cache import settings_key
+from tgbot.services.services import ScheduleService
+
+DIGEST_KIND = "digest"
+
+
+class DailyDigestService:
+    def __init__(
+        self,
+        user_repo: UserRepository,
+        schedule_repo: ScheduleRepository,
+        schedule_service: ScheduleService,
+        broadcaster: Broadcaster,
+    ):
+        self.user_repo = user_repo
+        self.schedule_repo = schedule_repo
+        self.schedule_service = schedule_service
+        self.broadcaster = broadcaster
+        self.broadcast_repo = BroadcastRepository(user_repo.db_manager)
+        self.last_report: Optional[dict] = None
+        self.stats = {"runs": 0, "skipped": 0, "sent": 0, "failed": 0, "blocked": 0}
+
+    async def already_sent_today(self) -> bool:
+        """Сегодня рассылка уже была (повторный запуск парсинга вручную или после рестарта)."""
+        since = datetime.combine(date.today(), datetime.min.time())
+        return await self.broadcast_repo.count_jobs_since(DIGEST_KIND, since) > 0
+
+    async def run(self, target_date: Optional[date] = None, force: bool = False) -> Optional[dict]:
+        """Рендерит и рассылает расписание на target_date (по умолчанию сегодня). Возвращает отчёт."""
+        target_date = target_date or date.today()
+        if target_date.weekday() == 6 or (not force and await self.already_sent_today()):
+            self.stats["skipped"] += 1
+            return None
+        self.stats["runs"] += 1
+        started = time.perf_counter()
+
+        variants: Dict[Tuple, Tuple[str, UserSettings, List[int]]] = {}
+        subscribers = await self.user_repo.get_setting_subscribers("daily_digest")
+        for telegram_id, group_name, settings in subscribers:
+            key = (group_name, settings_key(settings))
+            if key not in variants:
+                variants[key] = (group_name, settings, [])
+            variants[key][2].append(telegram_id)
+
+        texts = []
+        for group_name, settings, chat_ids in variants.values():
+            text = await self.schedule_service.render_day(self.schedule_repo, group_name, target_date, settings)
+            texts.append((f"☀️ <b>Доброе утро!</b>\n\n{text}", chat_ids))
+        render_ms = (time.perf_counter() - started) * 1000
+
+        # Все варианты ставятся сразу: темп задаёт общий token bucket Broadcaster
+        results = await asyncio.gather(
+            *(self.broadcaster.broadcast(chat_ids, text, kind=DIGEST_KIND) for text, chat_ids in texts)
+        )
+        report = {
+            "date": target_date.isoformat(),
+            "subscribers": len(subscribers),
+            "groups": len({group_name for group_name, _ in variants}),
+            "variants": len(variants),
+            "render_ms": render_ms,
+            "delivered": sum(r["delivered"] for r in results),
+            "failed": sum(r["failed"] for r in results),
+            "blocked": sum(r["blocked"] for r in results),
+            "duration_s": time.perf_counter() - started,
+        }
+        self.stats["sent"] += report["delivered"]
+        self.stats["failed"] += report["failed"]
+        self.stats["blocked"] += report["blocked"]
+        self.last_report = report
+        logging.info(
+            f"☀️ Daily digest {report['date']}: {report['subscribers']} subscribers, {report['groups']} groups, "
+            f"{report['variants']} variants rendered in {render_ms:.0f} ms; delivered {report['delivered']}, "
+            f"failed {report['failed']}, blocked {report['blocked']} in {report['duration_s']:.1f}s"
+        )
+        return report
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "last_report": self.last_report}
@@ -0,0 +1,167 @@
+"""
+Поиск общих свободных окон для нескольких групп на период.
+
+Занятость собирается одним запросом за весь период в булеву матрицу
+группы × дни × пары; общие свободные пары — `~busy.any(axis=0)`, непрерывные
+блоки ищутся по разностям строк матрицы. Дни после последней известной даты
+расписания группы (ещё не опубликовано) и воскресенья окнами не считаются.
+
+Планировщик встреч накладывает на общие окна матрицу занятости аудиторий
+(аудитории × дни × пары) и тем же поиском блоков получает все тройки
+(день, пары, аудитория) за один проход.
+"""
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+PAIRS_PER_DAY = 7
+# Эталонное время пар ВятГУ
+PAIR_TIMES = {
+    1: ("08:20", "09:50"),
+    2: ("10:00", "11:30"),
+    3: ("11:45", "13:15"),
+    4: ("14:00", "15:30"),
+    5: ("15:45", "17:15"),
+    6: ("17:20", "18:50"),
+    7: ("18:55", "20:25"),
+}
+
+Window = Tuple[date, int, int]  # (день, первая пара, число пар подряд)
+RoomCandidate = Tuple[date, int, int, str, str]  # (день, первая пара, число пар, корпус, аудитория)
+
+
+def build_busy_matrix(
+    groups: List[str], days: List[date], busy: Iterable[tuple]
+) -> np.ndarray:
+    """busy: строки (group_name, date ISO, pair_number, ...) -> bool[группы, дни, пары]."""
+    group_idx = {g: i for i, g in enumerate(groups)}
+    day_idx = {d.isoformat(): i for i, d in enumerate(days)}
+    matrix = np.zeros((len(groups), len(days), PAIRS_PER_DAY), dtype=bool)
+    rows = [
+        (group_idx[g], day_idx[d], p - 1)
+        for g, d, p, *_ in busy
+        if g in group_idx and d in day_idx and p and 1 <= p <= PAIRS_PER_DAY
+    ]
+    if rows:
+        g_i, d_i, p_i = np.array(rows).T
+        matrix[g_i, d_i, p_i] = True
+    return matrix
+
+
+def known_days_mask(groups: List[str], days: List[date], last_dates: Dict[str, str]) -> np.ndarray:
+    """bool[дни]: расписание известно для всех групп и день не воскресенье."""
+    day_iso = np.array([d.isoformat() for d in days])
+    last = np.array([last_dates.get(g) or "" for g in groups])
+    known = (day_iso[None, :] <= last[:, None]).all(axis=0)
+    not_sunday = np.array([d.weekday() != 6 for d in days], dtype=bool)
+    return known & not_sunday
+
+
+def common_free(busy: np.ndarray, valid_days: np.ndarray) -> np.ndarray:
+    """bool[дни, пары]: пара свободна у всех групп в известный день."""
+    return ~busy.any(axis=0) & valid_days[:, None]
+
+
+def _blocks(free: np.ndarray, min_pairs: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Непрерывные блоки True по последней оси: (индексы строк, первая пара с 0, длина)."""
+    rows = free.reshape(-1, PAIRS_PER_DAY)
+    padded = np.zeros((rows.shape[0], PAIRS_PER_DAY + 2), dtype=np.int8)
+    padded[:, 1:-1] = rows
+    edges = np.diff(padded, axis=1)
+    # argwhere идёт по строкам, поэтому начала и концы блоков одной строки совпадают по порядку
+    starts = np.argwhere(edges == 1)
+    ends = np.argwhere(edges == -1)
+    lengths = ends[:, 1] - starts[:, 1]
+    keep = lengths >= min_pairs
+    return starts[keep, 0], starts[keep, 1], lengths[keep]
+
+
+def find_windows(busy: np.ndarray, days: List[date], valid_days: np.ndarray, min_pairs: int = 1) -> List[Window]:
+    """Все непрерывные блоки общих свободных пар (длиной >= min_pairs) в днях valid_days."""
+    day_idx, first, length = _blocks(common_free(busy, valid_days), min_pairs)
+    return [(days[d], int(f) + 1, int(n)) for d, f, n in zip(day_idx, first, length)]
+
+
+def earliest_windows(windows: List[Window], limit: int = 5) -> List[Window]:
+    return sorted(windows, key=lambda w: (w[0], w[1]))[:limit]
+
+
+def best_windows(windows: List[Window], limit: int = 5) -> List[Window]:
+    """Самые длинные блоки, при равной длине — более ранние."""
+    return sorted(windows, key=lambda w: (-w[2], w[0], w[1]))[:limit]
+
+
+def build_room_matrix(
+    rooms: List[Tuple[str, str]], days: List[date], occupied: Iterable[Tuple[str, int, str, str]]
+) -> np.ndarray:
+    """occupied: строки (date ISO, pair_number, building, room) занятых аудиторий -> bool[аудитории, дни, пары]."""
+    room_idx = {room: i for i, room in enumerate(rooms)}
+    day_idx = {d.isoformat(): i for i, d in enumerate(days)}
+    matrix = np.zeros((len(rooms), len(days), PAIRS_PER_DAY), dtype=bool)
+    rows = [
+        (room_idx[(b, r)], day_idx[d], p - 1)
+        for d, p, b, r in occupied
+        if (b, r) in room_idx and d in day_idx and p and 1 <= p <= PAIRS_PER_DAY
+    ]
+    if rows:
+        r_i, d_i, p_i = np.array(rows).T
+        matrix[r_i, d_i, p_i] = True
+    return matrix
+
+
+def covered_days_mask(days: List[date], covered: Iterable[str]) -> np.ndarray:
+    """bool[дни]: по дню есть отчёт о занятости аудиторий."""
+    covered = set(covered)
+    return np.array([d.isoformat() in covered for d in days], dtype=bool)
+
+
+def find_room_candidates(
+    group_free: np.ndarray,
+    room_busy: np.ndarray,
+    covered_days: np.ndarray,
+    days: List[date],
+    rooms: List[Tuple[str, str]],
+    min_pairs: int = 1,
+) -> List[RoomCandidate]:
+    """
+    Блоки пар, в которые свободны и все группы (group_free[дни, пары]), и аудитория.
+    covered_days — дни, по которым есть отчёт о занятости (иначе свободу аудитории не знаем).
+    """
+    free = group_free[None, :, :] & covered_days[None, :, None] & ~room_busy   # [аудитории, дни, пары]
+    row_idx, first, length = _blocks(free, min_pairs)
+    room_i, day_i = np.divmod(row_idx, len(days))
+    return [
+        (days[d], int(f) + 1, int(n), rooms[r][0], rooms[r][1])
+        for r, d, f, n in zip(room_i, day_i, first, length)
+    ]
+
+
+def rank_room_candidates(
+    candidates: List[RoomCandidate],
+    day_buildings: Dict[Tuple[str, str], int],
+    buildings: Dict[str, int],
+    per_day: int = 3,
+    limit: int = 8,
+) -> List[RoomCandidate]:
+    """
+    Сначала ранние дни; внутри дня — корпуса, где у групп в этот день есть пары
+    (day_buildings[(date ISO, корпус)] — число занятий), затем корпуса, где группы
+    учатся вообще, затем длинные блоки. Не больше per_day вариантов на день.
+    """
+    ranked = sorted(candidates, key=lambda c: (
+        c[0], -day_buildings.get((c[0].isoformat(), c[3]), 0), -buildings.get(c[3], 0), -c[2], c[1], c[4]
+    ))
+    result, per_key = [], {}
+    for candidate in ranked:
+        if per_key.get(candidate[0], 0) >= per_day:
+            continue
+        per_key[candidate[0]] = per_key.get(candidate[0], 0) + 1
+        result.append(candidate)
+        if len(result) >= limit:
+            break
+    return result
+
+
+def date_range(start: date, days: int) -> List[date]:
+    return [start + timedelta(days=i) for i in range(days)]
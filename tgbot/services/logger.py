@@ -1,5 +1,8 @@
 import logging
 import sys
+from pathlib import Path
+
+from tgbot.config import config
 
 def setup_logging():
     logging.basicConfig(
@@ -11,3 +14,9 @@ def setup_logging():
     # Optional: set levels for other loggers
     logging.getLogger('aiogram').setLevel(logging.INFO)
     logging.getLogger('aiosqlite').setLevel(logging.WARNING)
+    
+    # Медленные SQL-запросы с планами — отдельным файлом (см. tgbot/database/query_stats.py)
+    Path(config.LOG_DIR).mkdir(parents=True, exist_ok=True)
+    slow_handler = logging.FileHandler(Path(config.LOG_DIR) / "slow_queries.log", encoding="utf-8")
+    slow_handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
+    logging.getLogger('tgbot.slow_query').addHandler(slow_handler)
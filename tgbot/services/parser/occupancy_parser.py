@@ -1,4 +1,3 @@
-import asyncio
 import logging
 import re
 from datetime import date, datetime, timedelta
@@ -9,11 +8,11 @@ from typing import List
 
 import aiohttp
 from bs4 import BeautifulSoup
-from sqlalchemy import select, create_engine
-from sqlalchemy.orm import Session
+from sqlalchemy import select, delete
 
 from tgbot.config import config
 from tgbot.database.models import Occupancy, ProcessedFile
+from tgbot.database.repositories import DatabaseManager, db_manager_or_default
 from tgbot.services.parser.site_to_pdf import check_website_status
 
 # Constants (centralized in config)
@@ -145,54 +144,54 @@ def parse_html_table(html: bytes, building: str) -> List[Occupancy]:
         return []
 
 
-def _sync_process_report(engine, building: str, report_url: str, new_hash: str, occupancy_data: List[Occupancy]):
-    """Saves occupancy data to DB if the file hash changed."""
+def _sync_process_report(session, building: str, report_url: str, new_hash: str, occupancy_data: List[Occupancy]):
+    """Saves occupancy data to DB if the file hash changed (runs on the DB writer thread)."""
     filename = Path(report_url).name
-    with Session(engine) as session:
-        stmt = select(ProcessedFile).where(ProcessedFile.filename == filename)
-        db_file = session.execute(stmt).scalar_one_or_none()
-        
-        if db_file and db_file.file_hash == new_hash:
-            logging.debug(f"  Skipping {filename} (unchanged)")
-            return False  # No change
-        
-        # Delete old occupancy records for this building/period and insert fresh ones
-        # We determine the date range from the occupancy data
-        if occupancy_data:
-            dates_in_data = {o.date for o in occupancy_data}
-            if dates_in_data:
-                from sqlalchemy import delete
-                min_date = min(dates_in_data).isoformat()
-                max_date = max(dates_in_data).isoformat()
-                session.execute(
-                    delete(Occupancy).where(
-                        Occupancy.building == building,
-                        Occupancy.date >= min_date,
-                        Occupancy.date <= max_date
-                    )
+    stmt = select(ProcessedFile).where(ProcessedFile.filename == filename)
+    db_file = session.execute(stmt).scalar_one_or_none()
+    
+    if db_file and db_file.file_hash == new_hash:
+        logging.debug(f"  Skipping {filename} (unchanged)")
+        return False  # No change
+    
+    # Delete old occupancy records for this building/period and insert fresh ones
+    # We determine the date range from the occupancy data
+    if occupancy_data:
+        dates_in_data = {o.date for o in occupancy_data}
+        if dates_in_data:
+            min_date = min(dates_in_data).isoformat()
+            max_date = max(dates_in_data).isoformat()
+            session.execute(
+                delete(Occupancy).where(
+                    Occupancy.building == building,
+                    Occupancy.date >= min_date,
+                    Occupancy.date <= max_date
                 )
-            session.add_all(occupancy_data)
-        
-        if db_file:
-            db_file.file_hash = new_hash
-        else:
-            session.add(ProcessedFile(filename=filename, file_hash=new_hash, file_type='occupancy'))
-        
-        session.commit()
-        return True
+            )
+        session.add_all(occupancy_data)
+    
+    if db_file:
+        db_file.file_hash = new_hash
+    else:
+        session.add(ProcessedFile(filename=filename, file_hash=new_hash, file_type='occupancy'))
+    
+    session.commit()
+    return True
 
 
-async def update_occupancy(engine=None, progress=None):
+async def update_occupancy(db_manager: DatabaseManager = None, progress=None):
     """
     Fetches the occupancy index page, finds all report links grouped by building,
     downloads the most recent report for each building, and stores parsed data in DB.
     """
+    async with db_manager_or_default(db_manager) as manager:
+        await _update_occupancy(manager, progress)
+
+
+async def _update_occupancy(db_manager: DatabaseManager, progress=None):
     logging.info("🏢 Updating room occupancy data...")
     if progress: await progress.report("🏢 Начало обновления занятости аудиторий...", 0.0)
     
-    if engine is None:
-        engine = create_engine(f"sqlite:///{config.DB_NAME}")
-    
     # Check website availability first
     is_available, status_code, error_msg = await check_website_status(INDEX_URL)
     if not is_available:
@@ -288,8 +287,8 @@ async def update_occupancy(engine=None, progress=None):
                     new_hash = calculate_hash(content)
                     occupancy_data = parse_html_table(content, building_num)
                     
-                    updated = await asyncio.to_thread(
-                        _sync_process_report, engine, building_num, report_url, new_hash, occupancy_data
+                    updated = await db_manager.write(
+                        _sync_process_report, building_num, report_url, new_hash, occupancy_data
                     )
                     if updated:
                         logging.info(f"  ✅ Building {building_num}: updated {len(occupancy_data)} records from {Path(report_url).name}")
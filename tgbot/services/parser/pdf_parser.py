@@ -2,17 +2,22 @@ import asyncio
 import logging
 from datetime import datetime, date, timedelta
 import re
+from collections import defaultdict
 from typing import List, Tuple
 from pathlib import Path
 
 import pdfplumber
 import fitz  # PyMuPDF
-from sqlalchemy import create_engine
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, func, insert, select
 
 from tgbot.config import config
 from tgbot.database.models import Lesson
+from tgbot.database.repositories import DatabaseManager, db_manager_or_default
+from tgbot.database.data_versions import lesson_versions
+from tgbot.database.group_index import lesson_groups_index
+from tgbot.database.templates import update_templates
 from tgbot.services.parser.utils import parse_lesson_details
+from tgbot.services.schedule_changes import LESSON_FIELDS, Changes, diff_day, lesson_row, merge_changes
 
 def process_pdf_sync(file_path, group_name):
     """
@@ -158,20 +163,90 @@ def process_pdf_sync(file_path, group_name):
         return []
     return data_list
 
-def _sync_save_lessons(engine, lessons):
-    with Session(engine) as session:
-        session.add_all(lessons)
-        session.commit()
+def _sync_save_lessons(session, lessons, dates=None):
+    """
+    Заменяет занятия групп по датам файла и возвращает изменения {группа: {дата: (было, стало)}}.
+    Перезаписываются только дни, где состав занятий изменился; чтение — по индексу (group_name, date).
+    Даты из `dates` без занятий в файле очищаются (все пары дня отменены).
+    """
+    incoming = defaultdict(lambda: defaultdict(list))
+    for lesson in lessons:
+        incoming[lesson.group_name][lesson.date].append(lesson)
+    changes, changed_lessons, rewritten_days = {}, [], []
+    for group_name, by_date in incoming.items():
+        days = sorted(set(by_date) | set(dates or ()))
+        last_known = session.execute(
+            select(func.max(Lesson.date)).where(Lesson.group_name == group_name)
+        ).scalar()
+        stored = defaultdict(list)
+        for row in session.execute(
+            select(*(getattr(Lesson, field) for field in LESSON_FIELDS), Lesson.date)
+            .where(Lesson.group_name == group_name, Lesson.date.in_(days))
+        ):
+            stored[row[-1]].append(tuple(row[:-1]))
+
+        changed_days = []
+        for day in days:
+            change = diff_day(stored.get(day, ()), map(lesson_row, by_date.get(day, ())))
+            if change is None:
+                continue
+            changed_days.append(day)
+            changed_lessons.extend(by_date.get(day, ()))
+            # Первая публикация дня (новая неделя) — не изменение
+            if day in stored or (last_known and day <= last_known):
+                changes.setdefault(group_name, {})[day] = change
+        if changed_days:
+            session.execute(delete(Lesson).where(Lesson.group_name == group_name, Lesson.date.in_(changed_days)))
+            rewritten_days.extend((group_name, day) for day in changed_days)
+
+    if changed_lessons:
+        # Core-вставка одним executemany: ORM-объекты после записи не нужны
+        session.execute(insert(Lesson), [lesson.model_dump(exclude={"id"}) for lesson in changed_lessons])
+    if rewritten_days:
+        # Шаблоны прогноза группы обновляем в той же транзакции, включая очищенные дни
+        update_templates(session, changed_lessons, rewritten_days)
+    session.commit()
+    return changes, {lesson.group_name for lesson in changed_lessons} | set(changes)
+
+def file_dates(file_path: str, lessons: List[Lesson]) -> List[str]:
+    """Даты, которые покрывает файл: от даты начала из имени до последнего дня с занятиями."""
+    match = re.search(r'_(?:\d+)_(\d{8})_\d{8}\.pdf', Path(file_path).name)
+    if not match or not lessons:
+        return []
+    try:
+        day = datetime.strptime(match.group(1), "%d%m%Y").date()
+    except ValueError:
+        return []
+    last = max(date.fromisoformat(lesson.date) for lesson in lessons)
+    dates = []
+    while day <= last and len(dates) < 31:
+        dates.append(day.isoformat())
+        day += timedelta(days=1)
+    return dates
 
-async def save_lessons_to_db(lessons: List[Lesson], engine=None):
-    if not lessons: return
-    if engine is None: engine = create_engine(f"sqlite:///{config.DB_NAME}")
-    await asyncio.to_thread(_sync_save_lessons, engine, lessons)
-    logging.info(f"✅ Saved {len(lessons)} lessons")
+async def save_lessons_to_db(lessons: List[Lesson], db_manager: DatabaseManager = None, dates: List[str] = None) -> Changes:
+    """Сохраняет занятия (с заменой по датам) и возвращает изменения расписания по группам."""
+    if not lessons: return {}
+    group_names = {lesson.group_name for lesson in lessons}
+    # Запись идёт через единственный поток-писатель, а не параллельно чтениям бота
+    async with db_manager_or_default(db_manager) as manager:
+        changes, changed_groups = await manager.write(_sync_save_lessons, lessons, dates)
+    # Готовые сообщения расписания этих групп устарели (если занятия действительно поменялись)
+    lesson_versions.bump(changed_groups)
+    # Новая группа в lesson — индекс поиска групп нужно перестроить
+    if any(name not in lesson_groups_index for name in group_names):
+        lesson_groups_index.invalidate()
+    logging.info(
+        f"✅ Saved {len(lessons)} lessons: {len(changed_groups)} groups updated, "
+        f"{sum(len(days) for days in changes.values())} days changed"
+    )
+    return changes
 
-async def parse_schedule_files(files: List[Tuple[str, str]], progress=None):
-    engine = create_engine(f"sqlite:///{config.DB_NAME}")
-    for i, (f, g) in enumerate(files):
-        if progress: await progress.report(f"📄 Parsing {g}...", i/len(files))
-        lessons = await asyncio.to_thread(process_pdf_sync, f, g)
-        if lessons: await save_lessons_to_db(lessons, engine)
\ No newline at end of file
+async def parse_schedule_files(files: List[Tuple[str, str]], progress=None, db_manager: DatabaseManager = None) -> Changes:
+    changes: Changes = {}
+    async with db_manager_or_default(db_manager) as manager:
+        for i, (f, g) in enumerate(files):
+            if progress: await progress.report(f"📄 Parsing {g}...", i/len(files))
+            lessons = await asyncio.to_thread(process_pdf_sync, f, g)
+            if lessons: merge_changes(changes, await save_lessons_to_db(lessons, manager, file_dates(f, lessons)))
+    return changes
\ No newline at end of file
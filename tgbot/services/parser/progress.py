@@ -1,7 +1,7 @@
 import asyncio
 import time
 from aiogram.types import Message, CallbackQuery
-from typing import Union, Optional
+from typing import List, Optional, Tuple, Union
 
 class ProgressReporter:
     # Docker-style Unicode spinner
@@ -74,3 +74,27 @@ class ProgressReporter:
 
     def log(self, text: str):
         print(f"[Progress] {text}")
+
+
+class ProgressFanout:
+    """
+    Прогресс общего вычисления (single-flight) для всех, кто его ждёт.
+    Подключившийся позже сразу получает последнее состояние.
+    """
+
+    def __init__(self):
+        self.reporters: List[ProgressReporter] = []
+        self.last: Optional[Tuple[str, Optional[float]]] = None
+
+    async def add(self, reporter):
+        self.reporters.append(reporter)
+        if self.last:
+            await reporter.report(*self.last)
+
+    def discard(self, reporter):
+        if reporter in self.reporters:
+            self.reporters.remove(reporter)
+
+    async def report(self, text: str, progress: Optional[float] = None):
+        self.last = (text, progress)
+        await asyncio.gather(*(r.report(text, progress) for r in list(self.reporters)))
@@ -4,13 +4,14 @@ import os
 import time
 from datetime import datetime, timedelta
 from pathlib import Path
+from typing import Dict, Tuple
 
-from tgbot.config import config
-from tgbot.database.repositories import DatabaseManager, UserRepository
+from tgbot.database.repositories import DatabaseManager, UserRepository, db_manager_or_default
 from tgbot.services.parser.site_to_pdf import main_downloader
 from tgbot.services.parser.pdf_parser import parse_schedule_files
 from tgbot.services.parser.occupancy_parser import update_occupancy
-from tgbot.services.parser.progress import ProgressReporter
+from tgbot.services.parser.progress import ProgressFanout, ProgressReporter
+from tgbot.services.single_flight import SingleFlight
 
 class ConsoleProgress:
     async def report(self, text: str, progress: float = None):
@@ -18,39 +19,69 @@ class ConsoleProgress:
         logging.info(f"📊 {text}{p_str}")
 
 async def run_pipeline(db_manager: DatabaseManager = None, group_keywords: list[str] = None, progress=None):
+    """Возвращает изменения расписания {группа: {дата: (было, стало)}} (см. services/schedule_changes.py)."""
     if not progress:
         progress = ConsoleProgress()
         
     logging.info(f"🚀 Starting Pipeline... {'[Batch: ' + str(group_keywords) + ']' if group_keywords else ''}")
     
-    # 1. Инциализация БД
-    if not db_manager:
-        db_manager = DatabaseManager(config.DB_NAME)
-    
+    # 1. Инциализация БД (без переданного менеджера — временный, закрывается по завершении)
+    async with db_manager_or_default(db_manager) as db_manager:
+        return await _run_pipeline(db_manager, group_keywords, progress)
+
+async def _run_pipeline(db_manager: DatabaseManager, group_keywords: list[str], progress):
     user_repo = UserRepository(db_manager)
     await user_repo.create_tables()
     
     # 1.5. Синхронизация списка групп с сайтом ВятГУ (обновляем общий список)
     from tgbot.services.parser.site_to_pdf import sync_groups_list
     await progress.report("🔄 Updating university groups list...", 0.05)
-    await sync_groups_list(engine=db_manager.engine, progress=progress)
+    await sync_groups_list(db_manager=db_manager, progress=progress)
 
     # 2. Скачивание PDF
     await progress.report("📥 Downloading schedules...", 0.1)
     new_files = await main_downloader(db_manager=db_manager, group_keywords=group_keywords, progress=progress) 
     
+    changes = {}
     if new_files:
         await progress.report(f"📄 Parsing {len(new_files)} files...", 0.3)
-        await parse_schedule_files(new_files, progress)
+        changes = await parse_schedule_files(new_files, progress, db_manager=db_manager)
     else:
         logging.info("✅ No new schedule files or no tracked groups.")
 
     # 3. Обновление занятости
     await progress.report("🏢 Updating occupancy...", 0.8)
-    await update_occupancy(db_manager.engine)
+    await update_occupancy(db_manager)
     
     await progress.report("🏁 Pipeline Finished!", 1.0)
     logging.info("🏁 Pipeline Finished.")
+    return changes
+
+# Одновременные запросы на загрузку одних и тех же групп выполняют пайплайн один раз
+ondemand_pipeline_flight = SingleFlight("ondemand_pipeline")
+# Прогресс идущей загрузки по ключу flight: его видят все ожидающие, а не только первый
+_ondemand_progress: Dict[Tuple[str, ...], ProgressFanout] = {}
+
+async def run_pipeline_for_groups(db_manager: DatabaseManager, group_names: list[str], progress=None):
+    """
+    Загрузка расписания по запросу пользователя. Если такой же набор групп уже
+    загружается, вызов дожидается идущего пайплайна вместо запуска нового.
+    """
+    key = tuple(sorted(set(group_names)))
+    fanout = _ondemand_progress.setdefault(key, ProgressFanout())
+    if progress:
+        await fanout.add(progress)
+    try:
+        return await ondemand_pipeline_flight.do(key, _run_ondemand_pipeline, db_manager, key)
+    finally:
+        if progress:
+            fanout.discard(progress)
+
+async def _run_ondemand_pipeline(db_manager: DatabaseManager, key: Tuple[str, ...]):
+    try:
+        return await run_pipeline(db_manager=db_manager, group_keywords=list(key), progress=_ondemand_progress[key])
+    finally:
+        _ondemand_progress.pop(key, None)
 
 async def cleanup_filesystem(weeks: int = 5):
     """
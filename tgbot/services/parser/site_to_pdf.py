@@ -10,13 +10,14 @@ import hashlib
 import aiohttp
 import aiofiles
 from bs4 import BeautifulSoup
-from sqlalchemy import select, update, create_engine
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy import select, update
 
 from tgbot.config import config
 from tgbot.services.parser.progress import ProgressReporter
+from tgbot.services.single_flight import SingleFlight
+from tgbot.database.group_index import tracked_groups_index
 from tgbot.database.models import TrackedGroup, ProcessedFile
-from tgbot.database.repositories import DatabaseManager
+from tgbot.database.repositories import DatabaseManager, db_manager_or_default
 
 # Константы (centralized in config)
 SCHEDULE_URL = config.SCHEDULE_URL
@@ -28,6 +29,10 @@ MAX_CONCURRENT_DOWNLOADS = 5
 DOWNLOAD_SEMAPHORE = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
 
 
+# Одновременные проверки одного URL объединяются, результат живёт 30 секунд
+website_status_flight = SingleFlight("website_status", result_ttl=30)
+
+
 async def check_website_status(url: str = None, timeout: int = 10) -> tuple:
     """
     Проверяет доступность сайта ВятГУ.
@@ -35,6 +40,10 @@ async def check_website_status(url: str = None, timeout: int = 10) -> tuple:
     """
     if url is None:
         url = SCHEDULE_URL
+    return await website_status_flight.do(url, _check_website_status, url, timeout)
+
+
+async def _check_website_status(url: str, timeout: int) -> tuple:
     try:
         async with aiohttp.ClientSession(headers=HEADERS) as session:
             async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
@@ -53,16 +62,15 @@ async def check_website_status(url: str = None, timeout: int = 10) -> tuple:
 def calculate_hash(content: bytes) -> str:
     return hashlib.md5(content).hexdigest()
 
-def _sync_check_hash(session_factory, filename, new_hash, file_path):
-    with session_factory() as db_session:
-        stmt = select(ProcessedFile).where(ProcessedFile.filename == filename)
-        db_file = db_session.execute(stmt).scalar_one_or_none()
-        
-        if db_file and db_file.file_hash == new_hash and Path(file_path).exists():
-            return True, None
-        return False, new_hash
+def _sync_check_hash(db_session, filename, new_hash, file_path):
+    stmt = select(ProcessedFile).where(ProcessedFile.filename == filename)
+    db_file = db_session.execute(stmt).scalar_one_or_none()
+    
+    if db_file and db_file.file_hash == new_hash and Path(file_path).exists():
+        return True, None
+    return False, new_hash
 
-async def download_pdf_if_needed(session: aiohttp.ClientSession, url: str, group_name: str, session_factory):
+async def download_pdf_if_needed(session: aiohttp.ClientSession, url: str, group_name: str, db_manager: DatabaseManager):
     """
     Скачивает PDF если хеш изменился. Возвращает (путь, группа, имя_файла, новый_хеш).
     """
@@ -87,7 +95,7 @@ async def download_pdf_if_needed(session: aiohttp.ClientSession, url: str, group
                     content = await resp.read()
                     new_hash = calculate_hash(content)
                     
-                    skip, hash_to_return = await asyncio.to_thread(_sync_check_hash, session_factory, filename, new_hash, file_path)
+                    skip, hash_to_return = await db_manager.read(_sync_check_hash, filename, new_hash, file_path)
                     
                     if skip:
                         return (str(file_path), safe_group, filename, None)
@@ -105,23 +113,21 @@ async def download_pdf_if_needed(session: aiohttp.ClientSession, url: str, group
                 logging.error(f"❌ Final failure downloading {url}: {e}")
                 return None
 
-def _sync_add_groups(engine, groups_list):
-    from sqlalchemy.orm import Session
-    with Session(engine) as session:
-        for group_name in groups_list:
-            stmt = select(TrackedGroup).where(TrackedGroup.group_name == group_name)
-            if not session.execute(stmt).scalar_one_or_none():
-                session.add(TrackedGroup(group_name=group_name, is_tracked=False))
-        session.commit()
+def _sync_add_groups(session, groups_list):
+    added = 0
+    for group_name in groups_list:
+        stmt = select(TrackedGroup).where(TrackedGroup.group_name == group_name)
+        if not session.execute(stmt).scalar_one_or_none():
+            session.add(TrackedGroup(group_name=group_name, is_tracked=False))
+            added += 1
+    session.commit()
+    return added
 
-async def sync_groups_list(engine=None, progress=None):
+async def sync_groups_list(db_manager: DatabaseManager = None, progress=None):
     """
     Сканирует основную страницу и сохраняет ВСЕ группы в БД для последующего выбора пользователем.
     """
     logging.info("🔍 Syncing groups list from university page...")
-    
-    if engine is None:
-        engine = create_engine(f"sqlite:///{config.DB_NAME}")
 
     # Проверяем доступность сайта
     is_available, status_code, error_msg = await check_website_status()
@@ -143,7 +149,10 @@ async def sync_groups_list(engine=None, progress=None):
         group_elements = soup.find_all('div', class_='grpPeriod')
         groups_list = [g.get_text(strip=True) for g in group_elements]
         
-        await asyncio.to_thread(_sync_add_groups, engine, groups_list)
+        async with db_manager_or_default(db_manager) as manager:
+            added = await manager.write(_sync_add_groups, groups_list)
+        if added:
+            tracked_groups_index.invalidate()
             
         logging.info(f"✅ Discovered {len(groups_list)} groups.")
         return True
@@ -151,37 +160,35 @@ async def sync_groups_list(engine=None, progress=None):
         logging.error(f"Error syncing groups: {e}")
         return False
 
-def _sync_get_tracked_groups(session_factory, group_keywords=None):
-    with session_factory() as session:
-        if group_keywords:
-            # Ensure keywords is a list
-            if isinstance(group_keywords, str):
-                group_keywords = [group_keywords]
-                
-            for kw in group_keywords:
-                stmt = update(TrackedGroup).where(TrackedGroup.group_name == kw).values(is_tracked=True)
-                session.execute(stmt)
-            session.commit()
-            return group_keywords
-        else:
-            stmt = select(TrackedGroup.group_name).where(TrackedGroup.is_tracked == True)
-            return list(session.execute(stmt).scalars().all())
+def _sync_track_groups(session, group_keywords):
+    for kw in group_keywords:
+        stmt = update(TrackedGroup).where(TrackedGroup.group_name == kw).values(is_tracked=True)
+        session.execute(stmt)
+    session.commit()
+    return group_keywords
+
+def _sync_get_tracked_groups(session):
+    stmt = select(TrackedGroup.group_name).where(TrackedGroup.is_tracked == True)
+    return list(session.execute(stmt).scalars().all())
 
-def _sync_update_processed_file(session_factory, f_name, f_hash):
-    with session_factory() as session:
-        stmt = select(ProcessedFile).where(ProcessedFile.filename == f_name)
-        db_file = session.execute(stmt).scalar_one_or_none()
-        if db_file:
-            db_file.file_hash = f_hash
-        else:
-            session.add(ProcessedFile(filename=f_name, file_hash=f_hash, file_type='schedule'))
-        session.commit()
+def _sync_update_processed_file(session, f_name, f_hash):
+    stmt = select(ProcessedFile).where(ProcessedFile.filename == f_name)
+    db_file = session.execute(stmt).scalar_one_or_none()
+    if db_file:
+        db_file.file_hash = f_hash
+    else:
+        session.add(ProcessedFile(filename=f_name, file_hash=f_hash, file_type='schedule'))
+    session.commit()
 
 async def main_downloader(db_manager: DatabaseManager = None, group_keywords: List[str] = None, progress=None):
     """
     Main function for downloading and processing groups.
     If group_keywords is provided, downloads ONLY those groups.
     """
+    async with db_manager_or_default(db_manager) as manager:
+        return await _main_downloader(manager, group_keywords, progress)
+
+async def _main_downloader(db_manager: DatabaseManager, group_keywords: List[str] = None, progress=None):
     def is_schedule_actual(link_text: str) -> bool:
         """
         Extracts dates from format "c 16 02 2026 по 01 03 2026"
@@ -202,15 +209,15 @@ async def main_downloader(db_manager: DatabaseManager = None, group_keywords: Li
     files_to_parse = []
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
     
-    if db_manager:
-        session_factory = db_manager.session_factory
-    else:
-        engine = create_engine(f"sqlite:///{config.DB_NAME}")
-        session_factory = sessionmaker(engine, expire_on_commit=False, class_=Session)
-    
     if progress: await progress.report("🔍 Checking groups list...", 0.1)
     
-    tracked_groups_list = await asyncio.to_thread(_sync_get_tracked_groups, session_factory, group_keywords)
+    if group_keywords:
+        # Ensure keywords is a list
+        if isinstance(group_keywords, str):
+            group_keywords = [group_keywords]
+        tracked_groups_list = await db_manager.write(_sync_track_groups, group_keywords)
+    else:
+        tracked_groups_list = await db_manager.read(_sync_get_tracked_groups)
     
     if not tracked_groups_list:
         logging.warning("⚠️ No groups to download.")
@@ -254,7 +261,7 @@ async def main_downloader(db_manager: DatabaseManager = None, group_keywords: Li
                 href = link['href']
                 if href.endswith('.pdf'):
                     full_url = urljoin(BASE_URL, href)
-                    tasks.append(download_pdf_if_needed(http_session, full_url, group_name, session_factory))
+                    tasks.append(download_pdf_if_needed(http_session, full_url, group_name, db_manager))
         
         if not tasks:
             return []
@@ -266,7 +273,7 @@ async def main_downloader(db_manager: DatabaseManager = None, group_keywords: Li
                 f_path, g_name, f_name, f_hash = res
                 if f_hash:  # New or changed
                     processed_files.append((f_path, g_name))
-                    await asyncio.to_thread(_sync_update_processed_file, session_factory, f_name, f_hash)
+                    await db_manager.write(_sync_update_processed_file, f_name, f_hash)
                 else:
                     processed_files.append((f_path, g_name))
         
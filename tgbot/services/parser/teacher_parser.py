@@ -13,6 +13,7 @@ from sqlalchemy.orm import Session
 from tgbot.config import config
 from tgbot.database.models import Lesson
 from tgbot.services.parser.site_to_pdf import check_website_status
+from tgbot.services.single_flight import SingleFlight
 
 TEACHER_URL = "https://www.vyatsu.ru/studentu-1/spravochnaya-informatsiya/teacher.html"
 BASE_URL = config.VYATSU_BASE_URL
@@ -187,6 +188,28 @@ def parse_teacher_html_report(html: bytes, dept_name: str) -> List[Lesson]:
 
     return results
 
+# Отчёт кафедры одинаков для всех пользователей: одновременные запросы одного URL
+# объединяются, а разобранный результат переиспользуется 5 минут
+teacher_report_flight = SingleFlight("teacher_report", result_ttl=5 * 60)
+
+async def fetch_teacher_report(url: str, dept_name: str) -> List[Lesson]:
+    """Скачивает и разбирает отчёт кафедры. Ошибки сети дают пустой список."""
+    try:
+        return await teacher_report_flight.do(url, _fetch_teacher_report, url, dept_name)
+    except Exception as e:
+        # Ошибка не кэшируется SingleFlight: следующий поиск снова сходит на сайт
+        logging.warning(f"Failed to fetch teacher report {url}: {e}")
+        return []
+
+async def _fetch_teacher_report(url: str, dept_name: str) -> List[Lesson]:
+    # Своя сессия: выполнение общее для всех ожидающих и не зависит от сессии первого из них
+    async with aiohttp.ClientSession(headers=HEADERS) as session:
+        async with session.get(url, timeout=10) as resp:
+            if resp.status != 200:
+                raise RuntimeError(f"HTTP {resp.status}")
+            html = await resp.read()
+    return await asyncio.to_thread(parse_teacher_html_report, html, dept_name)
+
 async def update_all_teachers_data():
     """
     (Optional/Internal) Scans all reports and caches teacher names.
@@ -1,24 +1,34 @@
 import asyncio
 import logging
 import re
+import time
 from datetime import datetime
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from tgbot.config import config
+from tgbot.database.repositories import BroadcastRepository
 from tgbot.services.parser.runner import run_pipeline, cleanup_filesystem
 
 class ParserSchedulerService:
     
-    def __init__(self, db_manager=None, schedule_repo=None, analytics_repo=None, run_on_startup: bool = False):
+    def __init__(
+        self, db_manager=None, schedule_repo=None, analytics_repo=None, change_notifier=None, daily_digest=None,
+        run_on_startup: bool = False
+    ):
         """
         Args:
             db_manager: Database manager instance
             schedule_repo: Schedule repository instance
             analytics_repo: Analytics repository instance
+            change_notifier: ChangeNotifier — уведомления об изменениях расписания после парсинга
+            daily_digest: DailyDigestService — утренняя рассылка после планового парсинга
             run_on_startup: Запускать ли парсер сразу при старте бота
         """
         self.scheduler = AsyncIOScheduler()
         self.db_manager = db_manager
         self.schedule_repo = schedule_repo
         self.analytics_repo = analytics_repo
+        self.change_notifier = change_notifier
+        self.daily_digest = daily_digest
         self.run_on_startup = run_on_startup
         self.last_run = None
         self.last_status = None
@@ -27,6 +37,8 @@ class ParserSchedulerService:
             "successful_runs": 0,
             "failed_runs": 0
         }
+        # Итоги последнего планового обслуживания (см. run_maintenance)
+        self.last_maintenance = None
 
     def _parse_output(self, output: str) -> dict:
         """
@@ -54,8 +66,8 @@ class ParserSchedulerService:
         
         return stats
 
-    async def run_parser_process(self):
-        """Запускает процесс парсинга средствами бота"""
+    async def run_parser_process(self, send_digest: bool = False):
+        """Запускает процесс парсинга средствами бота; send_digest — затем утренняя рассылка"""
         start_time = datetime.now()
         self.stats["total_runs"] += 1
         
@@ -63,7 +75,8 @@ class ParserSchedulerService:
         
         try:
             # Вместо запуска внешнего процесса вызываем run_pipeline напрямую
-            await run_pipeline(db_manager=self.db_manager)
+            changes = await run_pipeline(db_manager=self.db_manager)
+            await self._notify_changes(changes)
             
             duration = (datetime.now() - start_time).total_seconds()
             self.stats["successful_runs"] += 1
@@ -78,30 +91,98 @@ class ParserSchedulerService:
             self.last_run = datetime.now()
             logging.error(f"❌ Ошибка в планировщике парсера: {e}", exc_info=True)
 
+        # Рассылка и при неудачном парсинге: в БД остаётся вчерашнее (обычно актуальное) расписание
+        if send_digest and self.daily_digest:
+            try:
+                await self.daily_digest.run()
+            except Exception as e:
+                logging.error(f"❌ Ошибка утренней рассылки: {e}", exc_info=True)
+
+    async def _notify_changes(self, changes: dict):
+        """Рассылка изменений не должна ронять парсинг"""
+        if not self.change_notifier or not changes:
+            return
+        try:
+            await self.change_notifier.notify(changes)
+        except Exception as e:
+            logging.error(f"❌ Ошибка уведомлений об изменениях расписания: {e}", exc_info=True)
+
+    def _db_managers(self) -> list:
+        managers = [self.db_manager]
+        if self.analytics_repo:
+            managers.append(self.analytics_repo.db_manager)
+        return [manager for manager in managers if manager is not None]
+
+    async def _maintenance_step(self, report: dict, name: str, step):
+        """Шаг обслуживания; ошибка шага логируется и не отменяет остальные шаги"""
+        try:
+            return await step()
+        except Exception as e:
+            report["errors"].append(name)
+            logging.error(f"❌ Ошибка обслуживания ({name}): {e}", exc_info=True)
+            return None
+
     async def run_maintenance(self):
         """Запускает очистку данных и логов"""
         logging.info("🧹 Запуск планового обслуживания...")
-        try:
-            # 1. Очистка файлов (удаляет PDF старше 5 недель)
-            await cleanup_filesystem(weeks=5)
-            
-            # 2. Очистка БД - удаляет старые записи
-            if self.schedule_repo:
-                # Удаляет занятия старше 6 месяцев (26 недель)
-                await self.schedule_repo.cleanup_old_lessons(weeks=26)
-            if self.analytics_repo:
-                # Удаляет логи старше 90 дней
-                await self.analytics_repo.cleanup_old_logs(days=90)
-                
+        started = time.perf_counter()
+        report = {
+            "lessons_archived": 0, "lessons_deleted": 0, "logs_deleted": 0, "pages_freed": 0, "freed_kb": 0.0,
+            "errors": [],
+        }
+        step = self._maintenance_step
+
+        # 1. Очистка файлов (удаляет PDF старше 5 недель)
+        await step(report, "files", lambda: cleanup_filesystem(weeks=5))
+
+        # 2. Очистка БД - удаляет старые записи пачками
+        if self.schedule_repo:
+            # Прошедшие недели уходят в семестровые архивы, в piculi.db остаётся рабочий набор
+            report["lessons_archived"] = await step(report, "archive", self.schedule_repo.archive_old_lessons) or 0
+            # Удаляет занятия старше 6 месяцев (26 недель)
+            report["lessons_deleted"] = await step(
+                report, "old_lessons", lambda: self.schedule_repo.cleanup_old_lessons(weeks=26)
+            ) or 0
+        if self.analytics_repo:
+            # Сырые логи храним ANALYTICS_RAW_RETENTION_DAYS, тренды — в дневных агрегатах
+            report["logs_deleted"] = await step(report, "logs", self.analytics_repo.cleanup_old_logs) or 0
+        if self.db_manager:
+            # Получатели старых рассылок; счётчики остаются в broadcast_jobs
+            await step(report, "broadcasts", BroadcastRepository(self.db_manager).cleanup_old_jobs)
+
+        # 3. Возврат свободных страниц и обновление статистики планировщика
+        for manager in self._db_managers():
+            result = await step(report, f"optimize {manager.db_path}", manager.optimize)
+            if result:
+                report["pages_freed"] += result["pages_freed"]
+                report["freed_kb"] += result["freed_kb"]
+
+        # 4. Свежий снимок piculi.db для быстрого старта новой инстанции / восстановления
+        if self.db_manager:
+            snapshot = await step(report, "snapshot", lambda: self.db_manager.snapshot(config.SNAPSHOT_PATH))
+            if snapshot:
+                report["snapshot_kb"] = snapshot["size_kb"]
+
+        if report["errors"]:
+            report["status"] = "failed"
+            logging.error(f"❌ Обслуживание завершено с ошибками: {', '.join(report['errors'])}")
+        else:
+            report["status"] = "success"
             logging.info("✅ Обслуживание завершено успешно.")
-        except Exception as e:
-            logging.error(f"❌ Ошибка при выполнении обслуживания: {e}")
+        report["duration_s"] = time.perf_counter() - started
+        report["finished_at"] = datetime.now()
+        self.last_maintenance = report
+        logging.info(
+            f"   🧹 В архив: {report['lessons_archived']}, удалено занятий: {report['lessons_deleted']}, логов: {report['logs_deleted']}, "
+            f"освобождено страниц: {report['pages_freed']} ({report['freed_kb']:.0f} КБ) за {report['duration_s']:.1f}с"
+        )
 
     async def run_daily_sync(self):
         """Запускает ежедневную синхронизацию с веб-сайтом университета в 5:00 AM"""
         logging.info("📡 Запуск ежедневной синхронизации с веб-сайтом (5:00 AM)...")
         try:
-            await run_pipeline(db_manager=self.db_manager)
+            changes = await run_pipeline(db_manager=self.db_manager)
+            await self._notify_changes(changes)
             logging.info("✅ Ежедневная синхронизация завершена успешно.")
         except Exception as e:
             logging.error(f"❌ Ошибка при ежедневной синхронизации: {e}", exc_info=True)
@@ -111,11 +192,20 @@ class ParserSchedulerService:
         logging.info("🏢 Запуск плановой синхронизации занятости аудиторий...")
         try:
             from tgbot.services.parser.occupancy_parser import update_occupancy
-            await update_occupancy(self.db_manager.engine)
+            await update_occupancy(self.db_manager)
             logging.info("✅ Синхронизация занятости завершена успешно.")
         except Exception as e:
             logging.error(f"❌ Ошибка при синхронизации занятости: {e}", exc_info=True)
 
+    async def run_wal_checkpoint(self):
+        """PASSIVE-чекпойнт WAL основной БД и БД аналитики: не ждёт читателей и не блокирует их"""
+        for manager in self._db_managers():
+            try:
+                busy, wal_frames, checkpointed = await manager.checkpoint("PASSIVE")
+                logging.debug(f"🧾 WAL checkpoint {manager.db_path}: {checkpointed}/{wal_frames} frames, busy={busy}")
+            except Exception as e:
+                logging.error(f"❌ Ошибка WAL checkpoint {manager.db_path}: {e}")
+
     def start(self, interval_hours: int = 12):
         """
         Запускает планировщик парсера.
@@ -137,7 +227,8 @@ class ParserSchedulerService:
             "cron", 
             hour="6",
             minute="50",
-            id="parser_job"
+            id="parser_job",
+            kwargs={"send_digest": True}
         )
         
         # Ежедневная синхронизация в 5:00 AM с веб-сайтом университета
@@ -167,12 +258,21 @@ class ParserSchedulerService:
             id="occupancy_sync_job"
         )
         
+        # Плановый PASSIVE-чекпойнт WAL: WAL не разрастается после больших записей парсера
+        self.scheduler.add_job(
+            self.run_wal_checkpoint,
+            "interval",
+            seconds=config.DB_CHECKPOINT_INTERVAL,
+            id="wal_checkpoint_job"
+        )
+        
         self.scheduler.start()
         logging.info(f"⚙️ Планировщик парсера запущен")
-        logging.info(f"   📅 Job 1: Парсинг расписания - каждый день в 6:50 AM")
+        logging.info(f"   📅 Job 1: Парсинг расписания и утренняя рассылка - каждый день в 6:50 AM")
         logging.info(f"   📡 Job 2: Синхронизация с веб-сайтом - каждый день в 5:00 AM")
         logging.info(f"   🏢 Job 3: Синхронизация занятости - каждые 4 часа")
         logging.info(f"   🧹 Job 4: Плановое обслуживание - каждое воскресенье в 4:00 AM")
+        logging.info(f"   🧾 Job 5: WAL checkpoint - каждые {config.DB_CHECKPOINT_INTERVAL} с")
         
         # Запуск парсера сразу при старте (если включено)
         if self.run_on_startup:
@@ -199,6 +299,8 @@ class ParserSchedulerService:
             "running": self.scheduler.running if hasattr(self.scheduler, 'running') else False,
             "last_run": self.last_run,
             "last_status": self.last_status,
+            "last_maintenance": self.last_maintenance,
+            "last_digest": self.daily_digest.last_report if self.daily_digest else None,
             "stats": self.stats.copy()
         }
 
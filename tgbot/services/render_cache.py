@@ -0,0 +1,46 @@
+from datetime import date
+from typing import Optional, Tuple
+
+from tgbot.config import config
+from tgbot.database.data_versions import lesson_versions
+from tgbot.database.models import NOTIFICATION_SETTINGS, UserSettings
+from tgbot.services.cache import LRUCache
+
+
+def settings_key(settings: Optional[UserSettings]) -> Tuple:
+    """Кортеж настроек отображения, от которых зависит текст сообщения."""
+    return tuple((settings or UserSettings()).model_dump(exclude=NOTIFICATION_SETTINGS).values())
+
+
+class RenderCache:
+    """
+    LRU готовых HTML-сообщений расписания (день, неделя).
+
+    Ключ: (вид, группа, дата, настройки, флаг прогноза, версия данных группы).
+    Версия меняется, когда парсер пишет занятия группы (см. lesson_versions),
+    так что после обновления расписания старые тексты больше не находятся и
+    вытесняются по LRU. TTL — страховка от записи в БД вне процесса бота (CLI).
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl, name="render")
+
+    @staticmethod
+    def key(kind: str, group_name: str, target_date: date, settings: Optional[UserSettings], predict: bool) -> Tuple:
+        return kind, group_name, target_date.isoformat(), settings_key(settings), predict, lesson_versions.get(group_name)
+
+    def get(self, key: Tuple) -> Optional[str]:
+        return self._cache.get(key, None)
+
+    def set(self, key: Tuple, text: str, elapsed_ms: float = 0.0):
+        self._cache.set(key, text)
+        self._cache.record_load(elapsed_ms)
+
+    def clear(self):
+        self._cache.clear()
+
+    def get_stats(self) -> dict:
+        return self._cache.get_stats()
+
+
+render_cache = RenderCache(maxsize=config.RENDER_CACHE_SIZE, ttl=config.RENDER_CACHE_TTL)
@@ -0,0 +1,181 @@
+"""
+Обнаружение изменений расписания после парсинга и уведомления подписчиков.
+
+Парсер перезаписывает занятия группы по датам, которые покрывает файл
+(`_sync_save_lessons`): для каждой даты сравниваются мультимножества строк
+занятий, неизменённые дни не трогаются, изменённые заменяются целиком.
+Работа пропорциональна числу разобранных файлов, а не размеру БД.
+
+Изменения {группа: {дата ISO: (было, стало)}} уходят в ChangeNotifier:
+одним запросом находятся подписчики (основная группа или избранное, без
+отключивших `notify_changes`), и по каждой группе ставится одна рассылка
+через Broadcaster.
+"""
+import logging
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from tgbot.database.repositories import UserRepository
+from tgbot.services.broadcaster import Broadcaster
+from tgbot.services.services import DAYS_RU
+
+# Поля, по которым сравниваются занятия (raw_info — производное, в сравнение не входит)
+LESSON_FIELDS = (
+    "pair_number", "start_time", "end_time", "subject", "class_type",
+    "teacher", "building", "room", "subgroup",
+)
+MAX_LINES_PER_DAY = 8
+# Лимит Telegram на длину сообщения (4096) с запасом на HTML-разметку
+MAX_MESSAGE_LENGTH = 4000
+
+LessonRow = Tuple
+DayChange = Tuple[List[LessonRow], List[LessonRow]]    # (убрано, добавлено)
+Changes = Dict[str, Dict[str, DayChange]]               # {группа: {дата ISO: изменения}}
+
+
+def lesson_row(lesson) -> LessonRow:
+    return tuple(getattr(lesson, field) for field in LESSON_FIELDS)
+
+
+def diff_day(old: Iterable[LessonRow], new: Iterable[LessonRow]) -> Optional[DayChange]:
+    """Разность мультимножеств занятий дня; None — день не изменился."""
+    old_count, new_count = Counter(old), Counter(new)
+    if old_count == new_count:
+        return None
+    removed = sorted((old_count - new_count).elements(), key=_row_order)
+    added = sorted((new_count - old_count).elements(), key=_row_order)
+    return removed, added
+
+
+def merge_changes(target: Changes, changes: Changes) -> Changes:
+    for group_name, days in changes.items():
+        target.setdefault(group_name, {}).update(days)
+    return target
+
+
+def _row_order(row: LessonRow):
+    return row[0] or 0, tuple(value or "" for value in row[1:])
+
+
+def _describe(row: LessonRow) -> str:
+    pair_number, start_time, _, subject, class_type, teacher, building, room, subgroup = row
+    parts = [subject or "Предмет не указан"]
+    if class_type:
+        parts.append(f"({class_type})")
+    if building or room:
+        parts.append(f"📍 {building or ''}-{room or ''}")
+    if subgroup:
+        parts.append(f"[{subgroup}]")
+    return " ".join(parts)
+
+
+def format_day_changes(change: DayChange) -> List[str]:
+    """Строки вида «🔄 2 пара: было → стало» по номерам пар."""
+    removed, added = change
+    by_pair: Dict[Optional[int], Tuple[list, list]] = defaultdict(lambda: ([], []))
+    for row in removed:
+        by_pair[row[0]][0].append(row)
+    for row in added:
+        by_pair[row[0]][1].append(row)
+
+    lines = []
+    for pair_number in sorted(by_pair, key=lambda p: p or 0):
+        old, new = by_pair[pair_number]
+        pair = f"{pair_number} пара" if pair_number else "Пара"
+        start = (new or old)[0][1]
+        pair += f" ({start})" if start else ""
+        if old and new:
+            lines.append(f"🔄 {pair}: {', '.join(map(_describe, old))} → <b>{', '.join(map(_describe, new))}</b>")
+        elif new:
+            lines.append(f"➕ {pair}: <b>{', '.join(map(_describe, new))}</b>")
+        else:
+            lines.append(f"❌ {pair}: {', '.join(map(_describe, old))} — отменена")
+    if len(lines) > MAX_LINES_PER_DAY:
+        hidden = len(lines) - MAX_LINES_PER_DAY + 1
+        lines = lines[:MAX_LINES_PER_DAY - 1] + [f"… и ещё {hidden}"]
+    return lines
+
+
+def format_group_changes(group_name: str, days: Dict[str, DayChange]) -> str:
+    """Одно сообщение на группу; дни, не поместившиеся в лимит Telegram, сворачиваются в «… и ещё N дней»."""
+    header = f"🔔 <b>Изменения в расписании {group_name}</b>"
+    footer = "\n<i>Отключить уведомления: ⚙️ Настройки</i>"
+    blocks = []
+    for day_iso in sorted(days):
+        day = date.fromisoformat(day_iso)
+        lines = [f"\n<b>{DAYS_RU[day.weekday()]}, {day.strftime('%d.%m')}</b>"] + format_day_changes(days[day_iso])
+        blocks.append("\n".join(lines))
+
+    # Запас под строку «… и ещё N дней»
+    budget = MAX_MESSAGE_LENGTH - len(header) - len(footer) - 200
+    shown = []
+    for block in blocks:
+        if len(block) + 1 > budget:
+            break
+        shown.append(block)
+        budget -= len(block) + 1
+    parts = [header, *shown]
+    hidden = len(blocks) - len(shown)
+    if hidden:
+        parts.append(f"\n… и ещё {hidden} {_days_word(hidden)} с изменениями — откройте расписание в боте")
+    parts.append(footer)
+    return "\n".join(parts)
+
+
+def _days_word(n: int) -> str:
+    if n % 10 == 1 and n % 100 != 11:
+        return "день"
+    if 2 <= n % 10 <= 4 and not 12 <= n % 100 <= 14:
+        return "дня"
+    return "дней"
+
+
+class ChangeNotifier:
+    """
+    Рассылает изменения расписания тем, кто следит за группой.
+    Учитываются только дни от сегодня до `horizon_days` вперёд: правки прошедших
+    недель никому не интересны.
+    """
+
+    def __init__(self, user_repo: UserRepository, broadcaster: Broadcaster, horizon_days: int = 14):
+        self.user_repo = user_repo
+        self.broadcaster = broadcaster
+        self.horizon_days = horizon_days
+        self.stats = {"runs": 0, "groups": 0, "days": 0, "messages": 0}
+
+    def _relevant(self, changes: Changes) -> Changes:
+        today = date.today()
+        first, last = today.isoformat(), (today + timedelta(days=self.horizon_days)).isoformat()
+        relevant = {}
+        for group_name, days in changes.items():
+            days = {d: change for d, change in days.items() if first <= d <= last}
+            if days:
+                relevant[group_name] = days
+        return relevant
+
+    async def notify(self, changes: Changes) -> int:
+        """Ставит рассылки в очередь Broadcaster (не ждёт доставки). Возвращает число сообщений."""
+        self.stats["runs"] += 1
+        changes = self._relevant(changes)
+        if not changes:
+            return 0
+        audience = await self.user_repo.get_group_audience(list(changes), setting="notify_changes")
+        messages = 0
+        for group_name, days in changes.items():
+            chat_ids = sorted(audience.get(group_name, ()))
+            self.stats["groups"] += 1
+            self.stats["days"] += len(days)
+            if not chat_ids:
+                continue
+            self.broadcaster.submit(chat_ids, format_group_changes(group_name, days), kind="changes")
+            messages += len(chat_ids)
+        self.stats["messages"] += messages
+        logging.info(
+            f"🔔 Schedule changes: {len(changes)} groups, "
+            f"{sum(len(days) for days in changes.values())} days, {messages} notifications queued"
+        )
+        return messages
+
+    def get_stats(self) -> dict:
+        return dict(self.stats)
@@ -1,14 +1,23 @@
-from datetime import date
-from typing import List, Optional, Set, Union
-from aiogram import Bot
+import asyncio
+import inspect
+import logging
+import time
+from datetime import date, timedelta
+from types import MappingProxyType
+from typing import List, Optional, Set, Union, Mapping
 from tgbot.database.models import Lesson, UserSettings
 from tgbot.database.repositories import UserRepository, OccupancyRepository
-from tgbot.services.utils import safe_broadcast
+from tgbot.services.render_cache import render_cache
+from tgbot.services.broadcaster import Broadcaster
+from tgbot.services import free_windows
 from aiogram import BaseMiddleware
 from typing import Callable, Dict, Any, Awaitable
 from aiogram.types import Message, CallbackQuery, TelegramObject
 from tgbot.config import config
 from tgbot.database.repositories import ScheduleRepository
+DAYS_RU = {0: "Пн", 1: "Вт", 2: "Ср", 3: "Чт", 4: "Пт", 5: "Сб", 6: "Вс"}
+
+
 class ScheduleService:
     async def find_common_free_slots(
         self,
@@ -63,6 +72,111 @@ class ScheduleService:
             lines.append(f"▫️ <b>{p} пара</b>: <code>{STANDARD_PAIRS[p]}</code>")
 
         return "\n".join(lines)
+
+    async def find_common_windows(
+        self,
+        schedule_repo: ScheduleRepository,
+        group_names: List[str],
+        start_date: date,
+        days: int = 14,
+        min_pairs: int = 1
+    ) -> str:
+        """
+        Общие свободные окна групп на `days` дней вперёд: ближайшие и самые длинные
+        непрерывные блоки пар (см. tgbot/services/free_windows.py).
+        """
+        period = free_windows.date_range(start_date, days)
+        busy_rows, last_dates = await schedule_repo.get_busy_pairs(group_names, period[0], period[-1])
+
+        busy = free_windows.build_busy_matrix(group_names, period, busy_rows)
+        valid_days = free_windows.known_days_mask(group_names, period, last_dates)
+        windows = free_windows.find_windows(busy, period, valid_days, min_pairs)
+
+        header = [
+            f"📅 <b>{period[0].strftime('%d.%m')} — {period[-1].strftime('%d.%m.%Y')}</b>",
+            f"👥 Группы: <b>{', '.join(group_names)}</b>",
+        ]
+        unknown = int((~valid_days).sum()) - sum(1 for d in period if d.weekday() == 6)
+        if unknown > 0:
+            header.append(f"ℹ️ <i>Дней без опубликованного расписания: {unknown}</i>")
+
+        if not windows:
+            return "\n".join(header) + "\n\n❌ <b>Общих свободных окон не найдено.</b>"
+
+        def describe(window) -> str:
+            day, first, length = window
+            last = first + length - 1
+            pairs = f"{first} пара" if length == 1 else f"{first}–{last} пары"
+            times = f"{free_windows.PAIR_TIMES[first][0]} - {free_windows.PAIR_TIMES[last][1]}"
+            return f"▫️ {day.strftime('%d.%m')} ({DAYS_RU[day.weekday()]}) <b>{pairs}</b>: <code>{times}</code>"
+
+        lines = header + ["", "⏱ <b>Ближайшие окна:</b>"]
+        lines += [describe(w) for w in free_windows.earliest_windows(windows)]
+        lines += ["", "🏆 <b>Самые длинные окна:</b>"]
+        lines += [describe(w) for w in free_windows.best_windows(windows)]
+        return "\n".join(lines)
+
+    async def plan_meeting(
+        self,
+        schedule_repo: ScheduleRepository,
+        occupancy_repo: OccupancyRepository,
+        group_names: List[str],
+        start_date: date,
+        days: int = 1,
+        min_pairs: int = 1
+    ) -> str:
+        """
+        Общие окна групп + свободные в это время аудитории: ранжированные варианты
+        (дата, пары, аудитория), сначала корпуса, где группы и так учатся.
+        """
+        period = free_windows.date_range(start_date, days)
+        (busy_rows, last_dates), (rooms, occupied, covered) = await asyncio.gather(
+            schedule_repo.get_busy_pairs(group_names, period[0], period[-1]),
+            occupancy_repo.get_occupancy_range(period[0], period[-1]),
+        )
+
+        group_free = free_windows.common_free(
+            free_windows.build_busy_matrix(group_names, period, busy_rows),
+            free_windows.known_days_mask(group_names, period, last_dates),
+        )
+        covered_days = free_windows.covered_days_mask(period, covered)
+        candidates = free_windows.find_room_candidates(
+            group_free, free_windows.build_room_matrix(rooms, period, occupied), covered_days, period, rooms, min_pairs
+        )
+
+        # Корпуса, где у групп есть занятия: в тот же день и за период вообще
+        day_buildings: Dict[tuple, int] = {}
+        buildings: Dict[str, int] = {}
+        for _, day_iso, _, building in busy_rows:
+            if building:
+                day_buildings[(day_iso, building)] = day_buildings.get((day_iso, building), 0) + 1
+                buildings[building] = buildings.get(building, 0) + 1
+        ranked = free_windows.rank_room_candidates(candidates, day_buildings, buildings)
+
+        header = [
+            "🏫 <b>Встреча с аудиторией</b>",
+            f"📅 {period[0].strftime('%d.%m')}" + (f" — {period[-1].strftime('%d.%m')}" if days > 1 else ""),
+            f"👥 Группы: <b>{', '.join(group_names)}</b>",
+        ]
+        if not ranked:
+            reason = "нет общих окон со свободными аудиториями"
+            if not covered_days.any():
+                reason = "нет данных о занятости аудиторий на эти даты"
+            return "\n".join(header) + f"\n\n❌ <b>Вариантов не найдено:</b> {reason}."
+
+        lines = header + [""]
+        for day, first, length, building, room in ranked:
+            last = first + length - 1
+            pairs = f"{first} пара" if length == 1 else f"{first}–{last} пары"
+            times = f"{free_windows.PAIR_TIMES[first][0]} - {free_windows.PAIR_TIMES[last][1]}"
+            here = " 📌" if day_buildings.get((day.isoformat(), building)) else ""
+            lines.append(
+                f"▫️ {day.strftime('%d.%m')} ({DAYS_RU[day.weekday()]}) <b>{pairs}</b> "
+                f"<code>{times}</code> — 🚪 <b>{room}</b>{here}"
+            )
+        lines.append("\n📌 — корпус, где у групп в этот день есть пары")
+        return "\n".join(lines)
+
     def format_day(
         self,
         lessons: List[Lesson],
@@ -133,10 +247,67 @@ class ScheduleService:
                 lines.append(" | ".join(meta))
         return "\n".join(lines)
 
+    async def render_day(
+        self,
+        schedule_repo: ScheduleRepository,
+        group_name: str,
+        target_date: date,
+        settings: Optional[UserSettings] = None,
+        predict: bool = True
+    ) -> str:
+        """
+        Сообщение с расписанием на день. Сначала смотрим в render_cache — при попадании
+        БД не трогаем; `predict` — подставлять ли прогноз, если занятий нет.
+        """
+        key = render_cache.key("day", group_name, target_date, settings, predict)
+        text = render_cache.get(key)
+        if text is not None:
+            return text
+
+        started = time.perf_counter()
+        lessons = await schedule_repo.get_lessons(group_name, target_date)
+        is_predicted = False
+        if not lessons and predict:
+            lessons = await schedule_repo.get_predicted_schedule(group_name, target_date)
+            is_predicted = bool(lessons)
+        text = self.format_day(lessons, target_date, group_name, settings, is_predicted=is_predicted)
+        render_cache.set(key, text, (time.perf_counter() - started) * 1000)
+        return text
+
+    async def render_week(
+        self,
+        schedule_repo: ScheduleRepository,
+        group_name: str,
+        start_date: date,
+        settings: Optional[UserSettings] = None
+    ) -> str:
+        """Сообщение с расписанием на 7 дней с start_date (только дни с занятиями), через render_cache."""
+        key = render_cache.key("week", group_name, start_date, settings, False)
+        text = render_cache.get(key)
+        if text is not None:
+            return text
+
+        started = time.perf_counter()
+        end_date = start_date + timedelta(days=6)
+        text_parts = [
+            f"📆 <b>Расписание на неделю ({start_date.strftime('%d.%m')} — {end_date.strftime('%d.%m')})</b>\nГруппа: {group_name}\n"
+        ]
+        week_lessons = await schedule_repo.get_lessons_range(group_name, start_date, end_date)
+        for day_date, lessons in week_lessons.items():
+            if lessons:
+                text_parts.append(self.format_day(lessons, day_date, group_name, settings))
+        if len(text_parts) == 1:
+            text_parts.append("🎉 На эту неделю пар нет!")
+
+        text = "\n\n".join(text_parts)
+        render_cache.set(key, text, (time.perf_counter() - started) * 1000)
+        return text
+
 
 class CuratorService:
-    def __init__(self, user_repo: UserRepository):
+    def __init__(self, user_repo: UserRepository, broadcaster: Broadcaster):
         self.user_repo = user_repo
+        self.broadcaster = broadcaster
 
     async def try_activate_code(self, user_id: int, code: str) -> Union[str, bool]:
         group_name = await self.user_repo.activate_curator_code(code)
@@ -150,15 +321,14 @@ class CuratorService:
             return group_name
         return False
 
-    async def broadcast_to_group(
-        self, bot: Bot, group_name: str, message_text: str
-    ) -> int:
+    async def broadcast_to_group(self, group_name: str, message_text: str) -> dict:
+        """Рассылка студентам группы; отчёт {job_id, total, delivered, failed, blocked, duration_s}."""
         students = await self.user_repo.get_users_by_group(group_name)
         student_ids = [s.telegram_id for s in students]
         if not student_ids:
-            return 0
+            return {"job_id": None, "total": 0, "delivered": 0, "failed": 0, "blocked": 0, "duration_s": 0.0}
         formatted_text = f"📢 <b>Сообщение от куратора:</b>\n\n{message_text}"
-        return await safe_broadcast(bot, student_ids, formatted_text)
+        return await self.broadcaster.broadcast(student_ids, formatted_text, kind="curator")
 
 
 class OccupancyService:
@@ -176,3 +346,86 @@ class OccupancyService:
 
     async def get_available_pairs(self, target_date: date, building: str) -> List[int]:
         return await self.occupancy_repo.get_available_pairs(target_date, building)
+
+
+SettingsListener = Callable[[Dict[str, str], Mapping[str, str]], Union[Awaitable[None], None]]
+
+
+class BotSettingsStore:
+    """
+    Снимок таблицы bot_settings в памяти.
+
+    `get()` отдаёт неизменяемый снимок без обращения к БД; снимок перечитывается
+    только после `set()`. Подписчики получают изменившиеся ключи и новый снимок.
+    """
+
+    def __init__(self, user_repo: UserRepository):
+        self.user_repo = user_repo
+        self._snapshot: Optional[Mapping[str, str]] = None
+        self._listeners: List[SettingsListener] = []
+        self._lock = asyncio.Lock()
+
+    async def load(self) -> Mapping[str, str]:
+        async with self._lock:
+            return await self._reload()
+
+    async def _reload(self) -> Mapping[str, str]:
+        old = self._snapshot or {}
+        self._snapshot = MappingProxyType(await self.user_repo.get_settings())
+        # При первой загрузке "изменились" все ключи — подписчики получают начальное состояние
+        changed = {k: v for k, v in self._snapshot.items() if old.get(k) != v}
+        if changed:
+            await self._notify(changed)
+        return self._snapshot
+
+    async def get(self) -> Mapping[str, str]:
+        if self._snapshot is None:
+            return await self.load()
+        return self._snapshot
+
+    async def set(self, key: str, value: str) -> Mapping[str, str]:
+        async with self._lock:
+            await self.user_repo.update_setting(key, value)
+            return await self._reload()
+
+    def subscribe(self, listener: SettingsListener):
+        """listener(changed, snapshot) — sync или async, вызывается после каждого изменения."""
+        self._listeners.append(listener)
+
+    async def _notify(self, changed: Dict[str, str]):
+        for listener in self._listeners:
+            try:
+                result = listener(changed, self._snapshot)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logging.error(f"❌ Settings listener failed: {e}", exc_info=True)
+
+
+class MaintenanceMiddleware(BaseMiddleware):
+    """Пока включён maintenance_mode, отвечает всем, кроме админов, заглушкой."""
+
+    def __init__(self, settings_store: BotSettingsStore):
+        self.enabled = False
+        settings_store.subscribe(self._on_settings_changed)
+
+    def _on_settings_changed(self, changed: Dict[str, str], snapshot: Mapping[str, str]):
+        if "maintenance_mode" in changed:
+            self.enabled = snapshot.get("maintenance_mode") == "1"
+            logging.info(f"🛠️ Maintenance mode {'enabled' if self.enabled else 'disabled'}")
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        if not self.enabled or not event.from_user or event.from_user.id in config.ADMIN_IDS:
+            return await handler(event, data)
+
+        text = "🛠 Бот на техническом обслуживании. Попробуйте немного позже."
+        if isinstance(event, CallbackQuery):
+            await event.answer(text, show_alert=True)
+        elif isinstance(event, Message):
+            await event.answer(text)
+        return None
@@ -0,0 +1,76 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Tuple
+
+
+class SingleFlight:
+    """
+    Объединяет одновременные одинаковые запросы (single-flight).
+
+    Пока вычисление по ключу выполняется, остальные вызовы с тем же ключом
+    не запускают его повторно, а ждут общий результат. Опционально результат
+    кэшируется на `result_ttl` секунд.
+    """
+
+    def __init__(self, name: str, result_ttl: float = 0):
+        self.name = name
+        self.result_ttl = result_ttl
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self._results: Dict[Hashable, Tuple[float, Any]] = {}
+        self.stats = {
+            "calls": 0,
+            "executions": 0,
+            "coalesced": 0,
+            "cached": 0,
+        }
+        _registry.append(self)
+
+    async def do(self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        self.stats["calls"] += 1
+
+        if self.result_ttl:
+            cached = self._results.get(key)
+            if cached and time.monotonic() - cached[0] < self.result_ttl:
+                self.stats["cached"] += 1
+                return cached[1]
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            self.stats["executions"] += 1
+            task = asyncio.create_task(fn(*args, **kwargs))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t, k=key: self._on_done(k, t))
+
+        # shield: отмена одного ожидающего не должна отменять общее вычисление
+        return await asyncio.shield(task)
+
+    def _on_done(self, key: Hashable, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # task.exception() также помечает исключение как полученное, даже если все ожидающие отменены
+        succeeded = not task.cancelled() and task.exception() is None
+        if self.result_ttl and succeeded:
+            self._results[key] = (time.monotonic(), task.result())
+            self._evict_expired()
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        for k in [k for k, (ts, _) in self._results.items() if now - ts >= self.result_ttl]:
+            del self._results[k]
+
+    def forget(self, key: Hashable):
+        """Сбрасывает закэшированный результат по ключу."""
+        self._results.pop(key, None)
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "in_flight": len(self._in_flight)}
+
+
+_registry: List[SingleFlight] = []
+
+
+def get_single_flight_stats() -> Dict[str, dict]:
+    """Статистика всех single-flight групп процесса (для логов/админки)."""
+    return {sf.name: sf.get_stats() for sf in _registry}
@@ -0,0 +1,155 @@
+import bisect
+import re
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+_SPLIT_RE = re.compile(r"[\s.,]+")
+
+
+def normalize_name(text: str) -> str:
+    """Приводит имя к ключу поиска: casefold + ё -> е, без лишних пробелов."""
+    return " ".join(text.casefold().replace("ё", "е").split())
+
+
+def split_teachers(value: Optional[str]) -> List[str]:
+    """`Lesson.teacher` может содержать нескольких преподавателей через запятую."""
+    if not value:
+        return []
+    parts = re.split(r",\s*(?=[А-ЯЁA-Z])", value)
+    return [p.strip() for p in parts if p.strip()]
+
+
+def teacher_key(name: str) -> Tuple[str, str]:
+    """
+    (фамилия, первый инициал) — позволяет сопоставить "Иванов И.И." из PDF групп
+    и "Иванов Иван Иванович" из отчётов кафедр.
+    """
+    tokens = [t for t in _SPLIT_RE.split(normalize_name(name)) if t]
+    if not tokens:
+        return ("", "")
+    return (tokens[0], tokens[1][:1] if len(tokens) > 1 else "")
+
+
+def _trigrams(token: str) -> Set[str]:
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TeacherIndex:
+    """
+    In-memory индекс ФИО преподавателей.
+
+    Каждое имя разбивается на токены (фамилия, имя/инициалы). Для токенов строятся:
+    - отсортированный список для поиска по префиксу (bisect);
+    - постинги по триграммам для нечёткого поиска (опечатки в фамилии).
+    """
+
+    # Пороги ранжирования: точное совпадение > префикс > подстрока > триграммы
+    EXACT = 1.0
+    PREFIX = 0.9
+    SUBSTRING = 0.7
+    FUZZY = 0.6
+    MIN_FUZZY_SIMILARITY = 0.45
+
+    def __init__(self):
+        self._extra: Set[str] = set()
+        self._reset()
+
+    def _reset(self):
+        self._names: List[str] = []
+        self._name_ids: Dict[str, int] = {}
+        self._tokens: List[Tuple[str, int, int]] = []  # (token, name_id, position)
+        self._prefix: List[Tuple[str, int]] = []  # sorted (token, token_id)
+        self._trigrams: Dict[str, Set[int]] = defaultdict(set)
+        self.built_at: float = 0.0
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def rebuild(self, names: Iterable[str]):
+        """Перестраивает индекс; имена, добавленные через add_names, сохраняются."""
+        self._reset()
+        self._add(names)
+        self._add(self._extra)
+        self.built_at = time.monotonic()
+
+    def add_names(self, names: Iterable[str]):
+        """Добавляет имена, найденные вне БД (например, в отчётах кафедр)."""
+        names = {n for n in names if n}
+        self._extra |= names
+        self._add(names)
+
+    def _add(self, names: Iterable[str]):
+        added = False
+        for raw in names:
+            for name in split_teachers(raw):
+                key = normalize_name(name)
+                if not key or key in self._name_ids:
+                    continue
+                name_id = len(self._names)
+                self._names.append(name)
+                self._name_ids[key] = name_id
+                for pos, token in enumerate(t for t in _SPLIT_RE.split(key) if t):
+                    token_id = len(self._tokens)
+                    self._tokens.append((token, name_id, pos))
+                    self._prefix.append((token, token_id))
+                    for tri in _trigrams(token):
+                        self._trigrams[tri].add(token_id)
+                added = True
+        if added:
+            self._prefix.sort()
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[str, float]]:
+        """Возвращает [(имя, score)] по убыванию релевантности."""
+        q = normalize_name(query)
+        q_tokens = [t for t in _SPLIT_RE.split(q) if t]
+        if not q_tokens or not self._names:
+            return []
+        head = q_tokens[0]
+
+        scores: Dict[int, float] = {}
+
+        def bump(name_id: int, score: float):
+            if score > scores.get(name_id, 0.0):
+                scores[name_id] = score
+
+        # 1. Префикс по любому токену (фамилия приоритетнее имени)
+        start = bisect.bisect_left(self._prefix, (head, -1))
+        for token, token_id in self._prefix[start:]:
+            if not token.startswith(head):
+                break
+            _, name_id, pos = self._tokens[token_id]
+            base = self.EXACT if token == head else self.PREFIX - 0.01 * min(len(token) - len(head), 9)
+            bump(name_id, base - (0.05 if pos else 0.0))
+
+        # 2. Нечёткий поиск по триграммам
+        q_tris = _trigrams(head)
+        overlap: Dict[int, int] = defaultdict(int)
+        for tri in q_tris:
+            for token_id in self._trigrams.get(tri, ()):
+                overlap[token_id] += 1
+        for token_id, common in overlap.items():
+            token, name_id, pos = self._tokens[token_id]
+            if head in token:
+                bump(name_id, self.SUBSTRING - (0.05 if pos else 0.0))
+                continue
+            similarity = 2 * common / (len(q_tris) + len(token) + 1)
+            if similarity >= self.MIN_FUZZY_SIMILARITY:
+                bump(name_id, self.FUZZY * similarity - (0.05 if pos else 0.0))
+
+        # Остальные токены запроса (инициалы/имя) уточняют выбор
+        if len(q_tokens) > 1:
+            for name_id in list(scores):
+                name_tokens = [t for t in _SPLIT_RE.split(normalize_name(self._names[name_id])) if t]
+                if all(any(nt.startswith(qt) for nt in name_tokens[1:]) for qt in q_tokens[1:]):
+                    scores[name_id] += 0.05
+                else:
+                    scores[name_id] -= 0.3
+
+        ranked = sorted(scores.items(), key=lambda kv: (-kv[1], self._names[kv[0]]))
+        return [(self._names[name_id], round(score, 3)) for name_id, score in ranked[:limit] if score > 0]
+
+
+# Global index, rebuilt from Lesson.teacher and extended with names from department reports
+teacher_index = TeacherIndex()
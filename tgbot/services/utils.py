@@ -1,10 +1,7 @@
 import logging
-import asyncio
 import aiosqlite
 from datetime import datetime, date
-from typing import List, Optional
-from aiogram import Bot
-from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+from typing import Optional
 
 async def check_connection(db_path: str):
     try:
@@ -27,19 +24,3 @@ def parse_date(text: str) -> Optional[date]:
             continue
     return None
 
-async def safe_broadcast(bot: Bot, user_ids: List[int], text: str) -> int:
-    count = 0
-    for user_id in user_ids:
-        try:
-            await bot.send_message(user_id, text)
-            count += 1
-            await asyncio.sleep(0.05) # Small delay to avoid floods
-        except TelegramForbiddenError:
-            logging.warning(f"User {user_id} blocked the bot.")
-        except TelegramRetryAfter as e:
-            await asyncio.sleep(e.retry_after)
-            await bot.send_message(user_id, text)
-            count += 1
-        except Exception as e:
-            logging.error(f"Failed to send message to {user_id}: {e}")
-    return count